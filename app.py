@@ -1,129 +1,115 @@
 import os
-import subprocess
+import json
+import logging
 import time
 import numpy as np
-import pandas as pd
-from flask import Flask, request, render_template, render_template_string, jsonify, redirect, url_for, send_file
-import matplotlib
-import matplotlib.pyplot as plt
-matplotlib.use("TkAgg")  # Use Tkinter backend
-import matplotlib.dates as mdates
-import tkinter as tk
-from tkinter import filedialog, messagebox
-matplotlib.use('Agg')  # Use Agg backend to avoid GUI-related issues
+from flask import Flask, Response, g, request, render_template, render_template_string, jsonify, redirect, url_for, send_file, abort, stream_with_context
+from werkzeug.utils import secure_filename
+# No GUI toolkit here: pandas and matplotlib are imported when first needed (see signal_core/graphs.py)
+
+from signal_core.rinex import ObservationColumns, parse_rinex
+from signal_core.store import write_store
+from signal_core.combinations import FREQUENCIES, NAVIC_PHASES
+from signal_core.analysis import CUTOFF, NAVIC_SNR, WINDOW, analysis_json, store_analysis, write_analysis
+from signal_core.batch import ALL, COMBINED, LAYOUTS, write_batch
+from signal_core.graphs import GraphPlotter, series_mode
+from signal_core.jobs import IngestQueue, Job
+from signal_core.live import follow_file, follow_socket, live_events
+from signal_core.metrics import CONTENT_TYPE, REGISTRY, timed
+from signal_core.pyramid import Pyramid, is_pyramid, write_pyramid
+from signal_core.qc import BY_SATELLITE, QC_BY, store_qc
+from signal_core.render_cache import RenderCache, data_sha256, render_key
+from signal_core.series import double_frame, open_observations, single_frame
 
 app = Flask(__name__)
 
 # Ensure the static folder exists
 if not os.path.exists('static'):
     os.makedirs('static')
-UPLOAD_FOLDER = "uploads"
 PROCESSED_FOLDER = "processed"
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+JOBS_FOLDER = os.path.join(PROCESSED_FOLDER, "jobs")  # one directory per upload, see signal_core/jobs.py
+RENDERS_FOLDER = os.path.join(PROCESSED_FOLDER, "renders")  # rendered graphs of every job, one LRU budget
+RENDER_MAX_AGE = 365 * 24 * 3600  # seconds; rendered graphs are addressed by content
+LIVE_FOLDER = os.path.join(PROCESSED_FOLDER, "live")  # growing RINEX files that /live can follow
+LIVE_IDLE_TIMEOUT = 60  # seconds without new epochs before a live stream ends
+# Local TCP ports /live may follow, e.g. LIVE_PORTS=5001,5002; clients can only pick from these
+LIVE_PORTS = sorted({int(port) for port in os.environ.get("LIVE_PORTS", "").split(",") if port.strip()})
+PROFILE_DIR = os.environ.get("PROFILE_DIR")  # when set, every request is profiled to a .prof file here
 os.makedirs(PROCESSED_FOLDER, exist_ok=True)
+os.makedirs(JOBS_FOLDER, exist_ok=True)
+os.makedirs(LIVE_FOLDER, exist_ok=True)
+
+if PROFILE_DIR:
+    from werkzeug.middleware.profiler import ProfilerMiddleware
+
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    app.wsgi_app = ProfilerMiddleware(app.wsgi_app, stream=None, profile_dir=PROFILE_DIR)
+
+render_cache = RenderCache(RENDERS_FOLDER)  # keys hash the data, so jobs can share it
+
+
+def open_job(job_id):
+    """The job named by a request, aborts with 404 when there is no such job"""
+    job = Job.open(JOBS_FOLDER, job_id)
+    if job is None:
+        abort(404, description="Unknown job.")
+    return job
+
+
+def ready_job(job_id):
+    """The job named by a request once its upload is ingested, aborts with 409 before that"""
+    job = open_job(job_id)
+    if not job.ready():
+        abort(409, description="The job's upload is still being processed.")
+    return job
 
 #--------------------Script for Upload.html--------------------
 class Receiver:
+    """Collects RINEX observations as typed columns (see signal_core.rinex)."""
+
     def __init__(self):
         self.rinex_version = None
         self.observation_type = ""
         self.system_type = ""
         self.observation_codes = {}
-        self.observation_data = []
-        self.epochs = []
-
-    def _parse_rinex_version_type_line(self, line):
-        self.rinex_version = float(line[:9].strip())
-        self.observation_type = line[20:40].strip()
-        system_char = line[40:41].strip()
-        system_map = {'G': 'GPS', 'R': 'GLONASS', 'S': 'SBAS', 'E': 'Galileo',
-                      'J': 'QZSS', 'C': 'BDS', 'I': 'IRNSS', 'M': 'Mixed'}
-        self.system_type = system_map.get(system_char, system_char)
-
-    def _parse_sys_obs_types_line(self, line):
-        parts = line.split()
-        if len(parts) < 2:
-            return
-        system = parts[0]
-        num_obs_types = int(parts[1]) if parts[1].isdigit() else 0
-        obs_types = parts[2:2 + num_obs_types]
-        self.observation_codes[system] = obs_types
-
-    def _parse_epoch_line(self, line):
-        parts = line[1:].split()
-        year, month, day, hour, minute = map(int, parts[:5])
-        second = float(parts[5])
-        epoch_time = np.datetime64(f'{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}:{int(second):02d}')
-        self.epochs.append(epoch_time)
-        return epoch_time
-
-    def _parse_prn_obs_line(self, epoch, line):
-        prn = line[:3].strip()
-        if not prn:
-            return
-        gnss_system = prn[0]
-        obs_types = self.observation_codes.get(gnss_system, [])
-        data_start, data_length = 3, 16
-
-        for obs_type in obs_types:
-            data_end = data_start + data_length
-            data_point = line[data_start:data_end].strip()
-            try:
-                value = float(data_point[:-2]) if len(data_point) > 2 else None
-            except ValueError:
-                value = None
-
-            self.observation_data.append({
-                'Epoch': epoch,
-                'Obs_Type': obs_type,
-                'PRN': prn,
-                'GNSS_System': gnss_system,
-                'Value': value
-            })
-            data_start = data_end
+        self.chunks = []
 
     def import_data(self, filepath):
-        obs_data_start, current_epoch = False, None
         try:
-            with open(filepath, 'r') as file:
-                for line in file:
-                    if 'END OF HEADER' in line:
-                        obs_data_start = True
-                        continue
-                    if line.startswith('>'):
-                        current_epoch = self._parse_epoch_line(line)
-                    elif obs_data_start:
-                        self._parse_prn_obs_line(current_epoch, line)
-                    elif 'SYS / # / OBS TYPES' in line:
-                        self._parse_sys_obs_types_line(line)
+            with timed("parse") as stage:
+                columns = parse_rinex(filepath)
+                stage.add(bytes=os.path.getsize(filepath), epochs=columns.epoch_count, observations=len(columns))
         except Exception as e:
-            print(f"Error processing file {filepath}: {str(e)}")
+            app.logger.error("Error processing file %s: %s", filepath, e)
+            return
+
+        header = columns.header
+        self.rinex_version = header.rinex_version
+        self.observation_type = header.observation_type
+        self.system_type = header.system_type
+        for system, codes in header.observation_codes.items():
+            self.observation_codes.setdefault(system, codes)
+        self.chunks.append(columns)
 
     def export_data(self, output_file):
-        if not self.observation_data:
-            print("No data found to export.")
+        if not any(len(chunk) for chunk in self.chunks):
+            app.logger.warning("No data found to export.")
             return
 
-        df = pd.DataFrame(self.observation_data)
-        df = df.sort_values(by="Epoch")  # Sorting timewise (Epochwise)
-        df.to_csv(output_file, index=False, sep='\t')
+        with timed("export") as stage:
+            columns = ObservationColumns.concatenate(self.chunks)  # Epoch ordered
+            write_store(columns, output_file)
+            stage.add(bytes=columns.nbytes, epochs=columns.epoch_count, observations=len(columns))
 
-def process_uploaded_files(file_paths):
-    receiver = Receiver()
-    for file_path in file_paths:
-        receiver.import_data(file_path)
-    
-    timestamp = int(time.time())
-    processed_file = os.path.join(PROCESSED_FOLDER, f"processed_{timestamp}.txt")
-    receiver.export_data(processed_file)
-    return processed_file
+ingest_queue = IngestQueue()
 
-# Declare processed_file as a global variable
-processed_file = None
+def process_uploaded_files(job, file_paths):
+    """Queues the files for ingest into the job's archive and returns at once; see /jobs/<id>/status"""
+    ingest_queue.submit(job, file_paths)
+    app.logger.info("Job %s: queued %d file(s)", job.id, len(file_paths))
 
 @app.route('/', methods=['GET', 'POST'])
 def upload_page():
-    global processed_file  # 🔴 Declare global variable
     if request.method == 'POST':
         if 'file' not in request.files:
             return "No file uploaded", 400  # 🔴 This is causing the issue.
@@ -133,253 +119,356 @@ def upload_page():
         if not uploaded_files or all(f.filename == '' for f in uploaded_files):
             return "No selected file", 400
 
+        # A new upload starts a new job; ?job=<id> adds the files to an existing one.
+        job = open_job(request.args['job']) if 'job' in request.args else Job.create(JOBS_FOLDER)
+        # The claim is exclusive, so two uploads to one job cannot interleave; the ingest releases it
+        if not job.acquire():
+            return "The job is still processing its previous upload", 409
         file_paths = []
-        for uploaded_file in uploaded_files:
-            if uploaded_file.filename:  # 🟢 Ensure filename exists
-                file_path = os.path.join(UPLOAD_FOLDER, uploaded_file.filename)
-                uploaded_file.save(file_path)
-                file_paths.append(file_path)
-
-        if not file_paths:
-            return "No valid files uploaded", 400
-
-        # Process files
-        processed_file = process_uploaded_files(file_paths)
-        return redirect(url_for('csv_page'))
+        try:
+            for uploaded_file in uploaded_files:
+                filename = secure_filename(uploaded_file.filename or '')
+                if filename:  # 🟢 Ensure filename exists
+                    file_path = os.path.join(job.uploads, filename)
+                    with timed("upload_save") as stage:
+                        uploaded_file.save(file_path)
+                        stage.add(bytes=os.path.getsize(file_path))
+                    file_paths.append(file_path)
+            if not file_paths:
+                job.release()
+                return "No valid files uploaded", 400
+
+            # Process files
+            process_uploaded_files(job, file_paths)
+        except Exception:
+            job.release()
+            raise
+        return redirect(url_for('csv_page', job=job.id))
     
     return render_template('upload.html')
 
+@app.route('/jobs/<job_id>/status', methods=['GET'])
+def job_status(job_id):
+    """Ingest state of a job: files, epochs parsed, bytes read and ETA in seconds"""
+    return jsonify(dict(open_job(job_id).status(), job=job_id))
+
 #--------------------Script for csv.html--------------------
-C = 299792458  # Speed of light in m/s
-F1 = 1575.42e6  # Frequency for L1 in Hz
-F2 = 1227.60e6  # Frequency for L2 in Hz
-F5 = 1176.45e6  # Frequency for L5 in Hz
-F9 = 2492.028e6  # Frequency for L9 in Hz
-
-default_frequency_mapping = {
-    "L1C": F1, "L2C": F2, "L5C": F5, "C5C": F5, "L5C": F5, "D5C": F5, "S5C": F5,
-    "C9C": F9, "L9C": F9, "D9C": F9, "S9C": F9, "P1": F1, "P2": F2, "P5": F5,
-    "L1L": F1, "L2L": F2
-}
+default_frequency_mapping = FREQUENCIES  # Carrier frequencies by obs code, see signal_core/combinations.py
 
 
 def load_large_observation_file(file_path):
-    if not os.path.isfile(file_path):
-        return None
-    df = pd.read_csv(file_path, sep="\t", engine='python', dtype=str)
-    df.columns = df.columns.str.strip().str.upper()
-    df['EPOCH'] = pd.to_datetime(df['EPOCH'], errors='coerce')
-    df.sort_values(by='EPOCH', inplace=True)
-    return df
-
-
-def search_carrier_data(df, satellite, observation_type, output_csv_path):
-    satellite = satellite.upper()
-    observation_type = observation_type.upper()
+    """Opens the processed archive or store; columns are memory-mapped, nothing is read yet"""
+    with timed("load"):
+        return open_observations(file_path)
 
-    result = df[(df['OBS_TYPE'] == observation_type) & (df['PRN'] == satellite)].copy()
 
-    if not result.empty:
-        frequency = default_frequency_mapping.get(observation_type, None)
-        if frequency is None:
-            return None
-
-        result['VALUE'] = pd.to_numeric(result['VALUE'], errors='coerce')
-        result['Distance'] = result['VALUE'].apply(lambda x: -(C * x) / (frequency * 1000) if pd.notna(x) else None)
-        result = result[['EPOCH', 'Distance']]
-        result.rename(columns={'EPOCH': 'Time', 'Distance': 'Carrier_Phase'}, inplace=True)
-        result.to_csv(output_csv_path, index=False)
-        return output_csv_path
-    return None
-
-def search_carrier_data(df, satellite, observation_type, output_csv_path):
+def search_carrier_data(store, satellite, observation_type, output_csv_path):
     """Processes Single Carrier Phase Data"""
-    satellite = satellite.upper()
-    observation_type = observation_type.upper()
-
-    result = df[(df['OBS_TYPE'] == observation_type) & (df['PRN'] == satellite)].copy()
-
-    if not result.empty:
-        frequency = default_frequency_mapping.get(observation_type, None)
-        if frequency is None:
-            return None
-
-        result['VALUE'] = pd.to_numeric(result['VALUE'], errors='coerce')
-        result['Carrier_Phase'] = result['VALUE'].apply(lambda x: -(C * x) / (frequency * 1000) if pd.notna(x) else None)
-        result = result[['EPOCH', 'Carrier_Phase']]
-        result.rename(columns={'EPOCH': 'Time'}, inplace=True)
-        result.to_csv(output_csv_path, index=False)
-        return output_csv_path
-    return None
+    result = single_frame(store, satellite, observation_type)
+    if result is None:
+        return None
+    write_series_csv(result, output_csv_path)
+    return output_csv_path
 
 
-def search_double_carrier_data(df, satellite, observation_type_1, observation_type_2, output_csv_path):
+def search_double_carrier_data(store, satellite, observation_type_1, observation_type_2, output_csv_path):
     """Processes Double Carrier Phase Data"""
-    satellite = satellite.upper()
-    observation_type_1 = observation_type_1.upper()
-    observation_type_2 = observation_type_2.upper()
-
-    result1 = df[(df['OBS_TYPE'] == observation_type_1) & (df['PRN'] == satellite)].copy()
-    result2 = df[(df['OBS_TYPE'] == observation_type_2) & (df['PRN'] == satellite)].copy()
-
-    if not result1.empty and not result2.empty:
-        freq1 = default_frequency_mapping.get(observation_type_1, None)
-        freq2 = default_frequency_mapping.get(observation_type_2, None)
-        if freq1 is None or freq2 is None:
-            return None
-
-        result1['VALUE'] = pd.to_numeric(result1['VALUE'], errors='coerce')
-        result2['VALUE'] = pd.to_numeric(result2['VALUE'], errors='coerce')
-
-        result1['Carrier_Phase_1'] = result1['VALUE'].apply(lambda x: -(C * x) / (freq1 * 1000) if pd.notna(x) else None)
-        result2['Carrier_Phase_2'] = result2['VALUE'].apply(lambda x: -(C * x) / (freq2 * 1000) if pd.notna(x) else None)
-
-        merged_result = pd.merge(result1[['EPOCH', 'Carrier_Phase_1']], result2[['EPOCH', 'Carrier_Phase_2']], on='EPOCH', how='inner')
-        merged_result.rename(columns={'EPOCH': 'Time'}, inplace=True)
+    merged_result = double_frame(store, satellite, observation_type_1, observation_type_2)
+    if merged_result is None:
+        return None
+    write_series_csv(merged_result, output_csv_path)
+    return output_csv_path
 
-        merged_result.to_csv(output_csv_path, index=False)
-        return output_csv_path
-    return None
 
-generated_csv_file = None  # Declare a global variable
+def write_series_csv(frame, output_csv_path):
+    with timed("csv") as stage:
+        frame.to_csv(output_csv_path, index=False)
+        stage.add(bytes=os.path.getsize(output_csv_path), epochs=len(frame))
 
 @app.route('/csv', methods=['GET', 'POST'])
 def csv_page():
-    global generated_csv_file  # Use the global variable
+    job = open_job(request.args.get('job'))
     if request.method == 'POST':
+        job = ready_job(job.id)
         satellite = request.form["satellite"]
         observation_type_1 = request.form["observation_type_1"]
         mode = request.form["mode"]  # Get single/double mode
         
         observation_type_2 = request.form.get("observation_type_2", None) if mode == "double" else None
 
-        timestamp = int(time.time())
-        generated_csv_file = os.path.join(PROCESSED_FOLDER, f"csv_{timestamp}.csv")
-        df = load_large_observation_file(processed_file)
+        series_id, series_csv = job.new_series()
+        store = load_large_observation_file(job.archive_path)
 
-        if df is not None:
+        if store is not None:
             if mode == "single":
-                csv_file = search_carrier_data(df, satellite, observation_type_1, generated_csv_file)
+                csv_file = search_carrier_data(store, satellite, observation_type_1, series_csv)
             else:
-                csv_file = search_double_carrier_data(df, satellite, observation_type_1, observation_type_2, generated_csv_file)
+                csv_file = search_double_carrier_data(store, satellite, observation_type_1, observation_type_2, series_csv)
 
             if csv_file:
-                return redirect(url_for('graph_page', type=mode))  # Pass mode in URL
-
-    return render_template('csv.html')
+                return redirect(url_for('graph_page', job=job.id, series=series_id, type=mode))  # Pass mode in URL
+
+    return render_template('csv.html', job=job.id)
+
+
+def parse_batch_selection(raw):
+    """Turns "all", [{"prn": ..., "codes": [...]}] or [[prn, codes]] into (prn, codes) pairs"""
+    if raw is None or raw == ALL:
+        return ALL
+    selection = []
+    for item in raw:
+        if isinstance(item, dict):
+            selection.append((item["prn"], item.get("codes", ALL)))
+        else:
+            prn, codes = item
+            selection.append((prn, codes))
+    return selection
+
+
+@app.route('/batch', methods=['POST'])
+def batch_extract():
+    """Extracts many PRN x code series in one pass, returned as one CSV or a zip of CSVs"""
+    job = ready_job(request.args.get('job'))
+    params = request.get_json(silent=True) or {}
+    layout = params.get("layout", request.args.get("layout", COMBINED))
+    if layout not in LAYOUTS:
+        return jsonify({"success": False, "message": f"layout must be one of {', '.join(LAYOUTS)}."}), 400
+    try:
+        selection = parse_batch_selection(params.get("selection", ALL))
+    except (KeyError, TypeError, ValueError):
+        return jsonify({"success": False, "message": "Invalid selection."}), 400
+
+    store = load_large_observation_file(job.archive_path)
+    if store is None:
+        return jsonify({"success": False, "message": "No processed observation data."}), 404
+
+    extension = "csv" if layout == COMBINED else "zip"
+    _, output_path = job.new_series(extension)
+    with timed("batch") as stage:
+        write_batch(store, output_path, selection, layout)
+        stage.add(bytes=os.path.getsize(output_path))
+    return send_file(os.path.abspath(output_path), as_attachment=True)
 
 #--------------------Script for graph.html--------------------
-class GraphPlotter:
-    def __init__(self, mode='single'):
-        global generated_csv_file
-        self.file_path = generated_csv_file  # Use latest generated file
-        self.mode = mode
-        self.df = self.load_csv()  # Ensure CSV is loaded properly
-
-    def load_csv(self):
-        try:
-            df = pd.read_csv(self.file_path)
-            print("Debug CSV Read:", df.head())  # Debugging: Print first few rows
-
-            # Check column names (trim spaces if needed)
-            df.columns = df.columns.str.strip()
-
-            # Ensure 'Time' column is parsed correctly
-            if 'Time' in df.columns:
-                df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
-            else:
-                print("Error: 'Time' column not found in CSV.")
-            return df
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to read file: {e}")
-            return None
-
-    def detect_phase_slips(self, carrier_phase, threshold=2.0):
-        diffs = np.abs(np.diff(carrier_phase))
-        return np.where(diffs > threshold)[0] + 1  # Adjust indices
-
-    def plot_graph(self, title, color, detect_phase=False):
-        if self.df is None:
-            return
-        
-        print("✅ CSV Loaded Successfully!")
-        print("📌 Columns in CSV:", self.df.columns)
-        print("📊 Data Types:\n", self.df.dtypes)
-        print("📝 Sample Data:\n", self.df.head())
-
-        plt.figure(figsize=(12, 6))
-        time = self.df['Time']
-
-        if self.mode == 'single':
-            if 'Carrier_Phase' in self.df.columns:
-                carrier_phase = pd.to_numeric(self.df['Carrier_Phase'], errors='coerce')
-                plt.plot(time, carrier_phase, label=title, color=color, linewidth=2)
-
-                if detect_phase:
-                    slip_indices = self.detect_phase_slips(carrier_phase)
-                    plt.scatter(time.iloc[slip_indices], carrier_phase.iloc[slip_indices], color='red', s=50, label='Phase Slip', zorder=3)
-            else:
-                print("Error: 'Carrier_Phase' column not found in the CSV file.")
-
-        else:  # Double Mode
-            try:
-                print("Available columns in DataFrame:", self.df.columns)  # Debugging step
-
-                if 'Carrier_Phase_1' in self.df.columns and 'Carrier_Phase_2' in self.df.columns:
-                    carrier_phase_1 = pd.to_numeric(self.df['Carrier_Phase_1'], errors='coerce')
-                    carrier_phase_2 = pd.to_numeric(self.df['Carrier_Phase_2'], errors='coerce')
-
-                    plt.plot(time, carrier_phase_1, label="Carrier Phase 1", color="blue", linewidth=2)
-                    plt.plot(time, carrier_phase_2, label="Carrier Phase 2", color="green", linewidth=2)
-
-                    if detect_phase:
-                        slip_indices_1 = self.detect_phase_slips(carrier_phase_1)
-                        slip_indices_2 = self.detect_phase_slips(carrier_phase_2)
-
-                        plt.scatter(time.iloc[slip_indices_1], carrier_phase_1.iloc[slip_indices_1], color='red', s=50, label='Phase Slip 1', zorder=3)
-                        plt.scatter(time.iloc[slip_indices_2], carrier_phase_2.iloc[slip_indices_2], color='purple', s=50, label='Phase Slip 2', zorder=3)
-                else:
-                    print("Error: 'Carrier_Phase_1' and/or 'Carrier_Phase_2' column(s) not found in the CSV file.")
-
-            except KeyError as e:
-                print(f"Error: {e}. Check if CSV contains 'Carrier_Phase_1' and 'Carrier_Phase_2'.")
-
-        plt.xlabel("Time")
-        plt.ylabel("Carrier Phase")
-        plt.title(title)
-        plt.legend()
-        plt.xticks(rotation=45)
-        plt.grid(True, linestyle="--", alpha=0.6)
-        plt.tight_layout()
-        plt.savefig("static/graph.png")
-        return send_file("static/graph.png", mimetype="image/png")
-
 @app.route('/graph', methods=['GET'])
 def graph_page():
     graph_type = request.args.get('type', 'single')  # Default to single
     html_content = render_template('graph.html', graph_type=graph_type)
     return render_template_string(html_content)
 
+GRAPH_TYPES = {
+    "sgraph_no_phase": ("Single Graph without Phase Slip", False),
+    "sgraph_with_phase": ("Single Graph with Phase Slip", True),
+    "dgraph_no_phase": ("Double Graph without Phase Slip", False),
+    "dgraph_with_phase": ("Double Graph with Phase Slip", True),
+}
+
 @app.route('/generate_graph', methods=['POST'])
 def generate_graph():
+    job = open_job(request.args.get('job'))
+    series_csv = job.series_path(request.args.get('series'))
     graph_type = request.form.get("graph_type")
-    mode = request.args.get("type", "single")  # Detect if single or double
-    plotter = GraphPlotter(mode=mode)
-
-    if graph_type == "sgraph_no_phase":
-        plotter.plot_graph("Single Graph without Phase Slip", "blue", detect_phase=False)
-    elif graph_type == "sgraph_with_phase":
-        plotter.plot_graph("Single Graph with Phase Slip", "blue", detect_phase=True)
-    elif graph_type == "dgraph_no_phase":
-        plotter.plot_graph("Double Graph without Phase Slip", "blue", detect_phase=False)
-    elif graph_type == "dgraph_with_phase":
-        plotter.plot_graph("Double Graph with Phase Slip", "blue", detect_phase=True)
-    else:
+    if graph_type not in GRAPH_TYPES:
         return jsonify({"success": False, "message": "Invalid graph type selected."})
+    if series_csv is None:
+        return jsonify({"success": False, "message": "No CSV data to plot."})
+    mode = request.args.get("type") or ("double" if graph_type.startswith("d") else "single")
+    if "threshold" in request.form:
+        # Once a km jump, now robust sigmas: refuse the old name rather than reinterpret its value
+        return jsonify({"success": False, "message": "'threshold' was replaced by 'k_sigma', in robust standard "
+                                                     "deviations of the series' noise."}), 400
+    try:
+        k_sigma = float(request.form.get("k_sigma", GraphPlotter.SLIP_K_SIGMA))
+    except ValueError:
+        return jsonify({"success": False, "message": "Invalid phase slip k_sigma."})
+
+    # Same data and parameters give the same image: render it only once.
+    title, detect_phase = GRAPH_TYPES[graph_type]
+    width, height = GraphPlotter.FIGURE_SIZE
+    key = render_key(data_sha256(series_csv), mode=mode, graph_type=graph_type,
+                     k_sigma=k_sigma if detect_phase else None,
+                     size=[width * GraphPlotter.DPI, height * GraphPlotter.DPI])
+    if render_cache.get(key) is None:
+        staging = render_cache.staging_path(key)
+        if GraphPlotter(series_csv, mode=mode).plot_graph(title, "blue", detect_phase, k_sigma, staging) is None:
+            return jsonify({"success": False, "message": "Failed to read CSV data."})
+        render_cache.put(key, staging)
+
+    return jsonify({"success": True, "message": "Graph generated successfully.",
+                    "url": url_for('graph_image', job_id=job.id, key=key)})
+
+@app.route('/graph_image/<job_id>/<key>.png')
+def graph_image(job_id, key):
+    """Serves a cached render; its key is the ETag and the bytes never change"""
+    open_job(job_id)
+    path = render_cache.get(key) if len(key) == 64 and key.isalnum() else None
+    if path is None:
+        return jsonify({"success": False, "message": "Graph not found."}), 404
+    response = send_file(os.path.abspath(path), mimetype="image/png", etag=key, max_age=RENDER_MAX_AGE,
+                         conditional=True)
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response
+
+def series_pyramid(job_id, series_id):
+    """Min/max pyramid of an extracted series, built on first use"""
+    job = open_job(job_id)
+    path = job.pyramid_path(series_id)
+    if path is None:
+        abort(404, description="Unknown series.")
+    if not is_pyramid(path):
+        series_csv = job.series_path(series_id)
+        plotter = GraphPlotter(series_csv, mode=series_mode(series_csv))
+        if plotter.df is None:
+            abort(500, description="Failed to read CSV data.")
+        with timed("pyramid") as stage:
+            write_pyramid(path, *plotter.pyramid_columns())
+            stage.add(epochs=len(plotter.df))
+    return Pyramid(path)
+
+@app.route('/series/<job_id>/<series_id>/pyramid')
+def series_pyramid_meta(job_id, series_id):
+    """Columns, time range and per-level tile ranges of a series, for the interactive chart"""
+    return jsonify(series_pyramid(job_id, series_id).meta)
+
+@app.route('/series/<job_id>/<series_id>/tiles/<int:level>/<int:index>')
+def series_tile(job_id, series_id, level, index):
+    """One tile of min/max buckets; a series never changes, so neither does a tile"""
+    try:
+        tile = series_pyramid(job_id, series_id).tile(level, index)
+    except IndexError:
+        abort(404, description="No such tile.")
+    response = jsonify(tile)
+    response.set_etag(f"{series_id}-{level}-{index}")
+    response.cache_control.max_age = RENDER_MAX_AGE
+    response.cache_control.public = True
+    response.cache_control.immutable = True
+    return response.make_conditional(request)
+
+
+#--------------------Script for qc.html--------------------
+def parse_epoch(value):
+    """ns since 1970 from an integer or an ISO date and time (UTC), None when not given"""
+    if not value:
+        return None
+    if value.isdigit():
+        return int(value)
+    return int(np.datetime64(value, 'ns').astype(np.int64))
+
+def split_args(name):
+    """Values of a repeatable, comma separated query argument, None when absent"""
+    values = [item.strip() for value in request.args.getlist(name) for item in value.split(',') if item.strip()]
+    return values or None
+
+@app.route('/qc', methods=['GET'])
+def qc_page():
+    return render_template('qc.html', job=open_job(request.args.get('job')).id)
+
+@app.route('/jobs/<job_id>/qc', methods=['GET'])
+def job_qc(job_id):
+    """Per-satellite QC summarized at ingest, per bucket or per satellite; never reads the observations"""
+    job = ready_job(job_id)
+    by = request.args.get('by', BY_SATELLITE)
+    if by not in QC_BY:
+        return jsonify({"success": False, "message": f"by must be one of {', '.join(QC_BY)}."}), 400
+    try:
+        start, end = parse_epoch(request.args.get('start')), parse_epoch(request.args.get('end'))
+    except ValueError:
+        return jsonify({"success": False, "message": "start and end must be ns or ISO date and time."}), 400
+
+    store = load_large_observation_file(job.archive_path)
+    if store is None:
+        return jsonify({"success": False, "message": "No processed observation data."}), 404
+    with timed("qc") as stage:
+        summary = store_qc(store, by, split_args('prn'), split_args('code'), start, end)
+        stage.add(observations=len(summary["rows"]))
+    return jsonify(dict(summary, job=job.id))
+
+
+#--------------------Scintillation analysis--------------------
+@app.route('/jobs/<job_id>/analysis', methods=['GET'])
+def job_analysis(job_id):
+    """Sigma-phi, S4, ROT and ROTI of every PRN per window, as JSON or ?format=csv"""
+    job = ready_job(job_id)
+    try:
+        window = float(request.args.get('window', WINDOW))
+        step = float(request.args['step']) if 'step' in request.args else None
+        cutoff = float(request.args.get('cutoff', CUTOFF))
+        start, end = parse_epoch(request.args.get('start')), parse_epoch(request.args.get('end'))
+    except ValueError:
+        return jsonify({"success": False,
+                        "message": "window, step and cutoff must be numbers, start and end ns or ISO dates."}), 400
+    if window <= 0 or cutoff <= 0 or (step is not None and step <= 0):
+        return jsonify({"success": False, "message": "window, step and cutoff must be positive."}), 400
+    phases = [code.upper() for code in split_args('pair') or NAVIC_PHASES]
+    snr_codes = [code.upper() for code in split_args('snr') or NAVIC_SNR]
+    prns = [prn.upper() for prn in split_args('prn') or ()] or None
+
+    store = load_large_observation_file(job.archive_path)
+    if store is None:
+        return jsonify({"success": False, "message": "No processed observation data."}), 404
+    with timed("analysis") as stage:
+        result = store_analysis(store, phases, snr_codes, prns, window, step, cutoff, start, end)
+        stage.add(epochs=len(result["EPOCH"]), observations=len(result["EPOCH"]) * len(result["PRN"]))
+    if request.args.get('format') == 'csv':
+        _, output_path = job.new_series()
+        write_analysis(result, output_path)
+        return send_file(os.path.abspath(output_path), as_attachment=True, download_name="analysis.csv")
+    return jsonify(dict(analysis_json(result), job=job.id))
+
+
+#--------------------Script for live.html--------------------
+@app.route('/live', methods=['GET'])
+def live_page():
+    return render_template('live.html', files=sorted(os.listdir(LIVE_FOLDER)), ports=LIVE_PORTS)
+
+@app.route('/live/stream', methods=['GET'])
+def live_stream():
+    """Server-sent events of a RINEX file being written to LIVE_FOLDER (?file=) or a LIVE_PORTS port (?port=)"""
+    if 'port' in request.args:
+        port = request.args.get('port', type=int)
+        if port not in LIVE_PORTS:
+            abort(403, description="The port is not one of the configured live ports.")
+        try:
+            chunks = follow_socket("127.0.0.1", port, timeout=LIVE_IDLE_TIMEOUT)
+        except OSError as e:
+            abort(502, description=f"Cannot connect to the port: {e}")
+    else:
+        path = os.path.join(LIVE_FOLDER, secure_filename(request.args.get('file', '')))
+        if not os.path.isfile(path):
+            abort(404, description="Unknown live file.")
+        chunks = follow_file(path, idle_timeout=LIVE_IDLE_TIMEOUT)
+
+    def events():
+        for event in live_events(chunks):
+            yield f"event: epoch\ndata: {json.dumps(event)}\n\n"
+            for slip in event["slips"]:
+                yield f"event: slip\ndata: {json.dumps(slip)}\n\n"
+        yield "event: end\ndata: {}\n\n"
+
+    return Response(stream_with_context(events()), mimetype="text/event-stream",
+                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+#--------------------Instrumentation--------------------
+@app.before_request
+def start_timer():
+    g.request_start = time.perf_counter()
 
-    return jsonify({"success": True, "message": "Graph generated successfully."})
+@app.after_request
+def record_request(response):
+    """Request time by endpoint; a streamed response counts until its headers are sent"""
+    if 'request_start' in g:
+        REGISTRY.record_request(request.endpoint or "unmatched", response.status_code,
+                                time.perf_counter() - g.request_start)
+    return response
 
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Stage timings, sizes and request times of this process in the Prometheus text format"""
+    return Response(REGISTRY.exposition(), content_type=CONTENT_TYPE)
 
 
 if __name__ == '__main__':
+    logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO"))
     app.run(debug=True)
\ No newline at end of file
@@ -0,0 +1,64 @@
+"""Benchmark: parsing a month of daily RINEX files on a process pool.
+
+Builds N daily files from uploads/NPLI0240.25O by shifting its epochs one
+day at a time, then parses them with 1, 2, 4 ... workers and reports the
+wall time and speed-up over a single worker.
+
+    python benchmarks/bench_parallel_parse.py [--days 30] [--workers 1,2,4,8]
+"""
+import argparse
+import datetime
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from signal_core.parallel import default_workers, parse_and_merge  # noqa: E402
+
+SAMPLE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads", "NPLI0240.25O")
+
+
+def shifted_copy(source, target, days):
+    """Write `source` with every epoch line moved forward by `days` days."""
+    with open(source) as fin, open(target, "w") as fout:
+        for line in fin:
+            if line.startswith(">"):
+                year, month, day = int(line[2:6]), int(line[7:9]), int(line[10:12])
+                date = datetime.date(year, month, day) + datetime.timedelta(days=days)
+                line = f"> {date.year:04d} {date.month:02d} {date.day:02d}" + line[12:]
+            fout.write(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--workers", default=None, help="comma separated worker counts")
+    args = parser.parse_args()
+
+    cpus = default_workers()
+    counts = [int(w) for w in args.workers.split(",")] if args.workers else \
+        sorted({1, *[2 ** k for k in range(1, cpus.bit_length()) if 2 ** k <= cpus], cpus})
+
+    with tempfile.TemporaryDirectory() as folder:
+        paths = []
+        for day in range(args.days):
+            path = os.path.join(folder, f"NPLI{24 + day:03d}0.25O")
+            shifted_copy(SAMPLE, path, day)
+            paths.append(path)
+        size = sum(os.path.getsize(path) for path in paths)
+
+        print(f"{args.days} files, {size / 1e6:.1f} MB, {cpus} CPU(s) available")
+        baseline = None
+        for workers in counts:
+            start = time.perf_counter()
+            columns = parse_and_merge(paths, workers)
+            elapsed = time.perf_counter() - start
+            baseline = baseline or elapsed
+            print(f"workers={workers:<3d} {elapsed:7.3f} s  {size / elapsed / 1e6:7.1f} MB/s  "
+                  f"speed-up x{baseline / elapsed:.2f}  rows={len(columns)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,349 @@
+"""Benchmark: every stage of the pipeline, from a RINEX upload to a graph.
+
+Datasets, all built from the bundled uploads:
+
+    npli024, npli025  the two 30 s daily files as they are
+    1hz               the first --hours of NPLI0240 interpolated to 1 s epochs
+    multiday          --days consecutive copies of NPLI0240 in one file
+
+Stages, run as the app runs them: ObservationArchive.ingest of the file
+into a new job archive, with its progress files (what the IngestQueue does
+for an upload), load_large_observation_file on that archive,
+search_carrier_data and search_double_carrier_data (--prn, --codes),
+GraphPlotter.detect_phase_slips on the extracted pair and
+GraphPlotter.plot_graph with slips marked.
+
+Each stage keeps the best wall time of --repeat runs and reports epochs/s,
+MB/s where the stage reads or writes a file, and its own peak RSS (the
+high-water mark is reset before each stage on Linux, so it includes what
+the process already holds). Libraries the app imports lazily are loaded
+before anything is timed. Synthetic files are generated the same way every
+run, so results are comparable between trees.
+
+Results are written as JSON with --output. With --baseline, a stage slower
+than the baseline by more than --threshold, or using more memory than it by
+more than --rss-threshold, is reported and the exit status is 1.
+
+    python benchmarks/bench_pipeline.py [--datasets npli024,1hz] [--repeat 3]
+        [--output results.json] [--baseline old.json] [--threshold 0.2]
+"""
+import argparse
+import datetime
+import importlib
+import itertools
+import json
+import os
+import platform
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import load_large_observation_file, search_carrier_data, search_double_carrier_data  # noqa: E402
+from signal_core.archive import ObservationArchive  # noqa: E402
+from signal_core.graphs import GraphPlotter  # noqa: E402
+from signal_core.rinex import NS_PER_SECOND, parse_rinex  # noqa: E402
+
+UPLOADS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "uploads")
+SAMPLE = os.path.join(UPLOADS, "NPLI0240.25O")
+SAMPLE_NEXT = os.path.join(UPLOADS, "NPLI0250.25O")
+DATASETS = ("npli024", "npli025", "1hz", "multiday")
+DROPPED_HEADER_LABELS = ("TIME OF LAST OBS",)  # no longer true of the synthetic files
+LAZY_IMPORTS = ("pandas", "matplotlib.figure", "matplotlib.backends.backend_agg")
+MB = 1e6
+
+
+# --------------------synthetic RINEX--------------------
+
+def split_header(path):
+    """Header lines (up to END OF HEADER) and the open file positioned at the body."""
+    fh = open(path)
+    header = []
+    for line in fh:
+        if not any(label in line[60:] for label in DROPPED_HEADER_LABELS):
+            header.append(line)
+        if "END OF HEADER" in line[60:]:
+            break
+    return header, fh
+
+
+def multiday_copy(source, target, days):
+    """Write `days` copies of the body of `source`, each a day later, under its header."""
+    header, fh = split_header(source)
+    body = fh.readlines()
+    fh.close()
+    with open(target, "w") as fout:
+        fout.writelines(header)
+        for day in range(days):
+            for line in body:
+                if line.startswith(">"):
+                    date = datetime.date(int(line[2:6]), int(line[7:9]), int(line[10:12]))
+                    date += datetime.timedelta(days=day)
+                    line = f"> {date.year:04d} {date.month:02d} {date.day:02d}" + line[12:]
+                fout.write(line)
+
+
+def resampled_copy(source, target, interval, hours):
+    """Write the first `hours` of `source` resampled to `interval` seconds.
+
+    Values are linearly interpolated between consecutive epochs of the
+    source, per satellite and code; nothing is made up across a gap longer
+    than the source interval. LLI flags stay on the source epochs, SSI is
+    carried forward.
+    """
+    columns = parse_rinex(source)
+    header = columns.header
+    epochs = np.unique(columns.epoch)
+    epochs = epochs[epochs < epochs[0] + int(hours * 3600) * NS_PER_SECOND]
+    step = int(np.median(np.diff(epochs)))
+
+    # Dense cubes: epoch x satellite x code
+    keep = columns.epoch <= epochs[-1]
+    row = np.searchsorted(epochs, columns.epoch[keep])
+    shape = (len(epochs), len(columns.prns), len(columns.obs_codes))
+    value = np.full(shape, np.nan)
+    lli = np.zeros(shape, np.int8)
+    ssi = np.zeros(shape, np.int8)
+    for cube, column in ((value, columns.value), (lli, columns.lli), (ssi, columns.ssi)):
+        cube[row, columns.prn[keep], columns.obs[keep]] = column[keep]
+
+    grid = np.arange(epochs[0], epochs[-1] + 1, interval * NS_PER_SECOND)
+    before = np.searchsorted(epochs, grid, side="right") - 1
+    after = np.minimum(before + 1, len(epochs) - 1)
+    span = epochs[after] - epochs[before]
+    on_source = grid == epochs[before]
+    grid_keep = on_source | (span <= step)
+    grid, before, after, span, on_source = (a[grid_keep] for a in (grid, before, after, span, on_source))
+    fraction = np.where(span > 0, (grid - epochs[before]) / np.maximum(span, 1), 0.0)[:, None, None]
+    values = value[before] + fraction * (value[after] - value[before])
+    values[on_source] = value[before[on_source]]
+    llis = np.where(on_source[:, None, None], lli[before], 0)
+    ssis = ssi[before]
+
+    fields = {system: [columns.obs_codes.index(code) for code in codes]
+              for system, codes in header.observation_codes.items()}
+    origin = datetime.datetime(1970, 1, 1)
+    header_lines, fh = split_header(source)
+    fh.close()
+    with open(target, "w") as fout:
+        for line in header_lines:
+            if "INTERVAL" in line[60:]:
+                line = f"{interval:10.3f}".ljust(60) + "INTERVAL".ljust(20) + "\n"
+            fout.write(line)
+        for k, epoch in enumerate(grid.tolist()):
+            lines = []
+            for s, prn in enumerate(columns.prns):
+                codes = fields.get(prn[0], [])
+                if np.isnan(values[k, s, codes]).all():
+                    continue
+                lines.append(prn + "".join(
+                    " " * 16 if np.isnan(v) else f"{v:14.3f}{f or ' '}{q or ' '}"
+                    for v, f, q in zip(values[k, s, codes].tolist(), llis[k, s, codes].tolist(),
+                                       ssis[k, s, codes].tolist())) + "\n")
+            t = origin + datetime.timedelta(seconds=epoch / NS_PER_SECOND)
+            fout.write(f"> {t.year:04d} {t.month:02d} {t.day:02d} {t.hour:2d} {t.minute:2d}"
+                       f"{t.second + t.microsecond / 1e6:11.7f}  0{len(lines):3d}\n")
+            fout.writelines(lines)
+
+
+def build_dataset(name, folder, args):
+    """Path of the RINEX file of a dataset, generated into `folder` when synthetic."""
+    if name == "npli024":
+        return SAMPLE
+    if name == "npli025":
+        return SAMPLE_NEXT
+    path = os.path.join(folder, f"{name}.25O")
+    if name == "1hz":
+        resampled_copy(SAMPLE, path, 1, args.hours)
+    else:
+        multiday_copy(SAMPLE, path, args.days)
+    return path
+
+
+# --------------------measurement--------------------
+
+def reset_peak_rss():
+    """Restart the process's RSS high-water mark (Linux); elsewhere it only grows."""
+    try:
+        with open("/proc/self/clear_refs", "w") as fh:
+            fh.write("5")
+    except OSError:
+        pass
+
+
+def peak_rss_mb():
+    try:
+        with open("/proc/self/status") as fh:
+            for line in fh:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) * 1024 / MB
+    except OSError:
+        pass
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is bytes on macOS, kB elsewhere
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / MB
+
+
+def measure(run, repeat, epochs, nbytes=None):
+    """Best wall time of `repeat` calls of `run`; returns its last result and the stage's figures.
+
+    `nbytes` is the size of what the stage reads or writes, or a function of
+    the result giving it.
+    """
+    reset_peak_rss()
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = run()
+        best = min(best, time.perf_counter() - start)
+    nbytes = nbytes(result) if callable(nbytes) else nbytes
+    return result, {
+        "seconds": round(best, 6),
+        "epochs": int(epochs),
+        "epochs_per_s": round(epochs / best, 1),
+        "mb_per_s": round(nbytes / MB / best, 2) if nbytes else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def tree_size(path):
+    if os.path.isfile(path):
+        return os.path.getsize(path)
+    return sum(os.path.getsize(os.path.join(root, name)) for root, _, names in os.walk(path) for name in names)
+
+
+def csv_rows(path):
+    with open(path) as fh:
+        return sum(1 for _ in fh) - 1
+
+
+def run_stages(path, folder, args):
+    """Figures of every stage on the RINEX file at `path`; outputs go to `folder`."""
+    size = os.path.getsize(path)
+    code1, code2 = args.codes
+    stages = {}
+    outputs = itertools.count()
+
+    def ingest():
+        # A new job folder every run: an archive skips the files it already holds
+        job = os.path.join(folder, f"job{next(outputs)}")
+        os.makedirs(os.path.join(job, "progress"))
+        ObservationArchive(os.path.join(job, "archive")).ingest([path], progress_dir=os.path.join(job, "progress"))
+        return os.path.join(job, "archive")
+
+    epochs = len(np.unique(parse_rinex(path).epoch))
+    archive_path, stages["ingest"] = measure(ingest, args.repeat, epochs, size)
+
+    store, stages["load_large_observation_file"] = measure(
+        lambda: load_large_observation_file(archive_path), args.repeat, epochs)
+
+    single_csv = os.path.join(folder, "single.csv")
+    double_csv = os.path.join(folder, "double.csv")
+    _, stages["search_carrier_data"] = measure(
+        lambda: search_carrier_data(store, args.prn, code1, single_csv), args.repeat, 0, tree_size)
+    _, stages["search_double_carrier_data"] = measure(
+        lambda: search_double_carrier_data(store, args.prn, code1, code2, double_csv), args.repeat, 0, tree_size)
+    for stage, csv in (("search_carrier_data", single_csv), ("search_double_carrier_data", double_csv)):
+        stages[stage]["epochs"] = rows = csv_rows(csv)
+        stages[stage]["epochs_per_s"] = round(rows / stages[stage]["seconds"], 1)
+
+    plotter = GraphPlotter(double_csv, mode="double")
+    rows = len(plotter.df)
+
+    def detect_phase_slips():
+        return [plotter.detect_phase_slips(plotter.trace(trace), plotter.SLIP_K_SIGMA, lli)
+                for trace, lli in (("Carrier_Phase_1", "LLI_1"), ("Carrier_Phase_2", "LLI_2"))]
+
+    slips, stages["detect_phase_slips"] = measure(detect_phase_slips, args.repeat, rows)
+    stages["detect_phase_slips"]["slips"] = sum(len(indices) for indices in slips)
+
+    png = os.path.join(folder, "graph.png")
+    _, stages["plot_graph"] = measure(
+        lambda: plotter.plot_graph(f"{args.prn} {code1}/{code2}", "blue", True, output_path=png),
+        args.repeat, rows, tree_size)
+    return {"file": os.path.basename(path), "file_mb": round(size / MB, 2), "epochs": epochs, "stages": stages}
+
+
+# --------------------baseline--------------------
+
+def regressions(results, baseline, threshold, rss_threshold):
+    """Lines describing every stage slower or heavier than in `baseline` beyond the thresholds."""
+    found = []
+    for name, dataset in results["datasets"].items():
+        before = baseline.get("datasets", {}).get(name, {}).get("stages", {})
+        for stage, now in dataset["stages"].items():
+            if stage not in before:
+                continue
+            then = before[stage]
+            if then["seconds"] and now["seconds"] > then["seconds"] * (1 + threshold):
+                found.append(f"{name}/{stage}: {then['seconds']:.3f} s -> {now['seconds']:.3f} s "
+                             f"(+{now['seconds'] / then['seconds'] - 1:.0%})")
+            if then["peak_rss_mb"] and now["peak_rss_mb"] > then["peak_rss_mb"] * (1 + rss_threshold):
+                found.append(f"{name}/{stage}: peak RSS {then['peak_rss_mb']:.0f} MB -> {now['peak_rss_mb']:.0f} MB "
+                             f"(+{now['peak_rss_mb'] / then['peak_rss_mb'] - 1:.0%})")
+    return found
+
+
+def warm_up():
+    """Load what the app imports lazily, so the first timed run does not pay for it."""
+    for module in LAZY_IMPORTS:
+        importlib.import_module(module)
+
+
+def environment():
+    return {"python": platform.python_version(), "numpy": np.__version__, "platform": platform.platform(),
+            "cpus": os.cpu_count(), "date": datetime.datetime.now().isoformat(timespec="seconds")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--datasets", default=",".join(DATASETS), help=f"comma separated, of {', '.join(DATASETS)}")
+    parser.add_argument("--hours", type=float, default=6, help="length of the 1 Hz dataset")
+    parser.add_argument("--days", type=int, default=7, help="length of the multi-day dataset")
+    parser.add_argument("--prn", default="I02", help="satellite extracted and plotted")
+    parser.add_argument("--codes", default="L5C,L9C", help="two carrier phase codes of the satellite")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per stage, the fastest is kept")
+    parser.add_argument("--output", help="write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results of an earlier run to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed slow-down, 0.2 = 20%%")
+    parser.add_argument("--rss-threshold", type=float, default=0.2, help="allowed peak RSS growth")
+    args = parser.parse_args()
+    args.codes = args.codes.upper().split(",")
+    names = args.datasets.split(",")
+    unknown = set(names) - set(DATASETS)
+    if unknown or len(args.codes) != 2:
+        parser.error(f"unknown dataset(s) {', '.join(sorted(unknown))}" if unknown else "--codes needs two codes")
+
+    results = {"environment": environment(), "repeat": args.repeat,
+               "parameters": {"hours": args.hours, "days": args.days, "prn": args.prn, "codes": args.codes},
+               "datasets": {}}
+    warm_up()
+    for name in names:
+        with tempfile.TemporaryDirectory() as folder:
+            path = build_dataset(name, folder, args)
+            dataset = results["datasets"][name] = run_stages(path, folder, args)
+        print(f"{name}: {dataset['file_mb']:.1f} MB, {dataset['epochs']} epochs")
+        for stage, figures in dataset["stages"].items():
+            rate = f"{figures['mb_per_s']:8.1f} MB/s" if figures["mb_per_s"] else " " * 13
+            print(f"  {stage:<28} {figures['seconds']:8.3f} s {figures['epochs_per_s']:12.0f} epochs/s "
+                  f"{rate} {figures['peak_rss_mb']:7.0f} MB peak")
+
+    if args.output:
+        with open(args.output, "w") as fh:
+            json.dump(results, fh, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as fh:
+            found = regressions(results, json.load(fh), args.threshold, args.rss_threshold)
+        for line in found:
+            print("REGRESSION " + line)
+        if found:
+            sys.exit(1)
+        print(f"no regression against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,6 +4,8 @@ import matplotlib.dates as mdates
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
+from signal_core.slips import combination_slips, distance_slips
+
 def validate_and_load_file():
         """Prompt user to select a CSV file, validate its structure, and load it into a DataFrame."""
         root = tk.Tk()
@@ -36,9 +38,10 @@ def validate_and_load_file():
 
 df = validate_and_load_file()
 if df is not None:
-        threshold = 5  # Adjust threshold for phase slips
-        df['Phase_Slip_1'] = df['Carrier_Phase_1'].diff().abs() > threshold
-        df['Phase_Slip_2'] = df['Carrier_Phase_2'].diff().abs() > threshold
+        # Shared slip engine (see signal_core/slips.py); LLI and GF/MW columns are used when present
+        pair_slips = combination_slips(df['GF'], df.get('MW_CYCLES')) if 'GF' in df.columns else 0
+        df['Phase_Slip_1'] = (distance_slips(df['Carrier_Phase_1'], df.get('LLI_1')) | pair_slips) != 0
+        df['Phase_Slip_2'] = (distance_slips(df['Carrier_Phase_2'], df.get('LLI_2')) | pair_slips) != 0
 
         fig, ax = plt.subplots(figsize=(12, 6))
         ax.plot(df['Time'], df['Carrier_Phase_1'], label='Carrier Phase 1', color='orange')
@@ -0,0 +1,109 @@
+"""Render carrier phase graphs of many series at once, headless and in parallel.
+
+The source is either a directory of series CSVs in the app's layout (e.g. a
+job's series folder), or a processed store or archive with an optional
+selection of PRNs and observation codes. Graphs are drawn with the same
+code as the web app, one PNG per series, on a process pool.
+
+    python plot_series.py processed/jobs/<id>/series -o qc/
+    python plot_series.py processed/jobs/<id>/archive -o qc/ [--select I06:L5C,L9C] [--pair L5C,L9C]
+
+With --analysis, the sigma-phi, S4, ROT and ROTI of every selected PRN
+are also written per window to <output>/analysis.csv (see
+signal_core/analysis.py); --no-graphs writes only that file.
+"""
+import argparse
+import glob
+import os
+import time
+
+from signal_core.analysis import CUTOFF, WINDOW, store_analysis, write_analysis
+from signal_core.batch import ALL, is_carrier_phase, select_keys
+from signal_core.combinations import NAVIC_PHASES
+from signal_core.graphs import GraphPlotter, render_series
+from signal_core.series import open_observations
+
+
+def parse_selection(values):
+    """["I06:L5C,L9C", "I10"] -> [("I06", ["L5C", "L9C"]), ("I10", "all")]"""
+    if not values:
+        return ALL
+    selection = []
+    for value in values:
+        prn, _, codes = value.partition(":")
+        selection.append((prn, codes.split(",") if codes else ALL))
+    return selection
+
+
+def csv_tasks(directory, output, options):
+    tasks = []
+    for path in sorted(glob.glob(os.path.join(directory, "*.csv"))):
+        name = os.path.splitext(os.path.basename(path))[0]
+        tasks.append(dict(options, csv=path, title=name, output=os.path.join(output, name + ".png")))
+    return tasks
+
+
+def store_tasks(path, store, output, selection, pair, options):
+    """One single-frequency graph per selected carrier phase, or one per PRN with both codes of `pair`."""
+    keys = [key for key in select_keys(store, selection) if is_carrier_phase(key[1])]
+    if pair:
+        present = set(keys)
+        prns = sorted({prn for prn, _ in keys if all((prn, code) in present for code in pair)})
+        return [dict(options, store=path, prn=prn, codes=list(pair), title=f"{prn} {pair[0]} / {pair[1]}",
+                     output=os.path.join(output, f"{prn}_{pair[0]}_{pair[1]}.png")) for prn in prns]
+    return [dict(options, store=path, prn=prn, codes=[code], title=f"{prn} {code}",
+                 output=os.path.join(output, f"{prn}_{code}.png")) for prn, code in sorted(keys)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="directory of series CSVs, or a processed store / archive")
+    parser.add_argument("-o", "--output", required=True, help="directory for the PNG files")
+    parser.add_argument("--select", action="append", metavar="PRN[:CODE,...]",
+                        help="series to draw from a store (repeatable, default all carrier phases)")
+    parser.add_argument("--pair", default=None, metavar="CODE1,CODE2",
+                        help="draw double graphs of these two carrier phases per PRN")
+    parser.add_argument("--no-slips", action="store_true", help="do not detect and mark phase slips")
+    parser.add_argument("--k-sigma", type=float, default=GraphPlotter.SLIP_K_SIGMA,
+                        help="slip threshold in robust standard deviations of each series' noise")
+    parser.add_argument("--workers", type=int, default=None, help="processes (default one per CPU)")
+    parser.add_argument("--analysis", action="store_true",
+                        help="also write per-window scintillation and ROT statistics to analysis.csv")
+    parser.add_argument("--window", type=float, default=WINDOW, help="analysis window in seconds")
+    parser.add_argument("--cutoff", type=float, default=CUTOFF, help="analysis high-pass cutoff in Hz")
+    parser.add_argument("--no-graphs", action="store_true", help="do not draw graphs")
+    args = parser.parse_args()
+
+    options = {"detect_phase": not args.no_slips, "k_sigma": args.k_sigma}
+    os.makedirs(args.output, exist_ok=True)
+    store = open_observations(args.source)
+    if store is not None:
+        pair = [code.upper() for code in args.pair.split(",")] if args.pair else None
+        if pair and len(pair) != 2:
+            parser.error("--pair takes two codes, e.g. L5C,L9C")
+        tasks = store_tasks(args.source, store, args.output, parse_selection(args.select), pair, options)
+    elif os.path.isdir(args.source):
+        tasks = csv_tasks(args.source, args.output, options)
+    else:
+        parser.error(f"{args.source} is neither a store, an archive nor a directory")
+
+    if args.analysis:
+        if store is None:
+            parser.error("--analysis needs a processed store or archive")
+        started = time.perf_counter()
+        selection = parse_selection(args.select)
+        prns = None if selection == ALL else [prn.upper() for prn, _ in selection]
+        result = store_analysis(store, pair or NAVIC_PHASES, prns=prns, window=args.window, cutoff=args.cutoff)
+        path = os.path.join(args.output, "analysis.csv")
+        rows = write_analysis(result, path)
+        print(f"{rows} windows of {len(result['PRN'])} PRNs written to {path} in {time.perf_counter() - started:.1f} s")
+    if args.no_graphs:
+        return
+
+    started = time.perf_counter()
+    written = [path for path in render_series(tasks, args.workers) if path]
+    print(f"{len(written)} of {len(tasks)} graphs written to {args.output} in {time.perf_counter() - started:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,75 @@
+"""Replay a RINEX observation file epoch by epoch, as a receiver would write it.
+
+Writes the header, then one epoch every `interval / speed` seconds, either
+appended to a file (by default processed/live/<name>, which the /live page
+follows) or sent to the first client of a local TCP port.
+
+    python replay_rinex.py uploads/NPLI0240.25O [--speed 60] [--port 5001] [--output path]
+"""
+import argparse
+import os
+import socket
+import time
+
+from signal_core.rinex import RinexHeader
+
+LIVE_FOLDER = os.path.join("processed", "live")
+
+
+def read_epochs(path):
+    """Header bytes, interval (s) and the list of epoch blocks of a RINEX 3 file."""
+    with open(path, "rb") as fh:
+        header = RinexHeader()
+        header_lines = []
+        for line in fh:
+            header_lines.append(line)
+            if header.parse_line(line.decode("ascii", "replace").rstrip("\r\n")):
+                break
+        epochs = []
+        for line in fh:
+            if line.startswith(b">") or not epochs:
+                epochs.append([])
+            epochs[-1].append(line)
+    return b"".join(header_lines), header.interval, [b"".join(block) for block in epochs]
+
+
+def replay(header, epochs, write, delay):
+    write(header)
+    started = time.monotonic()
+    for count, block in enumerate(epochs):
+        time.sleep(max(0.0, started + count * delay - time.monotonic()))
+        write(block)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("rinex")
+    parser.add_argument("--speed", type=float, default=60.0, help="replay speed-up over real time")
+    parser.add_argument("--port", type=int, default=None, help="serve on this local TCP port instead of a file")
+    parser.add_argument("--output", default=None, help="file to append to (default processed/live/<name>)")
+    args = parser.parse_args()
+
+    header, interval, epochs = read_epochs(args.rinex)
+    delay = (interval or 1.0) / args.speed
+    print(f"{len(epochs)} epochs, one every {delay:.3f} s")
+
+    if args.port is not None:
+        with socket.create_server(("127.0.0.1", args.port)) as server:
+            print(f"Waiting for a client on 127.0.0.1:{args.port}")
+            conn, _ = server.accept()
+            with conn:
+                replay(header, epochs, conn.sendall, delay)
+        return
+
+    output = args.output or os.path.join(LIVE_FOLDER, os.path.basename(args.rinex))
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    with open(output, "wb") as fh:
+        def write(data):
+            fh.write(data)
+            fh.flush()
+        print(f"Writing {output}")
+        replay(header, epochs, write, delay)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,9 @@
+"""Headless processing core for the Signal Analysis Visualization app.
+
+Everything in this package works on typed NumPy columns and has no GUI
+dependencies, so it can be shared by the Flask app and the plotting scripts.
+"""
+
+from .rinex import ObservationColumns, RinexHeader, parse_rinex
+
+__all__ = ["ObservationColumns", "RinexHeader", "parse_rinex"]
@@ -0,0 +1,113 @@
+"""Epoch alignment on the observation interval grid.
+
+Epochs are mapped to integer slots on the grid defined by the file's
+INTERVAL (30 s for the NPLI files): slot = (epoch - start) / interval.
+For a store, the interval and the grid origin (TIME OF FIRST OBS) are read
+from what was recorded when it was written, not worked out from the data.
+Aligning several series is then one array assignment per series, O(n),
+instead of a hash join on timestamps. Slots with no sample stay NaN, so a
+data gap is visible as such and never mistaken for a jump in the data.
+"""
+import numpy as np
+
+from .rinex import NS_PER_SECOND
+
+
+def header_interval(header):
+    """INTERVAL of a RinexHeader in nanoseconds, None if the header has none."""
+    interval = getattr(header, "interval", None) if header is not None else None
+    if not interval:
+        return None
+    return int(round(interval * NS_PER_SECOND))
+
+
+def infer_interval(epoch_arrays):
+    """Smallest positive step between consecutive epochs of any series, in ns."""
+    steps = [np.diff(epochs) for epochs in epoch_arrays if len(epochs) > 1]
+    steps = [step[step > 0] for step in steps]
+    steps = [step.min() for step in steps if step.size]
+    return int(min(steps)) if steps else None
+
+
+class EpochGrid:
+    """Regular epoch grid: `size` slots of `interval` ns from `start` ns."""
+
+    def __init__(self, start, interval, size):
+        self.start = int(start)
+        self.interval = int(interval)
+        self.size = int(size)
+
+    @classmethod
+    def covering(cls, epoch_arrays, interval=None, origin=None):
+        """Smallest grid holding every epoch of the given (sorted) arrays.
+
+        `interval` is in ns; without it the step is inferred from the data.
+        With an `origin` (ns) the grid's slots fall on origin + k * interval,
+        so grids of different series of one file share their slot times.
+        """
+        epoch_arrays = [epochs for epochs in epoch_arrays if len(epochs)]
+        if not epoch_arrays:
+            return cls(0, interval or 1, 0)
+        interval = interval or infer_interval(epoch_arrays) or 1
+        start = min(int(epochs[0]) for epochs in epoch_arrays)
+        end = max(int(epochs[-1]) for epochs in epoch_arrays)
+        if origin is not None:
+            start = origin + (start - origin + interval // 2) // interval * interval
+        return cls(start, interval, (end - start + interval // 2) // interval + 1)
+
+    def __len__(self):
+        return self.size
+
+    @property
+    def epochs(self):
+        return self.start + np.arange(self.size, dtype=np.int64) * self.interval
+
+    def slots(self, epochs):
+        """Grid slot of each epoch, rounded to the nearest slot.
+
+        Receivers may stamp epochs a few ms off the nominal grid; those are
+        snapped to the closest slot rather than dropped.
+        """
+        offset = np.asarray(epochs, dtype=np.int64) - self.start
+        return (offset + self.interval // 2) // self.interval
+
+    def place(self, epochs, values, fill=np.nan):
+        """Scatter `values` into a grid-sized array, `fill` where no sample."""
+        values = np.asarray(values)
+        out = np.full(self.size, fill, dtype=np.result_type(values.dtype, np.asarray(fill).dtype))
+        slots = self.slots(epochs)
+        inside = (slots >= 0) & (slots < self.size)
+        out[slots[inside]] = values[inside]
+        return out
+
+
+def align(series, interval=None, origin=None):
+    """Align (epochs, values) pairs on one grid.
+
+    Returns the grid and one NaN-filled array per series.
+    """
+    grid = EpochGrid.covering([epochs for epochs, _ in series], interval, origin)
+    return grid, [grid.place(epochs, values) for epochs, values in series]
+
+
+def store_interval(store):
+    """Grid interval of a store or archive in ns, as recorded when it was written."""
+    interval = getattr(store, "interval", None)
+    return interval or header_interval(store.header)
+
+
+def store_origin(store):
+    """Grid origin of a store or archive in ns: its TIME OF FIRST OBS, else its first epoch."""
+    origin = getattr(store.header, "time_of_first_obs", None) if store.header is not None else None
+    return origin if origin is not None else getattr(store, "first_epoch", None)
+
+
+def store_grid(store, epoch_arrays):
+    """Grid of a store covering the given epoch arrays."""
+    return EpochGrid.covering(epoch_arrays, store_interval(store), store_origin(store))
+
+
+def align_store(store, keys, interval=None):
+    """Align the series of several (PRN, code) keys of a store on one grid."""
+    interval = interval or store_interval(store)
+    return align([store.series(prn, code) for prn, code in keys], interval, store_origin(store))
@@ -0,0 +1,229 @@
+"""Scintillation and rolling-window analytics of every PRN of a store.
+
+Like store_combinations and store_slips, every series is placed on the
+store's epoch grid and the work is done on PRN x epoch matrices, so all
+satellites go through each step in one NumPy call:
+
+    detrended phase   zero-phase Butterworth high-pass of the carrier phase
+                      (radians), applied as a gain on its FFT
+    sigma-phi         standard deviation of the detrended phase per window
+    S4                standard deviation over mean of the detrended signal
+                      intensity (10^(SNR/10), divided by its low-pass trend)
+    ROT / ROTI        rate of TEC (TECU/min) from the geometry-free phase of
+                      a dual-frequency pair, its mean and standard deviation
+                      per window
+
+Window statistics come from cumulative sums: a window's sum is the
+difference of two running sums, so the cost is O(n) whatever the window
+length and step, with no Python loop over windows. Missing samples are
+NaN; the filters bridge them by linear interpolation and they are NaN
+again in every output. Phases are not repaired for cycle slips, so a
+window holding a slip or a re-lock has an inflated sigma-phi.
+
+The filter cutoff and the window are meant for 50 Hz-class data (0.1 Hz,
+60 s). For slower data the cutoff is lowered to a quarter of the sampling
+rate and windows hold at least MIN_WINDOW samples; the values used are
+returned with the result.
+"""
+import numpy as np
+
+from .align import store_grid
+from .combinations import NAVIC_PHASES, dual_frequency, frequency
+from .rinex import NS_PER_SECOND
+
+NAVIC_SNR = ("S5C", "S9C")
+WINDOW = 60.0  # seconds per window
+CUTOFF = 0.1  # Hz, high-pass cutoff of the detrending filter
+FILTER_ORDER = 6  # Butterworth order
+MIN_WINDOW = 4  # samples per window at the least
+MIN_FILL = 0.5  # share of a window's samples needed for its statistics
+MAX_CUTOFF_SHARE = 0.25  # highest cutoff, as a share of the sampling rate
+IONO_K = 40.3  # m^3/s^2, first-order ionospheric delay constant
+TECU = 1e16  # electrons/m^2
+
+
+def fill_gaps(x):
+    """Rows of `x` with their NaNs linearly interpolated, edges held; all-NaN rows become 0."""
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    valid = ~np.isnan(x)
+    index = np.arange(n)
+    before = np.maximum.accumulate(np.where(valid, index, -1), axis=-1)
+    after = np.minimum.accumulate(np.where(valid, index, n)[..., ::-1], axis=-1)[..., ::-1]
+    before, after = np.where(before < 0, after, before), np.where(after >= n, before, after)
+    before, after = np.clip(before, 0, n - 1), np.clip(after, 0, n - 1)
+    low, high = np.take_along_axis(x, before, -1), np.take_along_axis(x, after, -1)
+    span = after - before
+    weight = np.where(span > 0, (index - before) / np.maximum(span, 1), 0.0)
+    return np.where(valid, x, np.nan_to_num(low + (high - low) * weight))
+
+
+def highpass(x, rate, cutoff=CUTOFF, order=FILTER_ORDER):
+    """Zero-phase Butterworth high-pass of the rows of `x` sampled at `rate` Hz.
+
+    The magnitude response of an `order` Butterworth filter is applied to
+    the FFT of every row at once. The line through each row's first and
+    last sample is removed first, and rows are zero-padded by a few cutoff
+    periods, so the wrap-around of the FFT does not leak into the ends.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    if n < 2:
+        return np.full(x.shape, np.nan)
+    missing = np.isnan(x)
+    filled = fill_gaps(x)
+    filled -= filled[..., :1] + (filled[..., -1:] - filled[..., :1]) * (np.arange(n) / (n - 1))
+    size = 1 << int(np.ceil(np.log2(n + 4 * int(np.ceil(rate / cutoff)))))
+    ratio = np.fft.rfftfreq(size, 1.0 / rate) / cutoff
+    gain = ratio ** order / np.sqrt(1.0 + ratio ** (2 * order))
+    out = np.fft.irfft(np.fft.rfft(filled, size, axis=-1) * gain, size, axis=-1)[..., :n]
+    out[missing] = np.nan
+    return out
+
+
+def window_starts(n, window, step=None):
+    """First sample of every whole window of `window` samples, every `step` samples."""
+    return np.arange(0, max(n - window + 1, 0), step or window)
+
+
+def window_stats(x, window, step=None, min_fill=MIN_FILL):
+    """Count, mean and standard deviation of the windows of window_starts, along the last axis.
+
+    NaN samples are skipped; windows with fewer than `min_fill` of their
+    samples present have a NaN mean and std. Values are shifted by their
+    row mean before the running sums, which keeps the variance exact for
+    series far from zero.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    starts = window_starts(x.shape[-1], window, step)
+    valid = ~np.isnan(x)
+    present = valid.sum(axis=-1, keepdims=True)
+    reference = np.where(valid, x, 0.0).sum(axis=-1, keepdims=True) / np.maximum(present, 1)
+    shifted = np.where(valid, x - reference, 0.0)
+
+    def windowed(values):
+        running = np.zeros(values.shape[:-1] + (values.shape[-1] + 1,))
+        np.cumsum(values, axis=-1, out=running[..., 1:])
+        return running[..., starts + window] - running[..., starts]
+
+    count = windowed(valid.astype(np.float64))
+    total, squares = windowed(shifted), windowed(shifted * shifted)
+    enough = count >= min_fill * window
+    with np.errstate(invalid="ignore", divide="ignore"):
+        mean = total / count
+        std = np.sqrt(np.maximum(squares / count - mean * mean, 0.0))
+    return {"count": count.astype(np.int64), "mean": np.where(enough, mean + reference, np.nan),
+            "std": np.where(enough, std, np.nan)}
+
+
+def detrended_phase(phase, rate, cutoff=CUTOFF):
+    """High-passed carrier phase in radians, from phase in cycles."""
+    return highpass(2 * np.pi * np.asarray(phase, dtype=np.float64), rate, cutoff)
+
+
+def detrended_intensity(snr, rate, cutoff=CUTOFF):
+    """Signal intensity 10^(SNR/10) divided by its low-pass trend (the high-pass complement)."""
+    intensity = 10.0 ** (np.asarray(snr, dtype=np.float64) / 10.0)
+    trend = intensity - highpass(intensity, rate, cutoff)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return intensity / trend
+
+
+def sigma_phi(phase, rate, window, step=None, cutoff=CUTOFF):
+    """Phase scintillation index (radians) of every window, from phase in cycles."""
+    return window_stats(detrended_phase(phase, rate, cutoff), window, step)["std"]
+
+
+def s4(snr, rate, window, step=None, cutoff=CUTOFF):
+    """Amplitude scintillation index of every window, from SNR (C/N0) in dB-Hz."""
+    stats = window_stats(detrended_intensity(snr, rate, cutoff), window, step)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return stats["std"] / stats["mean"]
+
+
+def slant_tec(gf, freq1, freq2):
+    """Relative slant TEC (TECU) from the geometry-free phase L1 - L2 in metres."""
+    sq1, sq2 = freq1 * freq1, freq2 * freq2
+    return np.asarray(gf, dtype=np.float64) * sq1 * sq2 / (IONO_K * (sq1 - sq2)) / TECU
+
+
+def rate_of_tec(tec, interval):
+    """TECU per minute between consecutive epochs `interval` seconds apart; NaN at the first."""
+    tec = np.asarray(tec, dtype=np.float64)
+    rot = np.full(tec.shape, np.nan)
+    rot[..., 1:] = np.diff(tec, axis=-1) * (60.0 / interval)
+    return rot
+
+
+def store_analysis(store, phases=NAVIC_PHASES, snr_codes=NAVIC_SNR, prns=None, window=WINDOW, step=None,
+                   cutoff=CUTOFF, start=None, end=None):
+    """Windowed scintillation and TEC statistics of every PRN of a store.
+
+    `window` and `step` are in seconds (step defaults to the window).
+    Returns a dict with PRN (row labels), EPOCH (window starts in ns),
+    the WINDOW, STEP and CUTOFF used, and PRN x window matrices:
+    SIGMA_PHI_<phase> (rad), S4_<snr code>, SNR_<snr code> (mean, dB-Hz),
+    and ROT and ROTI (TECU/min) when both phases of the pair are present.
+    """
+    codes = list(phases) + list(snr_codes)
+    available = set(store.keys())
+    if prns is None:
+        prns = sorted({prn for prn, _ in available})
+    prns = [prn for prn in prns if any((prn, code) in available for code in codes)]
+    series = {(prn, code): store.series(prn, code, start=start, end=end)
+              for prn in prns for code in codes if (prn, code) in available}
+    grid = store_grid(store, [epochs for epochs, _ in series.values()])
+    interval = grid.interval / NS_PER_SECOND
+    rate = 1.0 / interval
+    cutoff = min(cutoff, MAX_CUTOFF_SHARE * rate)
+    samples = max(int(round(window / interval)), MIN_WINDOW)
+    step_samples = max(int(round(step / interval)), 1) if step else samples
+    matrices = {}
+    for (prn, code), (epochs, values) in series.items():
+        # 0.000 is what receivers write for a value they do not have
+        matrix = matrices.setdefault(code, np.full((len(prns), grid.size), np.nan))
+        matrix[prns.index(prn)] = grid.place(epochs, np.where(values == 0, np.nan, values))
+
+    result = {"PRN": prns, "EPOCH": grid.epochs[window_starts(grid.size, samples, step_samples)],
+              "WINDOW": samples * interval, "STEP": step_samples * interval, "CUTOFF": cutoff}
+    for code in phases:
+        if code in matrices:
+            result[f"SIGMA_PHI_{code}"] = sigma_phi(matrices[code], rate, samples, step_samples, cutoff)
+    for code in snr_codes:
+        if code in matrices:
+            result[f"S4_{code}"] = s4(matrices[code], rate, samples, step_samples, cutoff)
+            result[f"SNR_{code}"] = window_stats(matrices[code], samples, step_samples)["mean"]
+    freqs = [frequency(code) for code in phases]
+    if len(phases) == 2 and all(code in matrices for code in phases) and None not in freqs and freqs[0] != freqs[1]:
+        gf = dual_frequency(matrices[phases[0]], matrices[phases[1]], *freqs)["GF"]
+        stats = window_stats(rate_of_tec(slant_tec(gf, *freqs), interval), samples, step_samples)
+        result["ROT"], result["ROTI"] = stats["mean"], stats["std"]
+    return result
+
+
+def analysis_columns(result):
+    """Names of the PRN x window matrices of a store_analysis result."""
+    return [name for name, value in result.items() if isinstance(value, np.ndarray) and value.ndim == 2]
+
+
+def write_analysis(result, path):
+    """Write a store_analysis result as one long CSV: Time, PRN and one column per statistic."""
+    import pandas as pd
+
+    prns, epochs = result["PRN"], result["EPOCH"]
+    frame = pd.DataFrame({"Time": np.tile(epochs.view("datetime64[ns]"), len(prns)),
+                          "PRN": np.repeat(np.asarray(prns, dtype="<U3"), len(epochs))})
+    for name in analysis_columns(result):
+        frame[name] = result[name].ravel()
+    frame.to_csv(path, index=False)
+    return len(frame)
+
+
+def analysis_json(result):
+    """A store_analysis result as JSON-ready lists, NaN as None."""
+    summary = {"prns": result["PRN"], "epochs": result["EPOCH"].tolist(), "window": result["WINDOW"],
+               "step": result["STEP"], "cutoff": result["CUTOFF"], "columns": {}}
+    for name in analysis_columns(result):
+        matrix = result[name]
+        summary["columns"][name] = np.where(np.isnan(matrix), None, matrix.round(6)).tolist()
+    return summary
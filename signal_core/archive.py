@@ -0,0 +1,231 @@
+"""Append-only archive of ingested RINEX files.
+
+Each ingested file is identified by the SHA-256 of its content and stored
+as its own partitioned store (see store.py) under ``stores/``. The manifest
+lists the stores in epoch order, so adding a new day only parses that day
+and appends its segments; nothing already in the archive is re-read or
+re-sorted.
+
+    <root>/manifest.json
+    <root>/stores/<sha256[:16]>.obs/
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+
+from .parallel import map_files
+from .qc import merge
+from .rinex import merge_sorted
+from .store import ObservationStore, write_rinex_store
+
+ARCHIVE_FORMAT = "signal_core.archive"
+ARCHIVE_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+STORES_FOLDER = "stores"
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def is_archive(path):
+    return os.path.isfile(os.path.join(path, MANIFEST_FILE))
+
+
+class ObservationArchive:
+    """Epoch-ordered collection of per-file stores with content-hash dedup.
+
+    Reads follow the ObservationStore interface (keys, series), so routes
+    can use either one.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        os.makedirs(os.path.join(root, STORES_FOLDER), exist_ok=True)
+        manifest_path = os.path.join(root, MANIFEST_FILE)
+        if os.path.isfile(manifest_path):
+            with open(manifest_path) as fh:
+                manifest = json.load(fh)
+            if manifest.get("format") != ARCHIVE_FORMAT:
+                raise ValueError(f"{root} is not an observation archive")
+            self.entries = manifest["files"]
+        else:
+            self.entries = []
+        self._stores = {}
+
+    @property
+    def hashes(self):
+        return {entry["sha256"] for entry in self.entries}
+
+    def ingest(self, paths, workers=None, progress_dir=None):
+        """Add files not yet in the archive, returns the new manifest entries.
+
+        New files are streamed into their stores in parallel, one worker per
+        file. With `progress_dir`, every file reports its bytes read and
+        epochs parsed in ``<progress_dir>/<n>.json`` (see read_progress).
+        """
+        known = self.hashes
+        tasks = []
+        for n, path in enumerate(paths):
+            progress_path = os.path.join(progress_dir, f"{n}.json") if progress_dir else None
+            digest = file_sha256(path)
+            if digest in known:
+                # Already ingested: report it as read in full.
+                if progress_path:
+                    size = os.path.getsize(path)
+                    _write_progress(progress_path, size, size, 0)
+                continue
+            known.add(digest)
+            if progress_path:
+                _write_progress(progress_path, 0, os.path.getsize(path), 0)
+            tasks.append((path, digest, self.root, progress_path))
+        added = [entry for entry in map_files(_ingest_file, tasks, workers) if entry is not None]
+        if added:
+            self.entries = sorted(self.entries + added, key=lambda entry: entry["first_epoch"])
+            self._save()
+        return added
+
+    def _save(self):
+        manifest = {"format": ARCHIVE_FORMAT, "version": ARCHIVE_VERSION, "files": self.entries}
+        staging = os.path.join(self.root, MANIFEST_FILE + ".tmp")
+        with open(staging, "w") as fh:
+            json.dump(manifest, fh, indent=1)
+        os.replace(staging, os.path.join(self.root, MANIFEST_FILE))
+
+    def store(self, entry):
+        store = self._stores.get(entry["sha256"])
+        if store is None:
+            store = self._stores[entry["sha256"]] = ObservationStore(os.path.join(self.root, entry["store"]))
+        return store
+
+    def _entries_between(self, start, end):
+        return [entry for entry in self.entries
+                if (start is None or entry["last_epoch"] >= start) and (end is None or entry["first_epoch"] <= end)]
+
+    def __len__(self):
+        return sum(entry["rows"] for entry in self.entries)
+
+    @property
+    def header(self):
+        return self.store(self.entries[0]).header if self.entries else None
+
+    @property
+    def interval(self):
+        """Finest epoch grid step of the stored files, in ns."""
+        intervals = [self.store(entry).interval for entry in self.entries]
+        intervals = [interval for interval in intervals if interval]
+        return min(intervals) if intervals else None
+
+    @property
+    def first_epoch(self):
+        return self.entries[0]["first_epoch"] if self.entries else None
+
+    @property
+    def last_epoch(self):
+        return max(entry["last_epoch"] for entry in self.entries) if self.entries else None
+
+    @property
+    def qc_bucket(self):
+        buckets = {self.store(entry).qc_bucket for entry in self.entries} - {None}
+        return buckets.pop() if len(buckets) == 1 else None
+
+    def qc(self, start=None, end=None):
+        """QC table of every stored file, buckets shared by several files added up."""
+        return merge([self.store(entry).qc(start, end) for entry in self._entries_between(start, end)])
+
+    @property
+    def prns(self):
+        return _union(self.store(entry).prns for entry in self.entries)
+
+    @property
+    def obs_codes(self):
+        return _union(self.store(entry).obs_codes for entry in self.entries)
+
+    def keys(self):
+        return _union(self.store(entry).keys() for entry in self.entries)
+
+    def series(self, prn, obs_code, columns=("epoch", "value"), start=None, end=None):
+        """One series across every stored file, in epoch order."""
+        entries = self._entries_between(start, end)
+        parts = [self.store(entry).series(prn, obs_code, _with_epoch(columns), start, end) for entry in entries]
+        parts = [part for part in parts if len(part[0])]
+        if not parts:
+            return ObservationStore.empty_series(columns)
+        if len(parts) == 1:
+            arrays = parts[0]
+        else:
+            # Files follow each other in time, so this is normally a plain
+            # concatenation; overlapping files are k-way merged.
+            names = _with_epoch(columns)
+            arrays = merge_sorted([dict(zip(names, part)) for part in parts])
+            arrays = [arrays[name] for name in names]
+        named = dict(zip(_with_epoch(columns), arrays))
+        return tuple(named[name] for name in columns)
+
+
+def _ingest_file(task):
+    """Worker: stream one file into its store, returns its manifest entry."""
+    path, digest, root, progress_path = task
+    store_name = os.path.join(STORES_FOLDER, digest[:16] + ".obs")
+    store_path = os.path.join(root, store_name)
+    size = os.path.getsize(path)
+
+    def report(bytes_read, epochs):
+        _write_progress(progress_path, bytes_read, size, epochs)
+    writer = write_rinex_store(path, store_path, progress=report if progress_path else None)
+    if not writer.rows:
+        shutil.rmtree(store_path, ignore_errors=True)
+        return None
+    return {
+        "sha256": digest,
+        "name": os.path.basename(path),
+        "store": store_name,
+        "rows": writer.rows,
+        "first_epoch": writer.first_epoch,
+        "last_epoch": writer.last_epoch,
+        "ingested_at": int(time.time()),
+    }
+
+
+def read_progress(progress_dir):
+    """Sum of the progress files written by ingest(): bytes read, bytes total, epochs."""
+    totals = {"bytes_read": 0, "bytes_total": 0, "epochs": 0}
+    if not os.path.isdir(progress_dir):
+        return totals
+    for name in os.listdir(progress_dir):
+        if not name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(progress_dir, name)) as fh:
+                values = json.load(fh)
+        except (OSError, ValueError):
+            continue  # being replaced right now
+        for field in totals:
+            totals[field] += values.get(field, 0)
+    return totals
+
+
+def _write_progress(path, bytes_read, bytes_total, epochs):
+    staging = f"{path}.{os.getpid()}.tmp"
+    with open(staging, "w") as fh:
+        json.dump({"bytes_read": bytes_read, "bytes_total": bytes_total, "epochs": epochs}, fh)
+    os.replace(staging, path)
+
+
+def _with_epoch(columns):
+    return ("epoch",) + tuple(name for name in columns if name != "epoch")
+
+
+def _union(groups):
+    seen = {}
+    for group in groups:
+        for item in group:
+            seen.setdefault(item, None)
+    return list(seen)
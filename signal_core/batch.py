@@ -0,0 +1,106 @@
+"""Batch extraction of many (PRN, obs code) series at once.
+
+A selection is either "all" or a list of (PRN, codes) pairs, where codes is
+a list of observation codes or "all". Series are read straight from the
+store index, one key after the other, so extracting every PRN x code of a
+day is a single pass over the stored columns instead of one search per
+series. Results are written either as one long multi-series CSV or as a zip
+holding one CSV per series, in the same Time / Carrier_Phase layout the
+/csv page produces, with the receiver's LLI and SSI flags of every value.
+"""
+import zipfile
+
+import numpy as np
+
+from .combinations import carrier_distance, frequency
+
+ALL = "all"
+COMBINED = "combined"
+PER_SERIES = "per_series"
+LAYOUTS = (COMBINED, PER_SERIES)
+
+
+def select_keys(store, selection=ALL):
+    """Resolve a selection to the (PRN, code) keys present in `store`."""
+    available = store.keys()
+    if selection is None or selection == ALL:
+        return list(available)
+    present = set(available)
+    keys = {}
+    for prn, codes in selection:
+        prn = prn.upper()
+        if codes is None or codes == ALL:
+            wanted = [key for key in available if key[0] == prn]
+        else:
+            wanted = [(prn, code.upper()) for code in codes]
+        for key in wanted:
+            if key in present:
+                keys.setdefault(key, None)
+    return list(keys)
+
+
+def is_carrier_phase(obs_code):
+    return obs_code.upper().startswith("L")
+
+
+def iter_series(store, selection=ALL, start=None, end=None):
+    """Yield (prn, code, epochs, values, lli, ssi) for every selected key."""
+    for prn, code in select_keys(store, selection):
+        yield (prn, code) + tuple(store.series(prn, code, ("epoch", "value", "lli", "ssi"), start, end))
+
+
+def _series_columns(code, epochs, values, lli, ssi):
+    columns = {"Time": np.asarray(epochs).view("datetime64[ns]"), "Value": values}
+    freq = frequency(code) if is_carrier_phase(code) else None
+    if freq is not None:
+        columns["Carrier_Phase"] = carrier_distance(values, freq)
+    columns["LLI"] = lli
+    columns["SSI"] = ssi
+    return columns
+
+
+def write_combined(store, path, selection=ALL, start=None, end=None):
+    """Write every selected series to one long CSV, returns the row count.
+
+    Columns: Time, PRN, Obs_Type, Value, Carrier_Phase (empty for codes that
+    are not carrier phases), LLI, SSI.
+    """
+    import pandas as pd
+
+    parts = {"Time": [], "PRN": [], "Obs_Type": [], "Value": [], "Carrier_Phase": [], "LLI": [], "SSI": []}
+    for prn, code, epochs, values, lli, ssi in iter_series(store, selection, start, end):
+        columns = _series_columns(code, epochs, values, lli, ssi)
+        parts["Time"].append(columns["Time"])
+        parts["PRN"].append(np.full(len(values), prn, dtype="<U3"))
+        parts["Obs_Type"].append(np.full(len(values), code, dtype="<U3"))
+        parts["Value"].append(np.asarray(values))
+        parts["Carrier_Phase"].append(columns.get("Carrier_Phase", np.full(len(values), np.nan)))
+        parts["LLI"].append(np.asarray(lli))
+        parts["SSI"].append(np.asarray(ssi))
+    if parts["Time"]:
+        frame = pd.DataFrame({name: np.concatenate(arrays) for name, arrays in parts.items()})
+    else:
+        frame = pd.DataFrame(columns=list(parts))
+    frame.to_csv(path, index=False)
+    return len(frame)
+
+
+def write_per_series(store, path, selection=ALL, start=None, end=None):
+    """Write one <PRN>_<code>.csv per selected series into a zip, returns the file names."""
+    import pandas as pd
+
+    names = []
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for prn, code, epochs, values, lli, ssi in iter_series(store, selection, start, end):
+            name = f"{prn}_{code}.csv"
+            archive.writestr(name, pd.DataFrame(_series_columns(code, epochs, values, lli, ssi)).to_csv(index=False))
+            names.append(name)
+    return names
+
+
+def write_batch(store, path, selection=ALL, layout=COMBINED, start=None, end=None):
+    if layout == COMBINED:
+        return write_combined(store, path, selection, start, end)
+    if layout == PER_SERIES:
+        return write_per_series(store, path, selection, start, end)
+    raise ValueError(f"unknown layout {layout!r}, expected one of {LAYOUTS}")
@@ -0,0 +1,120 @@
+"""Carrier-phase conversion and dual-frequency combinations.
+
+Everything here is plain NumPy arithmetic on aligned arrays of any shape
+(one series, or a PRN x epoch matrix), so a whole day of every PRN is
+converted in one pass. Phases are in cycles and pseudoranges in metres, as
+stored in the RINEX file; missing samples are NaN and stay NaN.
+
+Combinations, for frequencies f1, f2 and phases L1, L2 in metres:
+
+    GF  geometry-free          L1 - L2
+    IF  ionosphere-free        (f1^2 L1 - f2^2 L2) / (f1^2 - f2^2)
+    WL  wide-lane              (f1 L1 - f2 L2) / (f1 - f2)
+    NL  narrow-lane            (f1 L1 + f2 L2) / (f1 + f2)
+    MW  Melbourne-Wubbena      WL - (f1 P1 + f2 P2) / (f1 + f2)
+"""
+import numpy as np
+
+from .align import store_grid
+
+C = 299792458  # Speed of light in m/s
+F1 = 1575.42e6  # L1
+F2 = 1227.60e6  # L2
+F5 = 1176.45e6  # L5
+F9 = 2492.028e6  # L9 (NavIC S-band)
+
+FREQUENCIES = {
+    "L1C": F1, "L2C": F2, "L5C": F5, "C5C": F5, "D5C": F5, "S5C": F5,
+    "C9C": F9, "L9C": F9, "D9C": F9, "S9C": F9, "P1": F1, "P2": F2, "P5": F5,
+    "L1L": F1, "L2L": F2
+}
+BAND_FREQUENCIES = {"1": F1, "2": F2, "5": F5, "9": F9}
+
+# Phase and matching code observations of the NavIC L5/S dual-frequency pair
+NAVIC_PHASES = ("L5C", "L9C")
+NAVIC_CODES = ("C5C", "C9C")
+
+COMBINATIONS = ("GF", "IF", "WL", "NL", "MW", "MW_CYCLES")
+
+
+def frequency(obs_code):
+    """Carrier frequency in Hz of an observation code, None if unknown.
+
+    Codes missing from FREQUENCIES fall back on their RINEX 3 band digit,
+    so L5A or C9A resolve like L5C and C9C.
+    """
+    obs_code = obs_code.upper()
+    if obs_code in FREQUENCIES:
+        return FREQUENCIES[obs_code]
+    if len(obs_code) == 3:
+        return BAND_FREQUENCIES.get(obs_code[1])
+    return None
+
+
+def wavelength(freq):
+    return C / freq
+
+
+def carrier_distance(cycles, freq):
+    """Carrier phase in cycles to the signed distance in km plotted by the app."""
+    return np.asarray(cycles, dtype=np.float64) * (-C / (freq * 1000))
+
+
+def phase_range(cycles, freq):
+    """Carrier phase in cycles to a phase range in metres."""
+    return np.asarray(cycles, dtype=np.float64) * (C / freq)
+
+
+def dual_frequency(phase1, phase2, freq1, freq2, code1=None, code2=None):
+    """Standard combinations of two aligned phase arrays, in metres.
+
+    Returns a dict with GF, IF, WL and NL, plus MW and MW_CYCLES (in
+    wide-lane cycles) when the matching pseudoranges are given.
+    """
+    l1 = phase_range(phase1, freq1)
+    l2 = phase_range(phase2, freq2)
+    sq1, sq2 = freq1 * freq1, freq2 * freq2
+    result = {
+        "GF": l1 - l2,
+        "IF": (sq1 * l1 - sq2 * l2) / (sq1 - sq2),
+        "WL": (freq1 * l1 - freq2 * l2) / (freq1 - freq2),
+        "NL": (freq1 * l1 + freq2 * l2) / (freq1 + freq2),
+    }
+    if code1 is not None and code2 is not None:
+        code1 = np.asarray(code1, dtype=np.float64)
+        code2 = np.asarray(code2, dtype=np.float64)
+        result["MW"] = result["WL"] - (freq1 * code1 + freq2 * code2) / (freq1 + freq2)
+        result["MW_CYCLES"] = result["MW"] / abs(wavelength(freq1 - freq2))
+    return result
+
+
+def store_combinations(store, phases=NAVIC_PHASES, codes=NAVIC_CODES, prns=None):
+    """Dual-frequency combinations for every PRN of a store in one pass.
+
+    `store` is anything with keys(), series() and header (ObservationStore
+    or ObservationArchive). Every series is placed on the store's epoch
+    grid (see align.py), giving PRN x epoch matrices that are converted
+    with a single call to dual_frequency. Returns a dict with PRN (row
+    labels), EPOCH (grid epochs in ns), the two phase ranges keyed by obs
+    code and the combinations. Missing samples are NaN.
+    """
+    freq1, freq2 = frequency(phases[0]), frequency(phases[1])
+    if freq1 is None or freq2 is None:
+        raise ValueError(f"unknown frequency for {phases}")
+    available = set(store.keys())
+    if prns is None:
+        prns = sorted({prn for prn, _ in available})
+    prns = [prn for prn in prns if all((prn, code) in available for code in phases)]
+    wanted = list(phases) + list(codes or ())
+    series = {(prn, code): store.series(prn, code) for prn in prns for code in wanted if (prn, code) in available}
+    grid = store_grid(store, [epochs for epochs, _ in series.values()])
+    matrices = {code: np.full((len(prns), grid.size), np.nan) for code in wanted}
+    for (prn, code), (epochs, values) in series.items():
+        # PRNs without a pseudorange keep a NaN row, so their MW is NaN
+        matrices[code][prns.index(prn)] = grid.place(epochs, values)
+    code1, code2 = (matrices[codes[0]], matrices[codes[1]]) if codes else (None, None)
+    result = {"PRN": prns, "EPOCH": grid.epochs,
+              phases[0]: phase_range(matrices[phases[0]], freq1),
+              phases[1]: phase_range(matrices[phases[1]], freq2)}
+    result.update(dual_frequency(matrices[phases[0]], matrices[phases[1]], freq1, freq2, code1, code2))
+    return result
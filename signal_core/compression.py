@@ -0,0 +1,116 @@
+"""Observation files read through their compression, as a stream.
+
+open_rinex(path) recognizes the container from its first bytes, not its
+name, and returns a binary file of the decompressed text:
+
+    gzip (.gz)           gzip module
+    bzip2 (.bz2)         bz2 module
+    zip (.zip)           first member of the archive
+    Unix compress (.Z)   piped through `gzip -dc` (the standard library cannot read it)
+
+Plain files are returned as they are. Nothing is written to disk and only
+one buffer of text is held at a time; whether the text is plain or compact
+(Hatanaka) RINEX is up to the parser, see rinex.py and hatanaka.py.
+"""
+import bz2
+import gzip
+import io
+import os
+import shutil
+import subprocess
+import zipfile
+
+GZIP_MAGIC = b"\x1f\x8b"
+BZIP2_MAGIC = b"BZh"
+ZIP_MAGIC = b"PK\x03\x04"
+COMPRESS_MAGIC = b"\x1f\x9d"
+READ_SIZE = 1 << 20  # bytes of decompressed text buffered
+
+
+def compression(head):
+    """'gzip', 'bzip2', 'zip' or 'compress' for the first bytes of a compressed file, else None."""
+    for name, magic in (("gzip", GZIP_MAGIC), ("bzip2", BZIP2_MAGIC), ("zip", ZIP_MAGIC),
+                        ("compress", COMPRESS_MAGIC)):
+        if head.startswith(magic):
+            return name
+    return None
+
+
+class DecompressedFile(io.RawIOBase):
+    """Raw reader of the decompressed contents of `source`, an open binary file."""
+
+    def __init__(self, source, stream, closing=(), process=None):
+        self.source = source
+        self._stream = stream
+        self._closing = closing  # opened on the way to `stream`, closed after it
+        self._process = process
+
+    def readable(self):
+        return True
+
+    def readinto(self, b):
+        count = self._stream.readinto(b)
+        if not count and self._process is not None and self._process.wait():
+            raise ValueError(f"gzip could not decompress {self.source.name}")
+        return count
+
+    def source_position(self):
+        """Compressed bytes consumed so far."""
+        return os.lseek(self.source.fileno(), 0, os.SEEK_CUR)
+
+    def close(self):
+        if self.closed:
+            return
+        try:
+            self._stream.close()
+            for item in self._closing:
+                item.close()
+            if self._process is not None:
+                if self._process.poll() is None:
+                    self._process.kill()
+                self._process.wait()
+        finally:
+            self.source.close()
+            super().close()
+
+
+def open_rinex(path):
+    """Binary file of the text of `path`, decompressed on the fly when it is compressed."""
+    source = open(path, "rb")
+    try:
+        kind = compression(source.peek(len(ZIP_MAGIC)))
+        if kind is None:
+            return source
+        raw = _decompressed(source, kind)
+    except BaseException:
+        source.close()
+        raise
+    return io.BufferedReader(raw, READ_SIZE)
+
+
+def source_position(fh):
+    """Bytes of the file on disk consumed by a file from open_rinex, for progress reports."""
+    raw = getattr(fh, "raw", None)
+    if isinstance(raw, DecompressedFile):
+        return raw.source_position()
+    return fh.tell()
+
+
+def _decompressed(source, kind):
+    if kind == "gzip":
+        return DecompressedFile(source, gzip.GzipFile(fileobj=source, mode="rb"))
+    if kind == "bzip2":
+        return DecompressedFile(source, bz2.BZ2File(source))
+    if kind == "zip":
+        archive = zipfile.ZipFile(source)
+        members = [info for info in archive.infolist() if not info.is_dir()]
+        if not members:
+            archive.close()
+            raise ValueError(f"{source.name} is an empty zip archive")
+        return DecompressedFile(source, archive.open(members[0]), closing=(archive,))
+    gzip_program = shutil.which("gzip")
+    if gzip_program is None:
+        raise ValueError(f"{source.name} is Unix compressed (.Z) and reading it needs the gzip program")
+    os.lseek(source.fileno(), 0, os.SEEK_SET)  # the child reads the file itself, from the start
+    process = subprocess.Popen([gzip_program, "-dc"], stdin=source, stdout=subprocess.PIPE)
+    return DecompressedFile(source, process.stdout, process=process)
@@ -0,0 +1,56 @@
+"""Plot decimation: keep only the samples a line plot can show.
+
+A line drawn into `width` pixel columns cannot show more than the first,
+last, lowest and highest sample of each column (the M4 / per-pixel
+min-max scheme). Keeping just those samples draws the same trace from at
+most 4 * width points, so rendering time follows the image width rather
+than the length of the series. Everything is computed with NumPy
+reductions over the columns, O(n).
+"""
+import numpy as np
+
+POINTS_PER_PIXEL = 4  # first, last, min and max of a pixel column
+
+
+def minmax_indices(x, y, width, keep=None):
+    """Sorted indices of the samples that draw (x, y) at `width` pixels.
+
+    `x` must be in increasing order (numbers or datetime64); samples with
+    NaT/NaN x are not drawn and are dropped. The first sample of every
+    NaN run in `y` is kept so gaps in the trace stay visible, and so is
+    every index in `keep` (e.g. detected phase slips).
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    if x.dtype.kind == "M":
+        valid = ~np.isnat(x)
+        x = x.astype("datetime64[ns]").view(np.int64)
+    else:
+        x = x.astype(np.float64)
+        valid = np.isfinite(x)
+    keep = np.asarray(keep if keep is not None else [], dtype=np.int64)
+    rows = np.flatnonzero(valid)
+    if rows.size <= POINTS_PER_PIXEL * width or np.any(np.diff(x[rows]) < 0):
+        return np.union1d(rows, keep)
+
+    # Pixel column of every drawn sample; columns are runs since x is sorted.
+    start, span = x[rows[0]], float(x[rows[-1]] - x[rows[0]]) or 1.0
+    column = np.minimum(((x[rows] - start) / span * width).astype(np.int64), width - 1)
+    values = y[rows]
+    gap = np.isnan(values)
+    gap_starts = rows[gap & ~np.concatenate(([False], gap[:-1]))]
+
+    rows, column, values = rows[~gap], column[~gap], values[~gap]
+    if not rows.size:
+        return np.union1d(gap_starts, keep)
+    new_column = np.concatenate(([True], np.diff(column) != 0))
+    starts = np.flatnonzero(new_column)
+    ends = np.append(starts[1:], rows.size) - 1
+    run = np.cumsum(new_column) - 1
+    picks = [rows[starts], rows[ends], gap_starts, keep]
+    for reduce in (np.minimum, np.maximum):
+        extreme = reduce.reduceat(values, starts)
+        hits = np.flatnonzero(values == extreme[run])
+        first = np.concatenate(([True], np.diff(run[hits]) != 0))
+        picks.append(rows[hits[first]])
+    return np.unique(np.concatenate(picks))
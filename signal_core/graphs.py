@@ -0,0 +1,199 @@
+"""Carrier phase graphs of the series extracted by the app.
+
+Headless: images are drawn on a matplotlib Figure with the Agg canvas,
+without pyplot or a GUI backend. matplotlib and pandas are imported when a
+series is first loaded or drawn, not when the app starts.
+
+render_series draws many graphs on a process pool, for plot_series.py.
+Each task is a dict naming the output PNG, the title and the source:
+either `csv` (a series CSV), or `store` with `prn` and one or two `codes`
+(a processed store or archive), plus optional `detect_phase` and
+`k_sigma`.
+
+Slip thresholds are `k_sigma`, in robust standard deviations of each
+series' noise (see slips.py). They used to be a `threshold` jump in km;
+that name is gone, so old callers fail instead of getting another unit.
+"""
+import logging
+import os
+
+import numpy as np
+
+from .decimate import minmax_indices
+from .metrics import timed
+from .parallel import map_files
+from .series import double_frame, open_observations, single_frame
+from .slips import K_SIGMA, combination_slips, distance_slips
+
+log = logging.getLogger(__name__)
+
+
+def series_mode(file_path):
+    """'double' for a CSV with two carrier phase traces, else 'single'."""
+    import pandas as pd
+
+    return 'double' if 'Carrier_Phase_1' in pd.read_csv(file_path, nrows=0).columns else 'single'
+
+
+class GraphPlotter:
+    FIGURE_SIZE = (12, 6)  # inches
+    DPI = 100
+    SLIP_K_SIGMA = K_SIGMA  # robust standard deviations, see slips.py
+
+    def __init__(self, file_path, mode='single', df=None):
+        self.file_path = file_path  # CSV series extracted by /csv
+        self.mode = mode
+        self.df = df if df is not None else self.load_csv()  # None when the CSV cannot be read
+
+    def load_csv(self):
+        import pandas as pd
+
+        try:
+            with timed("read_csv") as stage:
+                df = pd.read_csv(self.file_path)
+                stage.add(bytes=os.path.getsize(self.file_path), epochs=len(df))
+        except Exception as e:
+            log.error("failed to read %s: %s", self.file_path, e)
+            return None
+        log.debug("CSV %s: columns %s", self.file_path, df.columns)  # formatted only when enabled
+
+        # Check column names (trim spaces if needed)
+        df.columns = df.columns.str.strip()
+
+        # Ensure 'Time' column is parsed correctly
+        if 'Time' in df.columns:
+            df['Time'] = pd.to_datetime(df['Time'], errors='coerce')
+        else:
+            log.error("'Time' column not found in %s", self.file_path)
+        return df
+
+    def trace(self, column):
+        import pandas as pd
+
+        return pd.to_numeric(self.df[column], errors='coerce')
+
+    def detect_phase_slips(self, carrier_phase, k_sigma=SLIP_K_SIGMA, lli_column=None):
+        """Rows of the slips in one km trace: phase test, data gaps and the receiver's LLI flags"""
+        with timed("slips") as stage:
+            lli = self.df[lli_column].to_numpy() if lli_column in self.df.columns else None
+            flags = distance_slips(carrier_phase.to_numpy(), lli, k=k_sigma)
+            if self.mode != 'single' and 'GF' in self.df.columns:
+                # A jump of a dual-frequency combination is a slip on the pair; rows
+                # where either phase is 0.000 (not tracked) have no combination
+                untracked = np.zeros(len(self.df), dtype=bool)
+                for column in ('Carrier_Phase_1', 'Carrier_Phase_2'):
+                    if column in self.df.columns:
+                        untracked |= self.trace(column).to_numpy() == 0
+                gf = np.where(untracked, np.nan, self.df['GF'].to_numpy(dtype=np.float64))
+                mw = None
+                if 'MW_CYCLES' in self.df.columns:
+                    mw = np.where(untracked, np.nan, self.df['MW_CYCLES'].to_numpy(dtype=np.float64))
+                flags |= combination_slips(gf, mw, k=k_sigma)
+            stage.add(epochs=len(flags), observations=len(flags))
+        return np.flatnonzero(flags)
+
+    def pyramid_columns(self):
+        """Epochs (ns), the km traces of the graph and their slips, as drawn by the interactive chart"""
+        traces = ['Carrier_Phase'] if self.mode == 'single' else ['Carrier_Phase_1', 'Carrier_Phase_2']
+        lli_columns = ['LLI'] if self.mode == 'single' else ['LLI_1', 'LLI_2']
+        columns, slips = {}, {}
+        for trace, lli_column in zip(traces, lli_columns):
+            if trace in self.df.columns:
+                columns[trace] = self.trace(trace)
+                slips[trace] = np.zeros(len(self.df), dtype=bool)
+                slips[trace][self.detect_phase_slips(columns[trace], self.SLIP_K_SIGMA, lli_column)] = True
+        return self.df['Time'].to_numpy().astype('datetime64[ns]').view(np.int64), columns, slips
+
+    def plot_trace(self, ax, time, carrier_phase, slip_indices=(), **style):
+        """Plots only the samples visible at the figure width, always keeping phase slips"""
+        figure = ax.get_figure()
+        width = int(figure.get_figwidth() * figure.dpi)
+        rows = minmax_indices(time.to_numpy(), carrier_phase.to_numpy(), width, keep=slip_indices)
+        ax.plot(time.iloc[rows], carrier_phase.iloc[rows], **style)
+
+    def plot_graph(self, title, color, detect_phase=False, k_sigma=SLIP_K_SIGMA, output_path="static/graph.png"):
+        """Draws the series to a PNG at `output_path`; None when the CSV could not be read"""
+        if self.df is None:
+            return None
+        with timed("render") as stage:
+            self._draw(title, color, detect_phase, k_sigma, output_path)
+            stage.add(bytes=os.path.getsize(output_path), epochs=len(self.df))
+        return output_path
+
+    def _draw(self, title, color, detect_phase, k_sigma, output_path):
+        from matplotlib.backends.backend_agg import FigureCanvasAgg
+        from matplotlib.figure import Figure
+
+        figure = Figure(figsize=self.FIGURE_SIZE, dpi=self.DPI)
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        time = self.df['Time']
+
+        if self.mode == 'single':
+            if 'Carrier_Phase' in self.df.columns:
+                carrier_phase = self.trace('Carrier_Phase')
+                slip_indices = self.detect_phase_slips(carrier_phase, k_sigma, 'LLI') if detect_phase else ()
+                self.plot_trace(ax, time, carrier_phase, slip_indices, label=title, color=color, linewidth=2)
+
+                if detect_phase:
+                    ax.scatter(time.iloc[slip_indices], carrier_phase.iloc[slip_indices], color='red', s=50, label='Phase Slip', zorder=3)
+            else:
+                log.error("'Carrier_Phase' column not found in %s", self.file_path)
+
+        else:  # Double Mode
+            if 'Carrier_Phase_1' in self.df.columns and 'Carrier_Phase_2' in self.df.columns:
+                carrier_phase_1 = self.trace('Carrier_Phase_1')
+                carrier_phase_2 = self.trace('Carrier_Phase_2')
+
+                slip_indices_1 = self.detect_phase_slips(carrier_phase_1, k_sigma, 'LLI_1') if detect_phase else ()
+                slip_indices_2 = self.detect_phase_slips(carrier_phase_2, k_sigma, 'LLI_2') if detect_phase else ()
+                self.plot_trace(ax, time, carrier_phase_1, slip_indices_1, label="Carrier Phase 1", color="blue", linewidth=2)
+                self.plot_trace(ax, time, carrier_phase_2, slip_indices_2, label="Carrier Phase 2", color="green", linewidth=2)
+
+                if detect_phase:
+                    ax.scatter(time.iloc[slip_indices_1], carrier_phase_1.iloc[slip_indices_1], color='red', s=50, label='Phase Slip 1', zorder=3)
+                    ax.scatter(time.iloc[slip_indices_2], carrier_phase_2.iloc[slip_indices_2], color='purple', s=50, label='Phase Slip 2', zorder=3)
+            else:
+                log.error("'Carrier_Phase_1' and/or 'Carrier_Phase_2' column(s) not found in %s", self.file_path)
+
+        ax.set_xlabel("Time")
+        ax.set_ylabel("Carrier Phase")
+        ax.set_title(title)
+        ax.legend()
+        ax.tick_params(axis='x', labelrotation=45)
+        ax.grid(True, linestyle="--", alpha=0.6)
+        figure.tight_layout()
+        figure.savefig(output_path, format="png")
+
+
+def render_task(task):
+    """Draw one graph task (see the module docstring), returns the PNG path or None.
+
+    Runs in a worker process; stores are opened there, memory-mapped. A
+    series that cannot be read or drawn is logged and skipped, so one bad
+    file does not stop a batch.
+    """
+    try:
+        return _render(task)
+    except Exception:
+        log.exception("failed to draw %s", task["output"])
+        return None
+
+
+def _render(task):
+    if "csv" in task:
+        plotter = GraphPlotter(task["csv"], mode=series_mode(task["csv"]))
+    else:
+        store = open_observations(task["store"])
+        codes = task["codes"]
+        df = single_frame(store, task["prn"], *codes) if len(codes) == 1 else double_frame(store, task["prn"], *codes)
+        if df is None:
+            return None
+        plotter = GraphPlotter(None, mode='single' if len(codes) == 1 else 'double', df=df)
+    k_sigma = task.get("k_sigma", GraphPlotter.SLIP_K_SIGMA)
+    return plotter.plot_graph(task["title"], "blue", task.get("detect_phase", True), k_sigma, task["output"])
+
+
+def render_series(tasks, workers=None):
+    """Draw every task on a process pool, returns the PNG paths (None where a task failed)."""
+    return map_files(render_task, tasks, workers)
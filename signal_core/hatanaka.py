@@ -0,0 +1,383 @@
+"""Hatanaka compact RINEX (CRINEX 3) observation records, decoded in bulk.
+
+Compact RINEX keeps the RINEX header as it is and shrinks the body:
+
+- epoch lines and LLI/SSI flags are text-differenced against the previous
+  epoch: a space keeps the old character, '&' blanks it;
+- every observation is an integer (value x 1000) differenced along its arc
+  up to order M. An arc starts with "M&value" and goes on while the
+  satellite stays in view and the observation is present; the k-th value
+  of an arc is its difference of order min(k, M).
+
+Only the epoch records are walked one by one, reading just their event
+flag and satellite count to find where each epoch's satellite lines are;
+the epoch lines themselves are rebuilt together. The observation lines of a whole block are then
+tokenized and their numbers read with array operations on the raw bytes,
+every arc is integrated with M segmented cumulative sums over all
+satellites and observation types together, and the flags are forward
+filled per satellite. The last values of open arcs and the flags of the
+last normal epoch (event records have none) carry over to the next block,
+so a file of any size is decoded a block at a time.
+
+The receiver clock offset lines are skipped: observation columns have no
+clock.
+"""
+import re
+
+import numpy as np
+
+CRINEX_LABEL = b"CRINEX VERS   / TYPE"
+LABEL_COLUMN = 60
+HEAD_SIZE = 80  # bytes needed to recognize a compact RINEX file
+SATELLITE_LIST_COLUMN = 41  # the satellites of an epoch follow its epoch line
+EPOCH_LINE_WIDTH = 35
+PRN_WIDTH = 3
+READ_SIZE = 1 << 20  # bytes of compact text read at a time
+MAX_DIGITS = 15  # digits of an observation, read exactly through float64
+
+_SPACE, _AMPERSAND, _MINUS, _ZERO, _NEWLINE, _RETURN, _EPOCH_MARK = 32, 38, 45, 48, 10, 13, 62
+_CHANGES = re.compile(rb"[^ ]+")
+_SEPARATOR = np.zeros(256, dtype=bool)
+_SEPARATOR[[_SPACE, _NEWLINE, _RETURN]] = True
+_PLACES = 10.0 ** np.arange(MAX_DIGITS - 1, -1, -1)
+
+
+def is_compact(head):
+    """True when `head`, the first bytes of a file, start a compact RINEX header."""
+    return head[LABEL_COLUMN:LABEL_COLUMN + len(CRINEX_LABEL)] == CRINEX_LABEL
+
+
+def check_version(head):
+    """Raise ValueError unless `head` starts a CRINEX 3 (RINEX 3) file."""
+    version = head[:20].strip()
+    if not version.startswith(b"3"):
+        raise ValueError(f"compact RINEX version {version.decode('ascii', 'replace')} is not supported")
+
+
+class CompactBlock:
+    """Observations of a run of epochs, ready for the RINEX parser.
+
+    epoch_lines   (epochs, 35) characters of the RINEX epoch lines
+    prn_chars     (lines, 3) satellite of every observation line
+    line_epoch    epoch of every observation line
+    line, field   observation line and index in its system's types, per observation
+    value         observation x 1000 (int64)
+    lli, ssi      flag characters
+    """
+
+    def __init__(self, epoch_lines, prn_chars, line_epoch, line, field, value, lli, ssi):
+        self.epoch_lines = epoch_lines
+        self.prn_chars = prn_chars
+        self.line_epoch = line_epoch
+        self.line = line
+        self.field = field
+        self.value = value
+        self.lli = lli
+        self.ssi = ssi
+
+
+def iter_compact_blocks(fh, types, max_epochs=None, read_size=READ_SIZE):
+    """Yield a CompactBlock per run of at most `max_epochs` epoch records of `fh`.
+
+    `fh` is a binary file positioned after the header, `types` maps each
+    system letter to its number of observation types. Raises ValueError on
+    data that is not initialized and on a file cut inside an epoch.
+    """
+    body = CompactBody(types)
+    pending = b""
+    while True:
+        block, used = body.decode(pending, max_epochs)
+        if block is not None:
+            pending = pending[used:]
+            yield block
+            continue
+        chunk = fh.read(read_size)
+        if not chunk:
+            if pending and not pending.endswith(b"\n"):
+                pending += b"\n"  # last line without its newline
+                continue
+            if pending.strip():
+                raise ValueError("compact RINEX ends in the middle of an epoch")
+            return
+        pending += chunk
+
+
+class CompactBody:
+    """Decoding state carried from one block of epochs to the next."""
+
+    def __init__(self, types):
+        self.max_types = max(types.values(), default=0)
+        self.types = np.zeros(256, dtype=np.int64)  # observation types by system letter
+        for system, count in types.items():
+            self.types[ord(system)] = count
+        self.epoch_line = b""
+        self.satellites = {}  # PRN key -> number
+        self.arcs = {}  # stream (satellite * max types + field) -> (order, last values) of its open arc
+        self.flags = {}  # satellite -> flag characters of its last observation line
+        self.last_satellites = set()  # satellites of the last normal epoch
+
+    def decode(self, buf, max_epochs=None):
+        """(CompactBlock, bytes used) of the complete epochs at the start of `buf`; (None, 0) if there are none."""
+        data = np.frombuffer(buf, dtype=np.uint8)
+        newlines = np.flatnonzero(data == _NEWLINE)
+        if not newlines.size:
+            return None, 0
+        starts = np.concatenate(([0], newlines[:-1] + 1))
+        ends = newlines - ((newlines > starts) & (data[np.maximum(newlines - 1, 0)] == _RETURN))
+        starts_list, ends_list = starts.tolist(), ends.tolist()
+
+        # Walk the epochs: an epoch line, the clock line, then one line per
+        # satellite. Only the event flag and satellite count are needed here.
+        record_lines, normal, counts = [], [], []
+        flag_count = self.epoch_line[31:35].ljust(4)
+        n, total = 0, len(starts_list)
+        while n < total and (max_epochs is None or len(record_lines) < max_epochs):
+            begin, finish = starts_list[n], ends_list[n]
+            if begin == finish:
+                n += 1
+                continue
+            if buf[begin] == _EPOCH_MARK:
+                current = buf[begin + 31:begin + 35].ljust(4)
+            else:
+                diff = buf[begin + 31:min(begin + 35, finish)]
+                current = _apply_diff(flag_count, diff) if diff.strip() else flag_count
+            count = int(current[1:])
+            event = current[:1] > b"1"  # followed by `count` special records, not observations
+            needed = 1 + count if event else 2 + count
+            if n + needed > total:
+                break
+            flag_count = current
+            if not event:
+                normal.append(len(record_lines))
+                counts.append(count)
+            record_lines.append(n)
+            n += needed
+        if not n:
+            return None, 0
+        used = starts_list[n] if n < total else int(newlines[-1]) + 1
+
+        record_lines = np.array(record_lines, dtype=np.int64)
+        normal = np.array(normal, dtype=np.int64)
+        counts = np.array(counts, dtype=np.int64)
+        width = SATELLITE_LIST_COLUMN + PRN_WIDTH * int(counts.max(initial=0))
+        records = self._epoch_records(data, starts, ends, record_lines, width)
+        epoch_lines = records[normal, :EPOCH_LINE_WIDTH]
+        line_epoch = np.repeat(np.arange(len(counts)), counts)
+        list_columns = SATELLITE_LIST_COLUMN + PRN_WIDTH * _ranks(counts)
+        prn_chars = records[normal[line_epoch][:, None], list_columns[:, None] + np.arange(PRN_WIDTH)]
+        rows = np.repeat(record_lines[normal] + 2, counts) + _ranks(counts)
+        satellite = self._satellite_ids(prn_chars)
+        tokens, flag_text = self._fields(data[:used], rows, ends[rows], self.types[prn_chars[:, 0]])
+        line, field, start, end = tokens
+        flags = self._flags(flag_text, satellite, line_epoch)
+        value = self._values(data, line, field, start, end, satellite)
+        lli = flags[line, 2 * field]
+        ssi = flags[line, 2 * field + 1]
+        return CompactBlock(epoch_lines, prn_chars, line_epoch, line, field, value, lli, ssi), used
+
+    def _satellite_ids(self, prn_chars):
+        keys = (prn_chars[:, 0].astype(np.int64) << 16) | (prn_chars[:, 1].astype(np.int64) << 8) | prn_chars[:, 2]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        ids = np.array([self.satellites.setdefault(key, len(self.satellites)) for key in unique.tolist()],
+                       dtype=np.int64)
+        return ids[inverse.ravel()]
+
+    def _epoch_records(self, data, starts, ends, lines, width):
+        """Full text of the epoch lines `lines` of `data`, at least `width` wide.
+
+        Each line is a difference from the one before, except those starting
+        with '>' which are written out in full.
+        """
+        width = max(int((ends[lines] - starts[lines]).max(initial=0)), len(self.epoch_line), width)
+        columns = starts[lines, None] + np.arange(width)
+        text = data[np.minimum(columns, len(data) - 1)]
+        inside = columns < ends[lines, None]
+        restart = np.ones(len(lines) + 1, dtype=bool)
+        restart[1:] = data[starts[lines]] == _EPOCH_MARK
+        grid = np.empty((len(lines) + 1, width), dtype=np.uint8)
+        grid[0] = np.frombuffer(self.epoch_line.ljust(width), dtype=np.uint8)
+        grid[1:] = np.where(inside & (text != _SPACE), text, 0)
+        grid[1:][restart[1:]] = np.where(inside, text, _SPACE)[restart[1:]]
+        records = _forward_fill(grid, restart)[1:]
+        self.epoch_line = records[-1].tobytes()
+        return records
+
+    def _fields(self, data, rows, row_ends, row_types):
+        """Observation tokens and flag differences of the lines `rows` of `data`.
+
+        Fields run between separators, so the fields of all lines are found
+        from the separator positions alone. Returns (line, field, start, end)
+        of every non-empty observation token, line being an index into
+        `rows`, and the (lines, 2 * max types) flag differences, 0 where a
+        flag is unchanged.
+        """
+        separators = np.flatnonzero(_SEPARATOR[data])
+        bounds = np.concatenate(([-1], separators))  # a field follows every bound
+        new_line = np.ones(len(bounds), dtype=bool)
+        new_line[1:] = data[separators] == _NEWLINE
+        line_bounds = np.flatnonzero(new_line)
+        per_line = np.diff(np.append(line_bounds, len(bounds)))
+        owner = np.full(len(line_bounds), -1, dtype=np.int64)  # index into rows of every line
+        owner[rows] = np.arange(len(rows))
+        types = np.full(len(line_bounds), -1, dtype=np.int64)
+        types[rows] = row_types
+        field = np.arange(len(bounds)) - np.repeat(line_bounds, per_line)
+        field_types = np.repeat(types, per_line)
+
+        field_ends = np.append(separators, len(data))
+        token = np.flatnonzero((field < field_types) & (field_ends > bounds + 1))
+        tokens = np.repeat(owner, per_line)[token], field[token], bounds[token] + 1, field_ends[token]
+
+        # The flags are the rest of the line after the last observation field
+        width = 2 * self.max_types
+        flagged = np.flatnonzero(field == field_types)
+        flag_start = row_ends.copy()
+        flag_start[np.repeat(owner, per_line)[flagged]] = bounds[flagged] + 1
+        columns = flag_start[:, None] + np.arange(width)
+        text = data[np.minimum(columns, len(data) - 1)] if len(data) else np.zeros(columns.shape, dtype=np.uint8)
+        flag_text = np.where((columns < row_ends[:, None]) & (text != _SPACE), text, np.uint8(0))
+        return tokens, flag_text
+
+    def _values(self, data, line, field, start, end, satellite):
+        """Integrated value (x 1000) of every token."""
+        if not len(line):
+            return np.empty(0, dtype=np.int64)
+        last = len(data) - 1
+        init = (end - start >= 2) & (data[np.minimum(start + 1, last)] == _AMPERSAND)
+        order = np.where(init, data[start].astype(np.int64) - _ZERO, 0)
+        start = start + 2 * init  # past the arc order "M&"
+        negative = data[np.minimum(start, last)] == _MINUS
+        start = start + negative
+
+        # Tokens of each length are a digit matrix dotted with the place values
+        # (exact in float64 below 2**53, i.e. up to 15 digits)
+        length = end - start
+        if length.max(initial=0) > MAX_DIGITS:
+            raise ValueError("compact RINEX observation has too many digits")
+        by_length = np.argsort(length.astype(np.int8), kind="stable")
+        bounds = np.searchsorted(length[by_length], np.arange(MAX_DIGITS + 2))
+        number = np.zeros(len(start), dtype=np.float64)
+        for width in range(1, MAX_DIGITS + 1):
+            which = by_length[bounds[width]:bounds[width + 1]]
+            if len(which):
+                digits = data[start[which, None] + np.arange(width)] - np.uint8(_ZERO)
+                number[which] = digits @ _PLACES[MAX_DIGITS - width:]
+        number = number.astype(np.int64)
+        stream = satellite[line] * max(self.max_types, 1) + field
+        if stream.max(initial=0) <= np.iinfo(np.int16).max:
+            stream = stream.astype(np.int16)  # sorted by radix
+        return self._integrate(stream, init, order, np.where(negative, -number, number))
+
+    def _flags(self, grid, satellite, line_epoch):
+        """(lines, 2 * max types) LLI/SSI characters of every observation line."""
+        width = grid.shape[1]
+        n_epochs = int(line_epoch[-1]) + 1 if len(line_epoch) else 0
+        # Forward fill along each satellite's consecutive epochs; a satellite
+        # absent from the previous epoch starts again from blank flags
+        order = np.lexsort((line_epoch, satellite))
+        sat_sorted, epoch_sorted = satellite[order], line_epoch[order]
+        starts_run = np.ones(len(order), dtype=bool)
+        starts_run[1:] = (sat_sorted[1:] != sat_sorted[:-1]) | (epoch_sorted[1:] != epoch_sorted[:-1] + 1)
+        grid = grid[order]
+        for n in np.flatnonzero(starts_run).tolist():
+            satellite_id = int(sat_sorted[n])
+            in_last = epoch_sorted[n] == 0 and satellite_id in self.last_satellites
+            carried = self.flags.get(satellite_id) if in_last else None
+            base = carried if carried is not None else np.full(width, _SPACE, dtype=np.uint8)
+            grid[n] = np.where(grid[n] != 0, grid[n], base)
+        grid = _forward_fill(grid, starts_run)
+
+        flags = np.empty_like(grid)
+        flags[order] = grid
+        if n_epochs:
+            # A block of event records only leaves the flags as they were
+            last = np.flatnonzero(line_epoch == n_epochs - 1)
+            for n in last.tolist():
+                self.flags[int(satellite[n])] = flags[n].copy()
+            self.last_satellites = {int(satellite[n]) for n in last.tolist()}
+        return flags
+
+    def _integrate(self, stream, init, order, number):
+        """Values (x 1000) of the tokens, in their order, from the arcs' differences."""
+        by_stream = np.argsort(stream, kind="stable")
+        first = np.ones(len(stream), dtype=bool)
+        first[1:] = stream[by_stream][1:] != stream[by_stream][:-1]
+
+        # Arcs open at the end of the previous block go on from their last values
+        prefix_stream, prefix_init, prefix_order, prefix_number = [], [], [], []
+        for n in by_stream[first & ~init[by_stream]].tolist():
+            arc = self.arcs.get(int(stream[n]))
+            if arc is None:
+                raise ValueError("compact RINEX observation is not initialized")
+            arc_order, last = arc
+            for j in range(len(last)):
+                prefix_stream.append(stream[n])
+                prefix_init.append(j == 0)
+                prefix_order.append(arc_order)
+                prefix_number.append(_difference(last[:j + 1]))
+
+        count = len(prefix_stream)
+        all_stream = np.concatenate((np.array(prefix_stream, dtype=stream.dtype), stream))
+        sort = np.argsort(all_stream, kind="stable") if count else by_stream
+        s_stream = all_stream[sort]
+        s_init = np.concatenate((np.array(prefix_init, dtype=bool), init))[sort]
+        s_order = np.concatenate((np.array(prefix_order, dtype=np.int64), order))[sort]
+        values = np.concatenate((np.array(prefix_number, dtype=np.int64), number))[sort]
+
+        arc = np.cumsum(s_init) - 1
+        if len(arc) and arc[0] < 0:
+            raise ValueError("compact RINEX observation is not initialized")
+        starts = np.flatnonzero(s_init)
+        position = np.arange(len(values)) - starts[arc]
+        orders = s_order[starts]
+        arc_order = orders[arc]
+        # Undo the order j differences from the highest down: a running sum over
+        # the values at position >= j - 1 of arcs of order >= j, restarted per arc
+        for j in range(int(orders.max(initial=0)), 0, -1):
+            summed = position >= j - 1
+            if orders.min() < j:
+                summed &= arc_order >= j
+            running = np.cumsum(np.where(summed, values, 0))
+            before = starts + j - 2  # last position of each arc not summed
+            base = np.where(before >= 0, running[np.clip(before, 0, len(values) - 1)], 0)
+            values = np.where(summed, running - base[arc], values)
+
+        last = np.ones(len(values), dtype=bool)
+        last[:-1] = s_stream[1:] != s_stream[:-1]
+        for n in np.flatnonzero(last).tolist():
+            length = min(int(position[n]) + 1, int(arc_order[n]))
+            self.arcs[int(s_stream[n])] = (int(arc_order[n]), values[n + 1 - length:n + 1].tolist())
+
+        decoded = np.empty(len(values), dtype=np.int64)
+        decoded[sort] = values
+        return decoded[count:]
+
+
+def _ranks(counts):
+    """0, 1, ... counts[i] - 1 for every i, concatenated."""
+    return np.arange(int(counts.sum())) - np.repeat(np.cumsum(counts) - counts, counts)
+
+
+def _difference(values):
+    """Difference of order len(values) - 1 at the last of `values`."""
+    values = list(values)
+    for _ in range(len(values) - 1):
+        values = [b - a for a, b in zip(values, values[1:])]
+    return values[0]
+
+
+def _forward_fill(grid, restart):
+    """Apply rows of text differences (0: unchanged) down `grid`; `restart` rows, the first included, are complete."""
+    source = np.where((grid != 0) | restart[:, None], np.arange(len(grid))[:, None], 0)
+    np.maximum.accumulate(source, axis=0, out=source)
+    filled = np.take_along_axis(grid, source, axis=0)
+    filled[filled == _AMPERSAND] = _SPACE
+    return filled
+
+
+def _apply_diff(old, diff):
+    """Text differencing: a space keeps the old character, '&' blanks it, anything else replaces it."""
+    text = bytearray(old.ljust(len(diff)))
+    for change in _CHANGES.finditer(diff):
+        text[change.start():change.end()] = change.group().replace(b"&", b" ")
+    return bytes(text)
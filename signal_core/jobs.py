@@ -0,0 +1,330 @@
+"""Per-upload jobs: everything one user works on, under one directory.
+
+Each upload creates a job with a random ID. The job's uploaded files, its
+observation archive and the series extracted from it all live under the
+job directory, so concurrent users (and concurrent worker processes) never
+write to each other's files:
+
+    <root>/<job id>/uploads/
+    <root>/<job id>/archive/      observation archive (see archive.py)
+    <root>/<job id>/series/       extracted CSV series and their min/max pyramids
+    <root>/<job id>/status.json   state of the latest ingest
+    <root>/<job id>/progress/     per-file ingest progress
+    <root>/<job id>/ingest.lock   held from an upload until its ingest ends
+
+Rendered graphs are not kept per job: they are addressed by the hash of
+their data, so one RenderCache for the whole app shares a single budget.
+
+A job holds no state in memory; any process can open it by ID. Uploads are
+ingested in the background by an IngestQueue, and any process can report
+their progress from the files above.
+
+The lock file is created exclusively, so only one upload at a time can
+claim a job. It names its owner process, and the IngestQueue touches it
+while the ingest runs. A lock whose owner process is gone (same host) or
+whose heartbeat is older than STALE_AFTER is stale: its job was
+interrupted, e.g. by a restart, and reads as failed.
+"""
+import json
+import logging
+import os
+import secrets
+import shutil
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .archive import ObservationArchive, is_archive, read_progress
+from .metrics import timed
+
+log = logging.getLogger(__name__)
+
+JOB_ID_BYTES = 16
+SERIES_ID_BYTES = 8
+UPLOADS_FOLDER = "uploads"
+ARCHIVE_FOLDER = "archive"
+SERIES_FOLDER = "series"
+PROGRESS_FOLDER = "progress"
+STATUS_FILE = "status.json"
+LOCK_FILE = "ingest.lock"
+INGEST_THREADS = 2  # jobs ingested at once per process; each uses a process pool
+HEARTBEAT_INTERVAL = 10  # seconds between touches of the locks of queued and running jobs
+STALE_AFTER = 120  # seconds without a heartbeat after which a lock is stale
+
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+
+def _is_token(value, nbytes):
+    return isinstance(value, str) and len(value) == 2 * nbytes and all(c in "0123456789abcdef" for c in value)
+
+
+class Job:
+    """Directory of one job; IDs are checked before they reach a path."""
+
+    def __init__(self, root, job_id):
+        if not _is_token(job_id, JOB_ID_BYTES):
+            raise ValueError(f"invalid job ID {job_id!r}")
+        self.root = root
+        self.id = job_id
+        self.path = os.path.join(root, job_id)
+
+    @classmethod
+    def create(cls, root):
+        job = cls(root, secrets.token_hex(JOB_ID_BYTES))
+        for folder in (UPLOADS_FOLDER, SERIES_FOLDER):
+            os.makedirs(os.path.join(job.path, folder))
+        return job
+
+    @classmethod
+    def open(cls, root, job_id):
+        """The existing job `job_id`, None if the ID is invalid or unknown."""
+        try:
+            job = cls(root, job_id)
+        except ValueError:
+            return None
+        return job if os.path.isdir(job.path) else None
+
+    @property
+    def uploads(self):
+        return os.path.join(self.path, UPLOADS_FOLDER)
+
+    @property
+    def archive_path(self):
+        return os.path.join(self.path, ARCHIVE_FOLDER)
+
+    def archive(self):
+        return ObservationArchive(self.archive_path)
+
+    def has_data(self):
+        return is_archive(self.archive_path)
+
+    def new_series(self, extension="csv"):
+        """(series ID, path) for a series file about to be extracted."""
+        series_id = secrets.token_hex(SERIES_ID_BYTES)
+        return series_id, self._series_file(series_id, extension)
+
+    def series_path(self, series_id):
+        """CSV path of an extracted series, None if the ID is invalid or unknown."""
+        if not _is_token(series_id, SERIES_ID_BYTES):
+            return None
+        path = self._series_file(series_id)
+        return path if os.path.isfile(path) else None
+
+    def pyramid_path(self, series_id):
+        """Min/max pyramid directory of an extracted series (see pyramid.py), None if the series is unknown."""
+        if self.series_path(series_id) is None:
+            return None
+        return self._series_file(series_id, "pyramid")
+
+    def _series_file(self, series_id, extension="csv"):
+        return os.path.join(self.path, SERIES_FOLDER, f"{series_id}.{extension}")
+
+    @property
+    def progress_dir(self):
+        return os.path.join(self.path, PROGRESS_FOLDER)
+
+    @property
+    def lock_path(self):
+        return os.path.join(self.path, LOCK_FILE)
+
+    def acquire(self):
+        """Claim the job for an upload; False while another upload or ingest holds it.
+
+        The claim lasts until release(), which the IngestQueue calls when the
+        ingest ends. A stale lock is removed and claimed again.
+        """
+        for _ in range(2):
+            try:
+                fd = os.open(self.lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                owner = self._lock_owner()
+                if not self._lock_stale(owner):
+                    return False
+                self._read_status()  # records the interrupted ingest as failed
+                if not self._break_lock(owner):
+                    return False
+                continue
+            with os.fdopen(fd, "w") as fh:
+                json.dump({"pid": os.getpid(), "host": socket.gethostname(), "token": secrets.token_hex(8)}, fh)
+            return True
+        return False
+
+    def release(self):
+        try:
+            os.remove(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def heartbeat(self):
+        try:
+            os.utime(self.lock_path)
+        except FileNotFoundError:
+            pass
+
+    def _lock_owner(self):
+        """Contents of the lock with its heartbeat as "modified", None when there is no lock."""
+        try:
+            with open(self.lock_path) as fh:
+                modified = os.fstat(fh.fileno()).st_mtime
+                try:
+                    owner = json.load(fh)
+                except ValueError:
+                    owner = {}  # not written yet, or its owner died writing it
+        except FileNotFoundError:
+            return None
+        return dict(owner, modified=modified)
+
+    def _lock_stale(self, owner=None):
+        """True when the lock's owner died or stopped beating; False when there is no lock."""
+        owner = self._lock_owner() if owner is None else owner
+        if owner is None:
+            return False
+        if time.time() - owner["modified"] > STALE_AFTER:
+            return True
+        if owner.get("host") == socket.gethostname() and "pid" in owner:
+            try:
+                os.kill(owner["pid"], 0)
+            except ProcessLookupError:
+                return True
+            except PermissionError:
+                pass
+        return False
+
+    def _break_lock(self, owner):
+        """Remove the stale lock of `owner`; False when another upload claimed the job meanwhile."""
+        moved = f"{self.lock_path}.{secrets.token_hex(8)}.stale"
+        try:
+            os.rename(self.lock_path, moved)
+        except FileNotFoundError:
+            return True  # broken by someone else
+        with open(moved) as fh:
+            try:
+                token = json.load(fh).get("token")
+            except ValueError:
+                token = None
+        try:
+            if token != owner.get("token"):
+                os.link(moved, self.lock_path)  # a fresh lock, put it back unless the job was claimed again
+                return False
+        except FileExistsError:
+            return False
+        finally:
+            os.remove(moved)
+        return True
+
+    def _read_status(self):
+        try:
+            with open(os.path.join(self.path, STATUS_FILE)) as fh:
+                status = json.load(fh)
+        except FileNotFoundError:
+            return {"state": DONE if self.has_data() else None}
+        if status["state"] in (QUEUED, RUNNING):
+            owner = self._lock_owner()
+            if owner is not None and not self._lock_stale(owner):
+                return status
+            # Its ingest died with the process that ran it
+            log.warning("job %s: %s ingest was interrupted", self.id, status["state"])
+            status.update(state=FAILED, finished_at=time.time(), error="ingest interrupted")
+            self._write_status(status)
+        return status
+
+    def set_state(self, state, **fields):
+        """Record the ingest state; only the thread running the ingest writes it."""
+        self._write_status(dict(self._read_status(), state=state, **fields))
+
+    def _write_status(self, status):
+        staging = os.path.join(self.path, f"{STATUS_FILE}.{secrets.token_hex(8)}.tmp")
+        with open(staging, "w") as fh:
+            json.dump(status, fh)
+        os.replace(staging, os.path.join(self.path, STATUS_FILE))
+
+    def busy(self):
+        """True while an upload or an ingest holds the job."""
+        return self._read_status()["state"] in (QUEUED, RUNNING) or (
+            os.path.exists(self.lock_path) and not self._lock_stale())
+
+    def ready(self):
+        return self._read_status()["state"] == DONE
+
+    def status(self):
+        """State of the latest ingest with epochs parsed, bytes read and ETA (s)."""
+        status = self._read_status()
+        progress = read_progress(self.progress_dir)
+        status["bytes_read"] = progress["bytes_read"]
+        status["bytes_total"] = max(status.get("bytes_total", 0), progress["bytes_total"])
+        status["epochs"] = progress["epochs"]
+        status["eta"] = None
+        if status["state"] == RUNNING and status["bytes_read"]:
+            elapsed = time.time() - status["started_at"]
+            remaining = status["bytes_total"] - status["bytes_read"]
+            status["eta"] = round(elapsed * remaining / status["bytes_read"], 1)
+        elif status["state"] == DONE:
+            status["eta"] = 0
+        return status
+
+
+class IngestQueue:
+    """Ingests uploaded files into their job's archive on background threads.
+
+    submit() takes a job claimed with Job.acquire() and returns at once;
+    the job's status() follows the ingest, and the claim is released when
+    it ends. The queue lives in the process that accepted the upload and
+    keeps the locks of its jobs beating, but the status is on disk, so any
+    process can report it.
+    """
+
+    def __init__(self, threads=INGEST_THREADS, workers=None):
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="ingest")
+        self._jobs = {}  # job ID -> job, queued or running here
+        self._jobs_lock = threading.Lock()
+        self._beating = threading.Event()
+        self._stopped = threading.Event()
+
+    def submit(self, job, paths):
+        shutil.rmtree(job.progress_dir, ignore_errors=True)
+        os.makedirs(job.progress_dir)
+        job.set_state(QUEUED, files=len(paths), bytes_total=sum(os.path.getsize(p) for p in paths),
+                      queued_at=time.time(), started_at=None, finished_at=None, error=None)
+        with self._jobs_lock:
+            self._jobs[job.id] = job
+        if not self._beating.is_set():
+            self._beating.set()
+            threading.Thread(target=self._beat, name="ingest-heartbeat", daemon=True).start()
+        return self._pool.submit(self._run, job, list(paths))
+
+    def _beat(self):
+        while not self._stopped.wait(HEARTBEAT_INTERVAL):
+            with self._jobs_lock:
+                jobs = list(self._jobs.values())
+            for job in jobs:
+                job.heartbeat()
+
+    def _run(self, job, paths):
+        try:
+            return self._ingest(job, paths)
+        finally:
+            with self._jobs_lock:
+                self._jobs.pop(job.id, None)
+            job.release()
+
+    def _ingest(self, job, paths):
+        job.set_state(RUNNING, started_at=time.time())
+        try:
+            # Parse and export run together, streamed in pool workers
+            with timed("ingest") as stage:
+                added = job.archive().ingest(paths, self.workers, job.progress_dir)
+                progress = read_progress(job.progress_dir)
+                stage.add(bytes=progress["bytes_total"], epochs=progress["epochs"],
+                          observations=sum(entry["rows"] for entry in added))
+        except Exception as e:
+            log.exception("job %s: ingest failed", job.id)
+            job.set_state(FAILED, finished_at=time.time(), error=str(e))
+            return None
+        job.set_state(DONE, finished_at=time.time(), added=len(added))
+        return added
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+        self._stopped.set()
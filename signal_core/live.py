@@ -0,0 +1,272 @@
+"""Live ingest of RINEX output as it is written, with per-epoch slip alerts.
+
+A receiver (or replay_rinex.py) writes a RINEX 3 observation file
+epoch by epoch, to a growing file or a local TCP socket. The bytes are
+fed to an EpochStream, which decodes every epoch with RinexParser as soon
+as its last satellite line has arrived. A SlipMonitor then updates the
+slip tests of every satellite in view from that one epoch.
+
+The batch tests of slips.py fit the samples on both sides of an epoch;
+live, only the past is known, so the monitor uses the forward half of the
+same tests: the phase difference (and the GF / MW combinations for a
+dual-frequency pair) against the polynomial fit of the previous `window`
+values, with a robust threshold over the recent residuals. Alerts come
+within the epoch but on half the evidence, so they are more frequent than
+the batch flags, which remain the reference once the file is complete.
+"""
+import collections
+import socket
+import time
+
+import numpy as np
+
+from .combinations import NAVIC_CODES, NAVIC_PHASES, dual_frequency, frequency, phase_range, wavelength
+from .rinex import NS_PER_SECOND, RinexHeader, RinexParser
+from .slips import (GF_DEGREE, GF_FLOOR, GF_WINDOW, K_SIGMA, MAD_SCALE, MAD_WINDOW, MAX_GAP, MW_DEGREE,
+                    MW_FLOOR, MW_WINDOW, PHASE_DEGREE, PHASE_FLOOR_CYCLES, PHASE_WINDOW, SLIP_GAP,
+                    SLIP_GF, SLIP_LLI, SLIP_MW, SLIP_PHASE, prediction_weights, slip_names)
+
+POLL_INTERVAL = 0.2  # seconds between checks of a followed file
+READ_SIZE = 1 << 16
+MIN_RESIDUALS = 10  # residuals seen before a series is tested
+
+
+def follow_file(path, poll=POLL_INTERVAL, idle_timeout=None):
+    """Yield the bytes of a file as they are appended, like tail -f from its start.
+
+    Stops after `idle_timeout` seconds without new data (None: never).
+    """
+    idle_since = time.monotonic()
+    with open(path, "rb") as fh:
+        while True:
+            data = fh.read(READ_SIZE)
+            if data:
+                idle_since = time.monotonic()
+                yield data
+                continue
+            if idle_timeout is not None and time.monotonic() - idle_since > idle_timeout:
+                return
+            time.sleep(poll)
+
+
+def follow_socket(host, port, timeout=None):
+    """Connect to a TCP port, returns an iterator of the bytes received until it closes.
+
+    Connection errors are raised here, not on the first read.
+    """
+    return _receive(socket.create_connection((host, port), timeout=timeout))
+
+
+def _receive(conn):
+    with conn:
+        while True:
+            data = conn.recv(READ_SIZE)
+            if not data:
+                return
+            yield data
+
+
+class EpochStream:
+    """Incremental RINEX 3 parser: feed() bytes, get one ObservationColumns per epoch.
+
+    The header is read first; afterwards an epoch is decoded as soon as the
+    number of satellite lines announced by its epoch line has arrived.
+    """
+
+    def __init__(self):
+        self.header = None
+        self.parser = None
+        self._header = RinexHeader()
+        self._partial = b""
+        self._lines = []
+        self._expected = None
+
+    def feed(self, data):
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        epochs = []
+        for line in lines:
+            line = line.rstrip(b"\r")
+            if self.parser is None:
+                if self._header.parse_line(line.decode("ascii", "replace")):
+                    self.header = self._header
+                    self.parser = RinexParser(self.header, capacity=16)
+                continue
+            if self._expected is None:
+                if not line.startswith(b">"):
+                    continue  # stray line between epochs
+                self._expected = int(line[32:35].strip() or 0)
+                self._lines = [line]
+            else:
+                self._lines.append(line)
+            if len(self._lines) > self._expected:
+                columns = self._decode()
+                if columns is not None:
+                    epochs.append(columns)
+        return epochs
+
+    def _decode(self):
+        block = b"\n".join(self._lines) + b"\n"
+        self._lines, self._expected = [], None
+        self.parser.decode_block(block)
+        columns = self.parser.take_columns()
+        return columns if len(columns) else None
+
+
+class _ForwardTest:
+    """Forward half of a slips.py test on one series, one value at a time.
+
+    `spike` series are time differences, where a slip is a single outlier;
+    otherwise the series is a combination level, where a slip is a step.
+    """
+
+    def __init__(self, window, degree, floor, k, spike):
+        self.weights = prediction_weights(window, degree)
+        self.floor = floor
+        self.k = k
+        self.spike = spike
+        self.values = collections.deque(maxlen=window)
+        self.residuals = collections.deque(maxlen=MAD_WINDOW)
+        self.flagged = False
+
+    def reset(self):
+        self.values.clear()
+        self.flagged = False
+
+    def update(self, value):
+        """Add a value, returns True when it is a slip."""
+        if len(self.values) < self.values.maxlen:
+            self.values.append(value)
+            return False
+        predicted = np.dot(self.weights, self.values)
+        residual = value - predicted
+        self.residuals.append(residual)
+        if len(self.residuals) < MIN_RESIDUALS:
+            self.values.append(value)
+            return False
+        history = np.fromiter(self.residuals, np.float64, len(self.residuals))
+        sigma = MAD_SCALE * np.median(np.abs(history - np.median(history)))
+        threshold = max(self.k * sigma, self.floor)
+        if abs(residual) > threshold:
+            # A lone spike is replaced by its prediction, keeping the window
+            # evenly spaced; after a step, or a second outlier in a row, the
+            # series has changed and the fit restarts from the new value.
+            if self.spike and not self.flagged:
+                self.values.append(predicted)
+            else:
+                self.reset()
+                self.values.append(value)
+            self.flagged = True
+            return True
+        self.values.append(value)
+        self.flagged = False
+        return False
+
+
+class _SatelliteState:
+    def __init__(self, codes, k):
+        self.last_epoch = None
+        self.last_phase = {}
+        self.phase_tests = {code: _ForwardTest(PHASE_WINDOW, PHASE_DEGREE,
+                                               PHASE_FLOOR_CYCLES * wavelength(frequency(code)), k, True)
+                            for code in codes}
+        self.gf_test = _ForwardTest(GF_WINDOW, GF_DEGREE, GF_FLOOR, k, False)
+        self.mw_test = _ForwardTest(MW_WINDOW, MW_DEGREE, MW_FLOOR, k, False)
+
+    def reset(self):
+        self.last_phase.clear()
+        for test in (*self.phase_tests.values(), self.gf_test, self.mw_test):
+            test.reset()
+
+
+class SlipMonitor:
+    """Per-satellite slip tests updated one epoch at a time.
+
+    update() takes the ObservationColumns of one epoch and returns the
+    phases of the satellites in view and the slips found in that epoch.
+    """
+
+    def __init__(self, phases=NAVIC_PHASES, codes=NAVIC_CODES, interval=None, k=K_SIGMA, max_gap=MAX_GAP):
+        self.phases = tuple(phases)
+        self.codes = tuple(codes or ())
+        self.freqs = [frequency(code) for code in self.phases]
+        self.interval_ns = int(round(interval * NS_PER_SECOND)) if interval else None
+        self.k = k
+        self.max_gap = max_gap
+        self._satellites = {}
+
+    def update(self, columns):
+        """(epoch ns, {PRN: {code: phase range m}}, [slip dicts]) of one epoch."""
+        epoch = int(columns.epoch[0])
+        wanted = self.phases + self.codes
+        values = collections.defaultdict(dict)
+        lli = collections.defaultdict(dict)
+        for prn, obs, value, flag in zip(columns.prn.tolist(), columns.obs.tolist(),
+                                         columns.value.tolist(), columns.lli.tolist()):
+            code = columns.obs_codes[obs]
+            if code in wanted and value == value:  # NaN: not observed
+                values[columns.prns[prn]][code] = value
+                lli[columns.prns[prn]][code] = flag
+
+        phases, slips = {}, []
+        for prn, observed in values.items():
+            state = self._satellites.get(prn)
+            if state is None:
+                state = self._satellites[prn] = _SatelliteState(
+                    [code for code in self.phases if frequency(code)], self.k)
+            flags = self._update_satellite(state, epoch, observed, lli[prn])
+            phases[prn] = {code: float(phase_range(observed[code], freq))
+                           for code, freq in zip(self.phases, self.freqs) if code in observed and freq}
+            if flags:
+                slips.append({"epoch": epoch, "prn": prn, "flags": flags, "reason": slip_names(flags)})
+        return epoch, phases, slips
+
+    def _update_satellite(self, state, epoch, observed, lli):
+        flags = 0
+        if state.last_epoch is not None and self.interval_ns:
+            # Fits need consecutive samples: a missing epoch restarts them.
+            if epoch - state.last_epoch > self.interval_ns:
+                state.reset()
+            if epoch - state.last_epoch > (self.max_gap + 1) * self.interval_ns:
+                flags |= SLIP_GAP
+        state.last_epoch = epoch
+        for code, freq in zip(self.phases, self.freqs):
+            if code not in observed or not freq:
+                continue
+            if lli.get(code, 0) & 1:
+                flags |= SLIP_LLI
+            metres = float(phase_range(observed[code], freq))
+            last = state.last_phase.get(code)
+            state.last_phase[code] = metres
+            if last is not None and state.phase_tests[code].update(metres - last):
+                flags |= SLIP_PHASE
+        if len(self.phases) == 2 and all(code in observed for code in self.phases) and all(self.freqs):
+            code1, code2 = (observed.get(code) for code in self.codes) if len(self.codes) == 2 else (None, None)
+            if code1 is None or code2 is None:
+                code1 = code2 = None
+            combos = dual_frequency(observed[self.phases[0]], observed[self.phases[1]], *self.freqs, code1, code2)
+            if state.gf_test.update(float(combos["GF"])):
+                flags |= SLIP_GF
+            if "MW_CYCLES" in combos and state.mw_test.update(float(combos["MW_CYCLES"])):
+                flags |= SLIP_MW
+        return flags
+
+
+def live_events(chunks, phases=NAVIC_PHASES, codes=NAVIC_CODES, k=K_SIGMA):
+    """Parse a stream of byte chunks and yield one event dict per epoch.
+
+    Each event has the epoch (ns), the phase range (m) of every satellite
+    in view, the slips of the epoch and the processing time in ms.
+    """
+    stream = EpochStream()
+    monitor = None
+    for data in chunks:
+        started = time.perf_counter()
+        for columns in stream.feed(data):
+            if monitor is None:
+                monitor = SlipMonitor(phases, codes, stream.header.interval, k)
+            epoch, phase, slips = monitor.update(columns)
+            elapsed = (time.perf_counter() - started) * 1000
+            yield {"epoch": epoch, "phases": phase, "slips": slips, "ms": round(elapsed, 3)}
+            started = time.perf_counter()
+
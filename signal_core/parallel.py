@@ -0,0 +1,53 @@
+"""Process-pool parsing of independent RINEX files.
+
+Every file is parsed in its own worker process and comes back as compact
+typed columns (a few arrays per file, pickled as raw buffers). Results are
+combined with a k-way epoch merge, see ``ObservationColumns.concatenate``.
+
+Workers are started by a fork server (or spawned where there is none),
+never forked from the caller: pools are opened from the web app's ingest
+threads, and a forked child would inherit locks other threads held
+(logging, metrics) and could deadlock on them.
+"""
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .rinex import ObservationColumns, parse_rinex
+
+
+def default_workers():
+    """Worker processes to use: one per CPU available to this process."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def pool_context():
+    """Multiprocessing context of the worker pools: forkserver, or spawn where it is unavailable."""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def map_files(function, items, workers=None):
+    """Run `function(item)` for every item on a process pool, keeping order.
+
+    A single item, or a single worker, runs in-process to avoid pool start-up.
+    """
+    items = list(items)
+    workers = min(workers or default_workers(), len(items))
+    if workers <= 1:
+        return [function(item) for item in items]
+    with ProcessPoolExecutor(max_workers=workers, mp_context=pool_context()) as pool:
+        return list(pool.map(function, items))
+
+
+def parse_files(paths, workers=None):
+    """Parse files in parallel, returns one ObservationColumns per path."""
+    return map_files(parse_rinex, paths, workers)
+
+
+def parse_and_merge(paths, workers=None):
+    """Parse files in parallel and merge them into one epoch-ordered table."""
+    return ObservationColumns.concatenate(parse_files(paths, workers))
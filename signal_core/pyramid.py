@@ -0,0 +1,148 @@
+"""Min/max pyramids: a series at every zoom level, served in fixed-size tiles.
+
+Level 0 holds every sample. Each level above merges FANOUT consecutive
+buckets of the one below into a bucket keeping the first and last epoch,
+the lowest and highest value of every column, and whether any slip of
+the column falls inside. Levels stop once one tile holds the whole series, so a series of
+n samples costs about n * FANOUT / (FANOUT - 1) buckets on disk.
+
+A client drawing `width` pixels picks the finest level with about one
+bucket per pixel over its time range and fetches the few tiles covering
+it. A tile is always TILE_BUCKETS buckets, whatever the zoom, so the work
+per request is bounded by the screen, not by the length of the series.
+
+Pyramids are directories of .npy files, opened memory-mapped: reading a
+tile touches only that tile's rows.
+
+    <path>/meta.json
+    <path>/<level>.<field>.npy    field: start, end, <column>.min, <column>.max, <column>.slips
+"""
+import json
+import os
+import secrets
+import shutil
+
+import numpy as np
+
+FANOUT = 4  # buckets of a level merged into one bucket of the next
+TILE_BUCKETS = 512  # buckets per tile, at every level
+META_FILE = "meta.json"
+
+
+def _reduce(array, starts, reduce):
+    return reduce.reduceat(array, starts) if array.size else array
+
+
+def build_levels(epoch, columns, slips=None):
+    """Buckets of every level: a list of {field: array}, finest first.
+
+    `epoch` is int64 ns in increasing order, `columns` maps names to values
+    aligned with it (NaN where missing), `slips` maps some of the names to
+    boolean slip arrays. NaN values are ignored by the min and max.
+    """
+    epoch = np.asarray(epoch, dtype=np.int64)
+    slips = slips or {}
+    level = {"start": epoch, "end": epoch}
+    for name, values in columns.items():
+        values = np.asarray(values, dtype=np.float64)
+        level[f"{name}.min"] = level[f"{name}.max"] = values
+        level[f"{name}.slips"] = np.asarray(slips[name], dtype=bool) if name in slips else np.zeros(epoch.size, bool)
+
+    levels = [level]
+    while len(level["start"]) > TILE_BUCKETS:
+        starts = np.arange(0, len(level["start"]), FANOUT)
+        merged = {"start": level["start"][starts],
+                  "end": level["end"][np.append(starts[1:], len(level["end"])) - 1]}
+        for name in columns:
+            with np.errstate(invalid="ignore"):
+                merged[f"{name}.min"] = _reduce(level[f"{name}.min"], starts, np.fmin)
+                merged[f"{name}.max"] = _reduce(level[f"{name}.max"], starts, np.fmax)
+            merged[f"{name}.slips"] = _reduce(level[f"{name}.slips"], starts, np.logical_or)
+        levels.append(merged)
+        level = merged
+    return levels
+
+
+def write_pyramid(path, epoch, columns, slips=None):
+    """Build the pyramid of a series and write it to the directory `path`.
+
+    The directory appears complete or not at all; when another process has
+    written it meanwhile, its copy is kept.
+    """
+    levels = build_levels(epoch, columns, slips)
+    staging = f"{path}.{secrets.token_hex(8)}.tmp"
+    os.makedirs(staging)
+    for number, level in enumerate(levels):
+        for field, values in level.items():
+            np.save(os.path.join(staging, f"{number}.{field}.npy"), values)
+    epoch = levels[0]["start"]
+    meta = {
+        "columns": list(columns),
+        "samples": int(epoch.size),
+        "start": int(epoch[0]) if epoch.size else None,
+        "end": int(epoch[-1]) if epoch.size else None,
+        "fanout": FANOUT,
+        "tile_buckets": TILE_BUCKETS,
+        "levels": [_level_meta(level, number) for number, level in enumerate(levels)],
+    }
+    with open(os.path.join(staging, META_FILE), "w") as fh:
+        json.dump(meta, fh)
+    try:
+        os.rename(staging, path)
+    except OSError:
+        shutil.rmtree(staging, ignore_errors=True)
+        if not os.path.isdir(path):
+            raise
+    return path
+
+
+def _level_meta(level, number):
+    """Samples per bucket, bucket count and the epoch range of each tile."""
+    count = len(level["start"])
+    starts = level["start"][::TILE_BUCKETS]
+    ends = level["end"][np.append(np.arange(TILE_BUCKETS, count, TILE_BUCKETS), count) - 1] if count else []
+    return {"bucket": FANOUT ** number, "buckets": int(count),
+            "tiles": [[int(s), int(e)] for s, e in zip(starts, ends)]}
+
+
+def is_pyramid(path):
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+class Pyramid:
+    """A written pyramid; tiles are read from memory-mapped levels."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as fh:
+            self.meta = json.load(fh)
+
+    def _field(self, level, field):
+        return np.load(os.path.join(self.path, f"{level}.{field}.npy"), mmap_mode="r")
+
+    def tile(self, level, index):
+        """Buckets of one tile as JSON-ready lists.
+
+        Per column: min and max (None where the column has no value) and the
+        positions in the tile of the buckets holding a slip.
+
+        Raises IndexError for a tile outside the pyramid.
+        """
+        if not 0 <= level < len(self.meta["levels"]) or not 0 <= index < len(self.meta["levels"][level]["tiles"]):
+            raise IndexError(f"no tile {index} at level {level}")
+        rows = slice(index * TILE_BUCKETS, (index + 1) * TILE_BUCKETS)
+        tile = {"level": level, "tile": index,
+                "start": self._field(level, "start")[rows].tolist(),
+                "end": self._field(level, "end")[rows].tolist(),
+                "columns": {}}
+        for name in self.meta["columns"]:
+            tile["columns"][name] = {
+                "min": _nullable(self._field(level, f"{name}.min")[rows]),
+                "max": _nullable(self._field(level, f"{name}.max")[rows]),
+                "slips": np.flatnonzero(self._field(level, f"{name}.slips")[rows]).tolist(),
+            }
+        return tile
+
+
+def _nullable(values):
+    return [None if value != value else value for value in values.tolist()]
@@ -0,0 +1,312 @@
+"""Per-satellite quality summaries, computed while a file is ingested.
+
+StoreWriter feeds every chunk it writes to a QcBuilder, which summarizes
+each (PRN, obs code) series in buckets of QC_BUCKET seconds:
+
+    count      observations (rows) in the bucket
+    zeros      observations whose value is exactly 0 (e.g. 0.000 phase rows)
+    gaps       observations following one or more missing epochs
+    slips      carrier phase slips: the LLI and phase tests of slips.py
+    snr_*      count, sum, min and max of the signal's SNR (S code, > 0)
+
+SNR statistics of an S code are copied to the other codes of its signal
+(S5C -> C5C, L5C, D5C). Zero phase values are missing samples for the
+slip tests. Counts are sums, so the tables of several files, or of
+several buckets, merge by adding them up (see merge and collapse).
+
+The table is written as ``qc.npy`` in the store, a few thousand rows for
+a day of data, so station-wide QC (store_qc) never reads the observations
+again: its cost is proportional to the number of buckets.
+"""
+import numpy as np
+
+from .align import EpochGrid, header_interval, infer_interval
+from .combinations import frequency
+from .rinex import NS_PER_SECOND
+from .slips import MAD_WINDOW, PHASE_WINDOW, SLIP_GAP, mad_step, single_slips
+
+QC_FILE = "qc.npy"
+QC_BUCKET = 900  # seconds summarized by one row
+VALUE_DECIMALS = 3  # of RINEX observations, so their sums are exact once rounded to it
+GAP_STEP = 1.5  # intervals between consecutive samples beyond which epochs are missing
+SLIP_CONTEXT = PHASE_WINDOW + MAD_WINDOW + 2  # samples on either side the slip flag of a sample depends on
+NO_EPOCH = np.iinfo(np.int64).min
+BY_BUCKET, BY_SATELLITE = "bucket", "satellite"
+QC_BY = (BY_BUCKET, BY_SATELLITE)
+
+QC_DTYPE = np.dtype([("prn", "<U4"), ("obs", "<U4"), ("start", "<i8"), ("count", "<i8"), ("zeros", "<i8"),
+                     ("gaps", "<i8"), ("slips", "<i8"), ("snr_count", "<i8"), ("snr_sum", "<f8"),
+                     ("snr_min", "<f8"), ("snr_max", "<f8")])
+SUM_FIELDS = ("count", "zeros", "gaps", "slips", "snr_count", "snr_sum")
+SNR_FIELDS = ("snr_count", "snr_sum", "snr_min", "snr_max")
+
+
+def is_snr(obs_code):
+    """True for a signal strength code (S5C, S9C, ...)."""
+    return obs_code.upper().startswith("S")
+
+
+class QcBuilder:
+    """Accumulates the QC table of one store from its chunks, in file order.
+
+    Gaps and slips continue across chunks: the last epoch of every series,
+    and the last 2 * SLIP_CONTEXT samples of every carrier phase, are
+    carried to the next chunk. A sample's slip flag is counted once the
+    SLIP_CONTEXT samples after it have been seen, or at table(). The
+    tests run on grids starting a multiple of mad_step() epochs after the
+    file's first epoch, so the rolling MAD is sampled at the same epochs
+    and the table is the same whatever the chunk size.
+    """
+
+    def __init__(self, bucket=QC_BUCKET):
+        self.bucket = bucket
+        self.bucket_ns = int(round(bucket * NS_PER_SECOND))
+        self.interval = None
+        self._origin = None
+        self._parts = []
+        self._last_epoch = {}  # (PRN, code) -> last epoch seen
+        self._arcs = {}  # (PRN, code) -> (epoch, value, lli, last epoch counted) of a carrier phase
+
+    def append(self, columns, order=None):
+        """Summarize one chunk of ObservationColumns.
+
+        `order` sorts its rows by (PRN, code), stably, as computed by
+        StoreWriter.append; it is worked out here when not given.
+        """
+        if not len(columns):
+            return
+        if self.interval is None:
+            # Rows are in file order, so the smallest step between them is the interval
+            self.interval = header_interval(columns.header) or infer_interval([columns.epoch])
+            self._origin = getattr(columns.header, "time_of_first_obs", None)
+            if self._origin is None:
+                self._origin = int(columns.epoch.min())
+        n_codes = len(columns.obs_codes)
+        key = columns.prn.astype(np.int64) * n_codes + columns.obs
+        if order is None:
+            order = np.argsort(key, kind="stable")
+        key, epoch, value = key[order], columns.epoch[order], columns.value[order]
+        runs = np.flatnonzero(np.concatenate(([True], key[1:] != key[:-1])))
+        ends = np.append(runs[1:], len(key)) - 1
+        names = [(columns.prns[k // n_codes], columns.obs_codes[k % n_codes]) for k in key[runs].tolist()]
+
+        # Step from the previous sample of each series; the first one of a
+        # series steps from its last sample in the previous chunk.
+        previous = np.empty_like(epoch)
+        previous[1:] = epoch[:-1]
+        previous[runs] = [self._last_epoch.get(name, first) for name, first in zip(names, epoch[runs].tolist())]
+        self._last_epoch.update(zip(names, epoch[ends].tolist()))
+        if self.interval:
+            gap = epoch - previous > GAP_STEP * self.interval
+        else:
+            gap = np.zeros(len(epoch), dtype=bool)
+
+        start = epoch // self.bucket_ns * self.bucket_ns
+        groups = np.flatnonzero(np.concatenate(([True], (key[1:] != key[:-1]) | (start[1:] != start[:-1]))))
+        snr = np.array([is_snr(code) for code in columns.obs_codes])[key % n_codes] & (value > 0)
+        part = np.zeros(len(groups), QC_DTYPE)
+        part["prn"] = np.array(columns.prns)[key[groups] // n_codes]
+        part["obs"] = np.array(columns.obs_codes)[key[groups] % n_codes]
+        part["start"] = start[groups]
+        part["count"] = np.diff(np.append(groups, len(key)))
+        part["zeros"] = np.add.reduceat((value == 0).astype(np.int64), groups)
+        part["gaps"] = np.add.reduceat(gap.astype(np.int64), groups)
+        part["snr_count"] = np.add.reduceat(snr.astype(np.int64), groups)
+        part["snr_sum"] = np.add.reduceat(np.where(snr, value, 0.0), groups)
+        part["snr_min"] = np.fmin.reduceat(np.where(snr, value, np.nan), groups)
+        part["snr_max"] = np.fmax.reduceat(np.where(snr, value, np.nan), groups)
+        self._parts.append(part)
+        if self.interval:
+            self._add_phases(names, runs, ends, epoch, value, columns.lli[order])
+
+    def _add_phases(self, names, runs, ends, epoch, value, lli):
+        """Run the slip tests on the carrier phases of a chunk, joined to their carried samples."""
+        active, finished = [], []
+        for name, first, last in zip(names, runs.tolist(), ends.tolist()):
+            freq = frequency(name[1]) if name[1].startswith("L") else None
+            if freq is None:
+                continue
+            rows = slice(first, last + 1)
+            arc = self._arcs.pop(name, None)
+            if arc is None and not value[rows].any():
+                continue  # no phase tracked (all 0.000), nothing to test
+            if arc is None:
+                arc = (epoch[rows], value[rows], lli[rows], NO_EPOCH)
+            elif epoch[first] - arc[0][-1] > SLIP_CONTEXT * self.interval:
+                # Too far apart to share a test window: close the old arc on its own
+                finished.append((name, freq) + arc)
+                arc = (epoch[rows], value[rows], lli[rows], NO_EPOCH)
+            else:
+                arc = (np.concatenate((arc[0], epoch[rows])), np.concatenate((arc[1], value[rows])),
+                       np.concatenate((arc[2], lli[rows])), arc[3])
+            active.append((name, freq) + arc)
+        self._count_slips(finished, final=True)
+        self._count_slips(active, final=False)
+
+    def _count_slips(self, arcs, final):
+        """Add the slips of (name, freq, epoch, value, lli, counted) arcs; unless final, carry their tails."""
+        for freq in {arc[1] for arc in arcs}:
+            group = [arc for arc in arcs if arc[1] == freq]
+            grid = EpochGrid.covering([arc[2] for arc in group], self.interval, self._origin)
+            lead = (grid.start - self._origin) // self.interval % mad_step()
+            grid = EpochGrid(grid.start - lead * self.interval, self.interval, grid.size + lead)
+            phase = np.array([grid.place(epoch, np.where(value == 0, np.nan, value))
+                              for _, _, epoch, value, _, _ in group])
+            lli = np.array([grid.place(epoch, flags, fill=0) for _, _, epoch, _, flags, _ in group])
+            flags = single_slips(phase, freq, lli) & ~np.uint8(SLIP_GAP)  # gaps are counted apart
+            for (name, _, epoch, value, arc_lli, counted), row in zip(group, flags):
+                if final:
+                    limit = int(epoch[-1])
+                elif len(epoch) > SLIP_CONTEXT:
+                    limit = int(epoch[-1 - SLIP_CONTEXT])
+                else:
+                    limit = counted
+                slipped = grid.epochs[row != 0]
+                slipped = slipped[(slipped > counted) & (slipped <= limit)]
+                if slipped.size:
+                    part = np.zeros(len(slipped), QC_DTYPE)
+                    part["prn"], part["obs"] = name
+                    part["start"] = slipped // self.bucket_ns * self.bucket_ns
+                    part["slips"] = 1
+                    part["snr_min"] = part["snr_max"] = np.nan
+                    self._parts.append(part)
+                if not final:
+                    keep = slice(-2 * SLIP_CONTEXT - 1, None)
+                    self._arcs[name] = (epoch[keep], value[keep], arc_lli[keep], limit)
+
+    def table(self):
+        """The QC table of every chunk appended, one row per (PRN, code, bucket)."""
+        if self._arcs:
+            arcs = [(name, frequency(name[1])) + arc for name, arc in self._arcs.items()]
+            self._arcs = {}
+            self._count_slips(arcs, final=True)
+        return attach_snr(merge(self._parts))
+
+
+def merge(tables):
+    """One row per (PRN, code, bucket start) of QC tables, their counts added up."""
+    table = np.concatenate(tables) if tables else np.zeros(0, QC_DTYPE)
+    if not len(table):
+        return table
+    table = table[np.lexsort((table["start"], table["obs"], table["prn"]))]
+    new = np.ones(len(table), dtype=bool)
+    new[1:] = ((table["prn"][1:] != table["prn"][:-1]) | (table["obs"][1:] != table["obs"][:-1])
+               | (table["start"][1:] != table["start"][:-1]))
+    groups = np.flatnonzero(new)
+    merged = table[groups]
+    for field in SUM_FIELDS:
+        merged[field] = np.add.reduceat(table[field], groups)
+    # Sums in any order, e.g. by chunk, come out the same
+    merged["snr_sum"] = np.round(merged["snr_sum"], VALUE_DECIMALS)
+    merged["snr_min"] = np.fmin.reduceat(table["snr_min"], groups)
+    merged["snr_max"] = np.fmax.reduceat(table["snr_max"], groups)
+    return merged
+
+
+def attach_snr(table):
+    """Copy the SNR statistics of each S code row to the rows of the other codes of its signal."""
+    if not len(table):
+        return table
+    codes, code_ids = np.unique(table["obs"], return_inverse=True)
+    signal_ids = np.unique([code[1:] for code in codes], return_inverse=True)[1][code_ids]
+    snr = np.array([is_snr(code) for code in codes])[code_ids]
+    prn_ids = np.unique(table["prn"], return_inverse=True)[1]
+    starts, start_ids = np.unique(table["start"], return_inverse=True)
+    keys = (prn_ids * (signal_ids.max() + 1) + signal_ids) * len(starts) + start_ids
+    _, signal_rows = np.unique(keys, return_inverse=True)
+    sources = np.full(signal_rows.max() + 1, -1)
+    sources[signal_rows[snr]] = np.flatnonzero(snr)
+    source = sources[signal_rows]
+    rows = (source >= 0) & ~snr
+    for field in SNR_FIELDS:
+        table[field][rows] = table[field][source[rows]]
+    return table
+
+
+def collapse(table):
+    """Every bucket of each (PRN, code) merged into one row, starting at the table's first bucket."""
+    if not len(table):
+        return table
+    table = table.copy()
+    table["start"] = table["start"].min()
+    return merge([table])
+
+
+def between(table, start=None, end=None, bucket_ns=0):
+    """Rows of the buckets overlapping [start, end] ns."""
+    keep = np.ones(len(table), dtype=bool)
+    if start is not None:
+        keep &= table["start"] + bucket_ns > start
+    if end is not None:
+        keep &= table["start"] <= end
+    return table[keep]
+
+
+def qc_records(table, span, interval=None, first_epoch=None, last_epoch=None):
+    """JSON-ready rows of a QC table, with availability, zero rate and mean SNR.
+
+    `span` is the ns covered by each row. Availability is the share of the
+    epochs of that span, clipped to [first_epoch, last_epoch], holding a
+    non-zero value; None without an interval.
+    """
+    starts = table["start"]
+    usable = table["count"] - table["zeros"]
+    availability = [None] * len(table)
+    if interval:
+        begin = starts if first_epoch is None else np.maximum(starts, first_epoch)
+        stop = starts + span if last_epoch is None else np.minimum(starts + span, last_epoch + interval)
+        expected = np.maximum((stop - begin + interval // 2) // interval, 1)
+        availability = np.round(np.minimum(usable / expected, 1.0), 4).tolist()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        zero_rate = np.round(table["zeros"] / table["count"], 4)
+        snr_mean = np.round(table["snr_sum"] / table["snr_count"], 3)
+    records = []
+    for n, row in enumerate(table.tolist()):
+        record = dict(zip(QC_DTYPE.names, row))
+        del record["snr_sum"]
+        record.update(availability=availability[n], zero_rate=_number(zero_rate[n]), snr_mean=_number(snr_mean[n]),
+                      snr_min=_number(record["snr_min"]), snr_max=_number(record["snr_max"]))
+        records.append(record)
+    return records
+
+
+def _number(value):
+    """float, None for NaN (not JSON)."""
+    value = float(value)
+    return None if np.isnan(value) else value
+
+
+def store_qc(store, by=BY_BUCKET, prns=None, obs_codes=None, start=None, end=None):
+    """QC of a store or archive between `start` and `end` ns, as a JSON-ready dict.
+
+    `by` is BY_BUCKET (one row per PRN, code and bucket) or BY_SATELLITE
+    (one row per PRN and code over the whole range). Only the QC tables
+    are read, never the observations.
+    """
+    if by not in QC_BY:
+        raise ValueError(f"by must be one of {', '.join(QC_BY)}")
+    table = store.qc(start, end)
+    if prns:
+        table = table[np.isin(table["prn"], [prn.upper() for prn in prns])]
+    if obs_codes:
+        table = table[np.isin(table["obs"], [code.upper() for code in obs_codes])]
+    interval = getattr(store, "interval", None)
+    bucket = store.qc_bucket or QC_BUCKET
+    first, last = store.first_epoch, store.last_epoch
+    if start is not None and first is not None:
+        first = max(first, start)
+    if end is not None and last is not None:
+        last = min(last, end)
+    span = int(round(bucket * NS_PER_SECOND))
+    if by == BY_SATELLITE:
+        table = collapse(table)
+        if len(table) and last is not None:
+            span = last - int(table["start"][0]) + (interval or 0) + 1
+    return {
+        "by": by,
+        "bucket": bucket,
+        "interval": interval / NS_PER_SECOND if interval else None,
+        "first_epoch": first,
+        "last_epoch": last,
+        "rows": qc_records(table, span, interval, first, last),
+    }
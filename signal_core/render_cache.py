@@ -0,0 +1,94 @@
+"""Content-addressed cache of rendered graph images.
+
+An image is stored under the SHA-256 of the data it was drawn from and the
+plot parameters, so the same request is rendered only once and the key
+doubles as a strong ETag: the bytes behind a key never change.
+
+    <root>/<key>.png
+
+Reads refresh a file's mtime; when the images exceed the disk budget the
+least recently used ones are removed first.
+"""
+import functools
+import hashlib
+import json
+import os
+import secrets
+
+from .archive import file_sha256
+
+RENDER_BUDGET = 256 << 20  # bytes of images kept on disk
+IMAGE_SUFFIX = ".png"
+
+
+def render_key(data_sha256, **params):
+    """Cache key of an image of the data `data_sha256` drawn with `params`."""
+    payload = json.dumps({"data": data_sha256, **params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def data_sha256(path):
+    """SHA-256 of a data file, remembered while its size and mtime stay the same."""
+    stat = os.stat(path)
+    return _data_sha256(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+@functools.lru_cache(maxsize=256)
+def _data_sha256(path, size, mtime_ns):
+    return file_sha256(path)
+
+
+class RenderCache:
+    """Rendered images by key, evicted least recently used under `budget` bytes."""
+
+    def __init__(self, root, budget=RENDER_BUDGET):
+        self.root = root
+        self.budget = budget
+        os.makedirs(root, exist_ok=True)
+
+    def path(self, key):
+        return os.path.join(self.root, key + IMAGE_SUFFIX)
+
+    def get(self, key):
+        """Path of the cached image for `key`, None on a miss."""
+        path = self.path(key)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def staging_path(self, key):
+        """Where to render an image before put(); not visible to get()."""
+        return os.path.join(self.root, f"{key}.{secrets.token_hex(8)}.tmp")
+
+    def put(self, key, source):
+        """Move the rendered file `source` into the cache, returns its path."""
+        path = self.path(key)
+        os.replace(source, path)
+        self.evict()
+        return path
+
+    def evict(self):
+        """Remove the least recently used images until the cache fits its budget.
+
+        Several processes may evict at once; files already gone are skipped.
+        """
+        images = []
+        for entry in os.scandir(self.root):
+            if entry.name.endswith(IMAGE_SUFFIX):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                images.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in images)
+        # The newest image always stays, even when it alone exceeds the budget.
+        for _, size, path in sorted(images)[:-1]:
+            if total <= self.budget:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,673 @@
+"""Columnar RINEX 3 observation parser.
+
+Observations are decoded straight into typed NumPy columns instead of one
+Python dict per value:
+
+    epoch  int64    epoch time in nanoseconds since 1970-01-01
+    prn    int16    index into ``ObservationColumns.prns``
+    obs    int16    index into ``ObservationColumns.obs_codes``
+    value  float64  observation value
+    lli    int8     loss-of-lock indicator (0 when blank)
+    ssi    int8     signal strength indicator (0 when blank)
+
+The body of the file is read in blocks that always end on an epoch boundary.
+Each block is decoded in bulk: lines are located with NumPy, gathered into a
+fixed-width character matrix and every 16-character observation field of
+many PRN lines is sliced and decoded at once.
+
+Files are opened through compression.py, so gzip, bzip2, zip and Unix
+compress files are parsed without a decompressed copy on disk. Compact
+(Hatanaka) RINEX bodies are decoded by hatanaka.py into the same columns.
+"""
+import os
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .compression import open_rinex, source_position
+from .hatanaka import HEAD_SIZE, check_version, is_compact, iter_compact_blocks
+
+SYSTEM_NAMES = {'G': 'GPS', 'R': 'GLONASS', 'S': 'SBAS', 'E': 'Galileo',
+                'J': 'QZSS', 'C': 'BDS', 'I': 'IRNSS', 'M': 'Mixed'}
+
+PRN_WIDTH = 3
+FIELD_WIDTH = 16  # F14.3 value, LLI digit, SSI digit
+VALUE_WIDTH = 14
+VALUE_DECIMALS = 3
+VALUE_POINT = VALUE_WIDTH - VALUE_DECIMALS - 1
+EPOCH_LINE_WIDTH = 35
+EPOCH_SECOND_DECIMALS = 7
+EPOCH_SECOND_POINT = 21
+
+BLOCK_SIZE = 1 << 20  # bytes of body text decoded per block
+LINE_BATCH = 8192  # PRN lines gathered into one character matrix
+EPOCHS_PER_CHUNK = 2880  # epochs per streamed chunk: a day at 30 s, 48 min at 1 Hz
+
+NS_PER_SECOND = 1_000_000_000
+
+COLUMN_DTYPES = (
+    ("epoch", np.int64),
+    ("prn", np.int16),
+    ("obs", np.int16),
+    ("value", np.float64),
+    ("lli", np.int8),
+    ("ssi", np.int8),
+)
+COLUMN_NAMES = tuple(name for name, _ in COLUMN_DTYPES)
+
+_SPACE = ord(' ')
+_EPOCH_MARK = ord('>')
+
+
+def header_time(line):
+    """Nanoseconds since 1970-01-01 of a TIME OF FIRST / LAST OBS line (5I6, F13.7)."""
+    year, month, day, hour, minute = (int(line[i:i + 6]) for i in range(0, 30, 6))
+    seconds_ns = int(round(float(line[30:43]) * NS_PER_SECOND))
+    date = np.datetime64(f"{year:04d}-{month:02d}-{day:02d}", "D").astype(np.int64)
+    return ((int(date) * 24 + hour) * 60 + minute) * 60 * NS_PER_SECOND + seconds_ns
+
+
+def _optional(parse, line):
+    """parse(line), None when the line is malformed: metadata never stops a parse."""
+    try:
+        return parse(line)
+    except ValueError:
+        return None
+
+
+def _header_floats(line, count):
+    """`count` numbers of a 3F14.4 header line, None when malformed.
+
+    Split on blanks: some receivers do not keep to the field widths.
+    """
+    try:
+        values = [float(value) for value in line[:60].split()[:count]]
+    except ValueError:
+        return None
+    return values if len(values) == count else None
+
+
+class RinexHeader:
+    """Header fields of a RINEX 3 observation file.
+
+    Times are ns since 1970-01-01 in the file's time system, like the epoch
+    column; positions are in metres.
+    """
+
+    def __init__(self):
+        self.rinex_version = None
+        self.observation_type = ""
+        self.system_type = ""
+        self.observation_codes = {}
+        self.interval = None  # seconds between epochs, when the header gives it
+        self.marker_name = ""
+        self.receiver_type = ""
+        self.antenna_type = ""
+        self.approx_position = None  # [x, y, z] ECEF
+        self.antenna_delta = None  # [height, east, north]
+        self.signal_strength_unit = ""
+        self.time_of_first_obs = None
+        self.time_of_last_obs = None
+        self.time_system = ""
+        self._last_system = None
+
+    def parse_line(self, line):
+        """Consume one header line, returns True on END OF HEADER."""
+        label = line[60:].strip()
+        if label == 'RINEX VERSION / TYPE':
+            self.rinex_version = float(line[:9].strip())
+            self.observation_type = line[20:40].strip()
+            system_char = line[40:41].strip()
+            self.system_type = SYSTEM_NAMES.get(system_char, system_char)
+        elif label == 'SYS / # / OBS TYPES':
+            system = line[0:1].strip()
+            codes = line[7:60].split()
+            if system:
+                self.observation_codes[system] = codes
+                self._last_system = system
+            elif self._last_system is not None:  # continuation line
+                self.observation_codes[self._last_system].extend(codes)
+        elif label == 'INTERVAL':
+            self.interval = float(line[:10])
+        elif label == 'MARKER NAME':
+            self.marker_name = line[:60].strip()
+        elif label == 'REC # / TYPE / VERS':
+            self.receiver_type = line[20:40].strip()
+        elif label == 'ANT # / TYPE':
+            self.antenna_type = line[20:40].strip()
+        elif label == 'APPROX POSITION XYZ':
+            self.approx_position = _header_floats(line, 3)
+        elif label == 'ANTENNA: DELTA H/E/N':
+            self.antenna_delta = _header_floats(line, 3)
+        elif label == 'SIGNAL STRENGTH UNIT':
+            self.signal_strength_unit = line[:20].strip()
+        elif label == 'TIME OF FIRST OBS':
+            self.time_of_first_obs = _optional(header_time, line)
+            self.time_system = line[48:51].strip()
+        elif label == 'TIME OF LAST OBS':
+            self.time_of_last_obs = _optional(header_time, line)
+        return label == 'END OF HEADER'
+
+    def to_dict(self):
+        return {
+            'rinex_version': self.rinex_version,
+            'observation_type': self.observation_type,
+            'system_type': self.system_type,
+            'observation_codes': self.observation_codes,
+            'interval': self.interval,
+            'marker_name': self.marker_name,
+            'receiver_type': self.receiver_type,
+            'antenna_type': self.antenna_type,
+            'approx_position': self.approx_position,
+            'antenna_delta': self.antenna_delta,
+            'signal_strength_unit': self.signal_strength_unit,
+            'time_of_first_obs': self.time_of_first_obs,
+            'time_of_last_obs': self.time_of_last_obs,
+            'time_system': self.time_system,
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        header = cls()
+        for name, value in values.items():
+            setattr(header, name, value)
+        return header
+
+    @classmethod
+    def read(cls, fh):
+        """Read the header from a binary file object positioned at its start."""
+        header = cls()
+        for raw in fh:
+            if header.parse_line(raw.decode('ascii', 'replace').rstrip('\r\n')):
+                break
+        return header
+
+
+class ObservationColumns:
+    """A table of observations held as typed NumPy columns."""
+
+    def __init__(self, epoch, prn, obs, value, lli, ssi, prns, obs_codes, header=None):
+        self.epoch = epoch
+        self.prn = prn
+        self.obs = obs
+        self.value = value
+        self.lli = lli
+        self.ssi = ssi
+        self.prns = list(prns)
+        self.obs_codes = list(obs_codes)
+        self.header = header
+
+    def __len__(self):
+        return len(self.epoch)
+
+    @property
+    def nbytes(self):
+        return sum(getattr(self, name).nbytes for name in COLUMN_NAMES)
+
+    @property
+    def epoch_count(self):
+        """Distinct epochs of an epoch-ordered table."""
+        return int(np.count_nonzero(np.diff(self.epoch))) + 1 if len(self.epoch) else 0
+
+    @classmethod
+    def empty(cls, prns=(), obs_codes=(), header=None):
+        arrays = [np.empty(0, dtype) for _, dtype in COLUMN_DTYPES]
+        return cls(*arrays, prns=prns, obs_codes=obs_codes, header=header)
+
+    @classmethod
+    def concatenate(cls, parts):
+        """Join epoch-ordered tables with their own dictionaries into one.
+
+        The parts are combined with a k-way epoch merge, never a global sort.
+        """
+        parts = [part for part in parts if part is not None]
+        if not parts:
+            return cls.empty()
+        prns, obs_codes = [], []
+        prn_index, obs_index = {}, {}
+        prn_codes, obs_ids = [], []
+        for part in parts:
+            prn_map = np.array([_intern(prn_index, prns, p) for p in part.prns], dtype=np.int16)
+            obs_map = np.array([_intern(obs_index, obs_codes, c) for c in part.obs_codes], dtype=np.int16)
+            prn_codes.append(prn_map[part.prn] if len(part) else part.prn)
+            obs_ids.append(obs_map[part.obs] if len(part) else part.obs)
+
+        columns = merge_sorted([
+            {"epoch": part.epoch, "prn": prn, "obs": obs, "value": part.value, "lli": part.lli, "ssi": part.ssi}
+            for part, prn, obs in zip(parts, prn_codes, obs_ids)
+        ])
+        return cls(prns=prns, obs_codes=obs_codes, header=parts[0].header, **columns)
+
+    def to_frame(self):
+        """Return the table as a DataFrame with the legacy column names."""
+        import pandas as pd
+
+        prn = pd.Categorical.from_codes(self.prn, self.prns)
+        systems = sorted({p[:1] for p in self.prns})
+        system_codes = np.array([systems.index(p[:1]) for p in self.prns], dtype=np.int16)
+        return pd.DataFrame({
+            'Epoch': self.epoch.view('datetime64[ns]'),
+            'Obs_Type': pd.Categorical.from_codes(self.obs, self.obs_codes),
+            'PRN': prn,
+            'GNSS_System': pd.Categorical.from_codes(system_codes[self.prn], systems)
+            if len(self) else pd.Categorical([], categories=systems),
+            'Value': self.value,
+            'LLI': self.lli,
+            'SSI': self.ssi,
+        })
+
+
+class ColumnBuilder:
+    """Preallocated typed columns that grow geometrically when full."""
+
+    def __init__(self, capacity=4096):
+        self.size = 0
+        self._arrays = {name: np.empty(max(int(capacity), 16), dtype) for name, dtype in COLUMN_DTYPES}
+
+    @property
+    def capacity(self):
+        return len(self._arrays["epoch"])
+
+    def reserve(self, n):
+        if self.size + n <= self.capacity:
+            return
+        new_capacity = max(self.size + n, 2 * self.capacity)
+        for name, array in self._arrays.items():
+            grown = np.empty(new_capacity, array.dtype)
+            grown[:self.size] = array[:self.size]
+            self._arrays[name] = grown
+
+    def append(self, epoch, prn, obs, value, lli, ssi):
+        n = len(value)
+        self.reserve(n)
+        end = self.size + n
+        self._arrays["epoch"][self.size:end] = epoch
+        self._arrays["prn"][self.size:end] = prn
+        self._arrays["obs"][self.size:end] = obs
+        self._arrays["value"][self.size:end] = value
+        self._arrays["lli"][self.size:end] = lli
+        self._arrays["ssi"][self.size:end] = ssi
+        self.size = end
+
+    def take(self):
+        """Hand over the filled part of the columns and start empty."""
+        columns = {}
+        for name, array in self._arrays.items():
+            array.resize(self.size, refcheck=False)
+            columns[name] = array
+        self.__init__(16)
+        return columns
+
+
+class RinexParser:
+    """Decodes the body of a RINEX 3 file into typed columns."""
+
+    def __init__(self, header, capacity=4096):
+        self.header = header
+        self.prns, self._prn_index = [], {}
+        self.obs_codes, self._obs_index = [], {}
+        self._system_obs = {
+            system: np.array([_intern(self._obs_index, self.obs_codes, c) for c in codes], dtype=np.int16)
+            for system, codes in header.observation_codes.items() if codes
+        }
+        self._prn_keys = {}
+        self.builder = ColumnBuilder(capacity)
+        self.epoch_count = 0
+
+    def decode_block(self, buf):
+        """Decode a block of complete epoch records (bytes) in bulk."""
+        data = np.frombuffer(buf, dtype=np.uint8)
+        if not data.size:
+            return
+        newlines = np.flatnonzero(data == 10)
+        starts = np.concatenate(([0], newlines + 1))
+        ends = np.concatenate((newlines, [data.size]))
+        ends = ends - ((ends > starts) & (data[np.maximum(ends - 1, 0)] == 13))
+        lengths = ends - starts
+        nonempty = lengths > 0
+        starts, lengths = starts[nonempty], lengths[nonempty]
+        first = data[starts]
+
+        is_epoch = first == _EPOCH_MARK
+        epoch_rows = np.flatnonzero(is_epoch)
+        if not epoch_rows.size:
+            return
+        epoch_chars = _line_matrix(data, starts[epoch_rows], lengths[epoch_rows], EPOCH_LINE_WIDTH)
+        epoch_ns, flags, counts = _decode_epochs(epoch_chars)
+        self.epoch_count += int(np.count_nonzero(flags < 2))
+
+        owner = np.cumsum(is_epoch) - 1
+        obs_mask = ~is_epoch & (owner >= 0) & (lengths >= PRN_WIDTH)
+        # Event records (flag > 1) are followed by header or slip lines, not observations.
+        for k in np.flatnonzero(flags > 1):
+            row = epoch_rows[k]
+            obs_mask[row + 1:row + 1 + counts[k]] = False
+
+        obs_rows = np.flatnonzero(obs_mask)
+        systems = first[obs_rows]
+        parts = []
+        for system, code_ids in self._system_obs.items():
+            rows = obs_rows[systems == ord(system)]
+            for batch in range(0, rows.size, LINE_BATCH):
+                parts.append(self._decode_prn_lines(data, rows[batch:batch + LINE_BATCH], starts, lengths,
+                                                    epoch_ns[owner[rows[batch:batch + LINE_BATCH]]], code_ids))
+        if not parts:
+            return
+        if len(parts) > 1:
+            # Mixed systems: restore file order so the block stays epoch ordered.
+            order = np.argsort(np.concatenate([part[0] for part in parts]), kind='stable')
+            merged = [np.concatenate([part[i] for part in parts])[order] for i in range(1, 7)]
+        else:
+            merged = parts[0][1:]
+        self.builder.append(*merged)
+
+    def decode_compact_block(self, block):
+        """Add the observations of a hatanaka.CompactBlock to the columns."""
+        if not len(block.epoch_lines):
+            return
+        epoch_ns, flags, _ = _decode_epochs(block.epoch_lines)
+        self.epoch_count += int(np.count_nonzero(flags < 2))
+        if not len(block.value):
+            return
+        line = block.line
+        systems = block.prn_chars[line, 0]
+        obs = np.empty(len(line), dtype=np.int16)
+        for system, code_ids in self._system_obs.items():
+            rows = np.flatnonzero(systems == ord(system))
+            obs[rows] = code_ids[block.field[rows]]
+        # Values are exact thousandths, divided as the text decoder divides its mantissas.
+        self.builder.append(epoch_ns[block.line_epoch[line]], self._prn_ids(block.prn_chars)[line], obs,
+                            block.value / 10.0 ** VALUE_DECIMALS, _decode_flag(block.lli), _decode_flag(block.ssi))
+
+    def _decode_prn_lines(self, data, rows, starts, lengths, epochs, code_ids):
+        n_codes = len(code_ids)
+        chars = _line_matrix(data, starts[rows], lengths[rows], PRN_WIDTH + FIELD_WIDTH * n_codes)
+        prn_ids = self._prn_ids(chars[:, :PRN_WIDTH])
+        value, present, lli, ssi = _decode_fields(chars, n_codes)
+        line = np.repeat(rows, n_codes)
+        epoch = np.repeat(epochs, n_codes)
+        prn = np.repeat(prn_ids, n_codes)
+        obs = np.tile(code_ids, len(rows))
+        # Blank fields carry no observation and are not stored.
+        present = present.ravel()
+        return (line[present], epoch[present], prn[present], obs[present],
+                value.ravel()[present], lli.ravel()[present], ssi.ravel()[present])
+
+    def _prn_ids(self, prn_chars):
+        keys = (prn_chars[:, 0].astype(np.int32) << 16) | (prn_chars[:, 1].astype(np.int32) << 8) | prn_chars[:, 2]
+        unique, inverse = np.unique(keys, return_inverse=True)
+        ids = np.empty(unique.size, dtype=np.int16)
+        for i, key in enumerate(unique.tolist()):
+            prn_id = self._prn_keys.get(key)
+            if prn_id is None:
+                name = bytes([(key >> 16) & 0xFF, (key >> 8) & 0xFF, key & 0xFF]).decode('ascii', 'replace')
+                prn_id = _intern(self._prn_index, self.prns, name.strip())
+                self._prn_keys[key] = prn_id
+            ids[i] = prn_id
+        return ids[inverse.ravel()]
+
+    def take_columns(self):
+        """Return everything decoded since the last call as ObservationColumns."""
+        return ObservationColumns(prns=self.prns, obs_codes=self.obs_codes, header=self.header,
+                                  **self.builder.take())
+
+
+def merge_sorted(parts):
+    """Stable k-way merge of epoch-ordered column dicts.
+
+    Parts that follow each other in time are simply concatenated; otherwise
+    they are merged pairwise in a balanced tree, O(n log k) overall.
+    """
+    parts = [part for part in parts if len(part["epoch"])] or parts[:1]
+    if len(parts) == 1:
+        return parts[0]
+    if all(a["epoch"][-1] <= b["epoch"][0] for a, b in zip(parts, parts[1:])):
+        return {name: np.concatenate([part[name] for part in parts]) for name in parts[0]}
+    while len(parts) > 1:
+        merged = [_merge_two(parts[i], parts[i + 1]) for i in range(0, len(parts) - 1, 2)]
+        if len(parts) % 2:
+            merged.append(parts[-1])
+        parts = merged
+    return parts[0]
+
+
+def _merge_two(left, right):
+    a, b = left["epoch"], right["epoch"]
+    # Final position of each row: its rank in its own part plus the number of
+    # rows of the other part that sort before it (ties keep `left` first).
+    to_a = np.arange(len(a)) + np.searchsorted(b, a, side="left")
+    to_b = np.arange(len(b)) + np.searchsorted(a, b, side="right")
+    merged = {}
+    for name, column in left.items():
+        out = np.empty(len(a) + len(b), dtype=column.dtype)
+        out[to_a] = column
+        out[to_b] = right[name]
+        merged[name] = out
+    return merged
+
+
+def iter_body_blocks(fh, block_size=BLOCK_SIZE):
+    """Yield chunks of the observation body that end on an epoch boundary."""
+    pending = b''
+    while True:
+        chunk = fh.read(block_size)
+        if not chunk:
+            if pending:
+                yield pending
+            return
+        buf = pending + chunk if pending else chunk
+        cut = buf.rfind(b'\n>')
+        if cut < 0:
+            pending = buf
+            continue
+        yield buf[:cut + 1]
+        pending = buf[cut + 1:]
+
+
+def iter_epoch_blocks(fh, epochs_per_block, read_size=BLOCK_SIZE):
+    """Yield the observation body in blocks of `epochs_per_block` epoch records.
+
+    Only the current block is held in memory, whatever the size of the file.
+    """
+    parts, size, marks = [], 0, []
+    previous = 10  # the body starts at the beginning of a line
+    while True:
+        chunk = fh.read(read_size)
+        if chunk:
+            data = np.frombuffer(chunk, dtype=np.uint8)
+            line_start = np.empty(data.size, dtype=bool)
+            line_start[0] = previous == 10
+            line_start[1:] = data[:-1] == 10
+            marks.extend((size + np.flatnonzero(line_start & (data == _EPOCH_MARK))).tolist())
+            parts.append(chunk)
+            size += len(chunk)
+            previous = data[-1]
+        while len(marks) > epochs_per_block:
+            cut = marks[epochs_per_block]
+            buf = b''.join(parts)
+            yield buf[:cut]
+            parts, size = [buf[cut:]], size - cut
+            marks = [mark - cut for mark in marks[epochs_per_block:]]
+        if not chunk:
+            if size:
+                yield b''.join(parts)
+            return
+
+
+def iter_rinex_chunks(filepath, epochs_per_chunk=EPOCHS_PER_CHUNK, progress=None):
+    """Parse a RINEX 3 file lazily, yielding ObservationColumns per epoch chunk.
+
+    Peak memory depends on `epochs_per_chunk`, not on the size of the file.
+    `progress(bytes_read, epochs)` is called after every chunk, with the
+    bytes of the file on disk (compressed or not) read so far.
+    """
+    with open_rinex(filepath) as fh:
+        compact = _compact_head(fh)
+        header = RinexHeader.read(fh)
+        parser = RinexParser(header, capacity=16)
+        if compact:
+            blocks = iter_compact_blocks(fh, _type_counts(header), epochs_per_chunk)
+        else:
+            blocks = iter_epoch_blocks(fh, epochs_per_chunk)
+        for block in blocks:
+            if compact:
+                parser.decode_compact_block(block)
+            else:
+                parser.builder.reserve(len(block) // FIELD_WIDTH + 1)
+                parser.decode_block(block)
+            if progress is not None:
+                progress(source_position(fh), parser.epoch_count)
+            yield parser.take_columns()
+
+
+def parse_rinex(filepath, block_size=BLOCK_SIZE):
+    """Parse a RINEX 3 observation file, plain, compact or compressed, into ObservationColumns."""
+    with open_rinex(filepath) as fh:
+        compact = _compact_head(fh)
+        header = RinexHeader.read(fh)
+        body_size = max(os.path.getsize(filepath) - source_position(fh), 0)
+        # Every stored observation takes at least one 16 character field of
+        # plain text; compressed bodies just grow the columns as they go.
+        parser = RinexParser(header, capacity=body_size // FIELD_WIDTH + 1)
+        if compact:
+            for block in iter_compact_blocks(fh, _type_counts(header)):
+                parser.decode_compact_block(block)
+        else:
+            for block in iter_body_blocks(fh, block_size):
+                parser.decode_block(block)
+    return parser.take_columns()
+
+
+def _compact_head(fh):
+    """True when the file from open_rinex holds compact RINEX; raises ValueError for unsupported versions."""
+    head = fh.peek(HEAD_SIZE)
+    if not is_compact(head):
+        return False
+    check_version(head)
+    return True
+
+
+def _type_counts(header):
+    return {system: len(codes) for system, codes in header.observation_codes.items()}
+
+
+def _intern(index, values, value):
+    position = index.get(value)
+    if position is None:
+        position = index[value] = len(values)
+        values.append(value)
+    return position
+
+
+def _line_matrix(data, starts, lengths, width):
+    """Gather lines into a space-padded (n, width) uint8 matrix."""
+    full = lengths >= width
+    if full.all():
+        # Rows of a sliding-window view are the lines themselves, so the
+        # gather is a single fancy index without an (n, width) index matrix.
+        return sliding_window_view(data, width)[starts]
+    chars = np.empty((len(starts), width), dtype=np.uint8)
+    if full.any():
+        chars[full] = sliding_window_view(data, width)[starts[full]]
+    short = np.flatnonzero(~full)
+    columns = np.arange(width)
+    gathered = np.take(data, starts[short, None] + columns, mode='clip')
+    chars[short] = np.where(columns < lengths[short, None], gathered, _SPACE)
+    return chars
+
+
+def _accumulate_digits(chars):
+    """Read fixed-width decimal fields as integer mantissas.
+
+    Returns the mantissa, the number of digits after the decimal point, a
+    negative sign mask and a mask of fields that contain any digit.
+    """
+    digits = chars - 48
+    is_digit = digits < 10  # uint8 wraps for characters below '0'
+    mantissa = np.zeros(len(chars), dtype=np.int64)
+    decimals = np.zeros(len(chars), dtype=np.int64)
+    after_point = np.zeros(len(chars), dtype=bool)
+    for j in range(chars.shape[1]):
+        d = is_digit[:, j]
+        mantissa = np.where(d, mantissa * 10 + digits[:, j], mantissa)
+        decimals += d & after_point
+        after_point |= chars[:, j] == 46
+    negative = (chars == 45).any(axis=1)
+    return mantissa, decimals, negative, is_digit.any(axis=1)
+
+
+def _field_places():
+    """Place values of the characters of one observation field."""
+    places = np.zeros(FIELD_WIDTH)
+    for j in range(VALUE_WIDTH):
+        if j != VALUE_POINT:
+            places[j] = 10.0 ** (VALUE_WIDTH - 1 - j - (j < VALUE_POINT))
+    return places
+
+
+_FIELD_PLACES = _field_places()
+
+
+def _decode_fields(chars, n_codes):
+    """Decode value, LLI and SSI of every field of a PRN line matrix at once.
+
+    With the decimal point in its standard column, the F14.3 mantissas of all
+    fields are one contraction of the digits with fixed place values (exact
+    below 2**53). Fields without the point there are either blank or written
+    unusually and go through the digit-by-digit decoder.
+    """
+    fields = chars[:, PRN_WIDTH:].reshape(len(chars), n_codes, FIELD_WIDTH)
+    digits = fields - 48
+    digits *= digits < 10  # uint8 wraps for characters below '0'
+    value = np.einsum('ijk,k->ij', digits, _FIELD_PLACES)
+    value /= 10.0 ** VALUE_DECIMALS
+
+    present = fields[:, :, VALUE_POINT] == 46
+    rows, columns = np.nonzero(~present)
+    if rows.size:
+        mantissa, decimals, _, has_digits = _accumulate_digits(fields[rows, columns, :VALUE_WIDTH])
+        value[rows, columns] = mantissa / 10.0 ** decimals
+        present[rows, columns] = has_digits
+
+    minus_rows, minus_columns = np.divmod(np.flatnonzero(chars.ravel() == 45), chars.shape[1])
+    value[minus_rows, (minus_columns - PRN_WIDTH) // FIELD_WIDTH] *= -1
+
+    lli = _decode_flag(fields[:, :, VALUE_WIDTH])
+    ssi = _decode_flag(fields[:, :, VALUE_WIDTH + 1])
+    return value, present, lli, ssi
+
+
+def _decode_flag(chars):
+    digits = chars - 48
+    return np.where(digits < 10, digits, 0).astype(np.int8)
+
+
+def _epoch_field_places():
+    """Place values of the integer fields of an epoch line (one column each)."""
+    fields = [(2, 6), (7, 9), (10, 12), (13, 15), (16, 18), (18, 29), (31, 32), (32, 35)]
+    places = np.zeros((EPOCH_LINE_WIDTH, len(fields)))
+    for k, (start, end) in enumerate(fields):
+        digit_columns = [c for c in range(start, end) if c != EPOCH_SECOND_POINT]
+        places[digit_columns, k] = 10.0 ** np.arange(len(digit_columns) - 1, -1, -1)
+    return places
+
+
+_EPOCH_PLACES = _epoch_field_places()
+
+
+def _decode_epochs(chars):
+    """Decode epoch lines to (epoch ns, epoch flag, number of satellites)."""
+    digits = chars - 48
+    digits *= digits < 10
+    fields = (digits.astype(np.float64) @ _EPOCH_PLACES).astype(np.int64)
+    year, month, day, hour, minute, seconds, flag, count = fields.T
+    # F11.7 seconds are read in units of 100 ns when the point is in place.
+    seconds_ns = seconds * (NS_PER_SECOND // 10 ** EPOCH_SECOND_DECIMALS)
+    irregular = np.flatnonzero(chars[:, EPOCH_SECOND_POINT] != 46)
+    if irregular.size:
+        mantissa, decimals, _, _ = _accumulate_digits(chars[irregular, 18:29])
+        seconds_ns[irregular] = mantissa * 10 ** (9 - np.minimum(decimals, 9))
+    months = (year - 1970).astype('datetime64[Y]') + (month - 1).astype('timedelta64[M]')
+    days = (months.astype('datetime64[D]') + (day - 1).astype('timedelta64[D]')).astype(np.int64)
+    epoch_ns = ((days * 24 + hour) * 60 + minute) * 60 * NS_PER_SECOND + seconds_ns
+    return epoch_ns, flag, count
@@ -0,0 +1,101 @@
+"""Carrier phase series of one satellite, in the layout of the app's CSV files.
+
+    single: Time, Carrier_Phase (km), LLI
+    double: Time, Carrier_Phase_1, Carrier_Phase_2 (km), LLI_1, LLI_2, plus
+            GF, IF, WL, NL (m) and MW, MW_CYCLES for two carrier phases
+            of different frequencies
+
+Both layouts are on the store's INTERVAL grid, so a data gap is a run of
+empty (NaN) rows rather than a longer step between two rows.
+
+Shared by the /csv page and the plot_series.py command line tool. Reading
+the series is timed as the "filter" stage, placing it on the grid as
+"merge" and building the frame as "convert" (see metrics.py).
+"""
+from .align import align, store_interval, store_origin
+from .archive import ObservationArchive, is_archive
+from .batch import is_carrier_phase
+from .combinations import carrier_distance, dual_frequency, frequency
+from .metrics import timed
+from .store import ObservationStore, is_store
+
+
+def open_observations(path):
+    """The processed archive or store at `path`, None if it is neither.
+
+    Columns are memory-mapped, nothing is read yet.
+    """
+    if not path:
+        return None
+    if is_archive(path):
+        return ObservationArchive(path)
+    if is_store(path):
+        return ObservationStore(path)
+    return None
+
+
+def single_frame(store, prn, code):
+    """DataFrame of one carrier phase series, None when it is missing or not a carrier phase."""
+    import pandas as pd
+
+    prn, code = prn.upper(), code.upper()
+    freq = frequency(code)
+    epochs, values, lli = _read_series(store, prn, code)
+    if not len(epochs) or freq is None:
+        return None
+
+    # On the INTERVAL grid like double_frame; missing epochs stay NaN
+    with timed("merge") as stage:
+        grid, (phase,) = align([(epochs, values)], store_interval(store), store_origin(store))
+        lli = grid.place(epochs, lli, fill=0)
+        stage.add(epochs=len(grid.epochs), observations=len(epochs))
+    with timed("convert") as stage:
+        frame = pd.DataFrame({'Time': grid.epochs.view('datetime64[ns]'),
+                              'Carrier_Phase': carrier_distance(phase, freq),
+                              'LLI': lli})
+        stage.add(epochs=len(frame), observations=len(frame))
+    return frame
+
+
+def double_frame(store, prn, code1, code2):
+    """DataFrame of two carrier phases of one satellite on a common epoch grid, None when either is missing."""
+    import pandas as pd
+
+    prn, code1, code2 = prn.upper(), code1.upper(), code2.upper()
+    epochs1, values1, lli1 = _read_series(store, prn, code1)
+    epochs2, values2, lli2 = _read_series(store, prn, code2)
+    freq1, freq2 = frequency(code1), frequency(code2)
+    if not len(epochs1) or not len(epochs2) or freq1 is None or freq2 is None:
+        return None
+
+    # Both series on the INTERVAL grid; epochs missing from either stay NaN
+    with timed("merge") as stage:
+        grid, (phase1, phase2) = align([(epochs1, values1), (epochs2, values2)], store_interval(store),
+                                       store_origin(store))
+        lli1, lli2 = grid.place(epochs1, lli1, fill=0), grid.place(epochs2, lli2, fill=0)
+        stage.add(epochs=len(grid.epochs), observations=len(epochs1) + len(epochs2))
+    with timed("convert") as stage:
+        frame = pd.DataFrame({'Time': grid.epochs.view('datetime64[ns]'),
+                              'Carrier_Phase_1': carrier_distance(phase1, freq1),
+                              'Carrier_Phase_2': carrier_distance(phase2, freq2),
+                              'LLI_1': lli1,
+                              'LLI_2': lli2})
+        if freq1 != freq2 and is_carrier_phase(code1) and is_carrier_phase(code2):
+            # Geometry-free, ionosphere-free, wide- and narrow-lane in metres, plus
+            # Melbourne-Wubbena when the matching pseudoranges (L5C -> C5C) exist
+            code_types = ['C' + code[1:] for code in (code1, code2)]
+            keys = set(store.keys())
+            pseudo1 = pseudo2 = None
+            if all((prn, code) in keys for code in code_types):
+                pseudo1, pseudo2 = (grid.place(*store.series(prn, code)) for code in code_types)
+            for name, values in dual_frequency(phase1, phase2, freq1, freq2, pseudo1, pseudo2).items():
+                frame[name] = values
+        stage.add(epochs=len(frame), observations=2 * len(frame))
+    return frame
+
+
+def _read_series(store, prn, code):
+    with timed("filter") as stage:
+        arrays = store.series(prn, code, ("epoch", "value", "lli"))
+        stage.add(bytes=sum(array.nbytes for array in arrays), observations=len(arrays[0]))
+    return arrays
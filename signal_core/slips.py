@@ -0,0 +1,247 @@
+"""Cycle-slip detection on epoch-aligned phase data.
+
+Every test works on arrays whose last axis is the epoch grid (one series,
+or a PRN x epoch matrix as built by store_combinations), so a day of every
+PRN is scanned with a handful of NumPy operations. Missing samples are NaN
+and are never tested.
+
+Tests, each reported as one bit of the returned flags:
+
+    LLI    loss-of-lock indicator bit 0 set by the receiver
+    GAP    first sample after more than `max_gap` missing epochs
+    PHASE  time-differenced phase departs from a polynomial fit
+    GF     geometry-free combination jumps (dual frequency)
+    MW     Melbourne-Wubbena wide-lane combination jumps (dual frequency)
+
+Polynomial tests fit the `window` samples before an epoch and, separately,
+the `window` samples after it; a slip is flagged only where both fits
+agree that the epoch is off. A lone outlier, or a fit polluted by a slip
+just behind it, therefore does not raise a flag. Thresholds adapt to the
+noise of each series: `k` robust standard deviations (1.4826 x the median
+absolute deviation over `mad_window` epochs), never below a floor.
+"""
+import warnings
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .align import store_grid
+from .combinations import NAVIC_CODES, NAVIC_PHASES, dual_frequency, frequency, phase_range, wavelength
+
+SLIP_LLI = 1
+SLIP_GAP = 2
+SLIP_PHASE = 4
+SLIP_GF = 8
+SLIP_MW = 16
+SLIP_NAMES = {SLIP_LLI: "LLI", SLIP_GAP: "GAP", SLIP_PHASE: "PHASE", SLIP_GF: "GF", SLIP_MW: "MW"}
+
+K_SIGMA = 5.0  # robust standard deviations for a slip
+MAD_WINDOW = 61  # epochs in the rolling MAD
+MAX_GAP = 10  # missing epochs tolerated inside an arc
+PHASE_WINDOW, PHASE_DEGREE, PHASE_FLOOR = 8, 2, 0.1  # floor in m, when the wavelength is unknown
+PHASE_FLOOR_CYCLES = 0.5  # floor in cycles, when it is known
+GF_WINDOW, GF_DEGREE, GF_FLOOR = 8, 2, 0.05  # floor in m
+MW_WINDOW, MW_DEGREE, MW_FLOOR = 16, 0, 1.0  # floor in wide-lane cycles
+MAD_SCALE = 1.4826  # MAD of normal noise -> standard deviation
+
+
+def prediction_weights(window, degree):
+    """Weights predicting the next sample from `window` evenly spaced ones.
+
+    The prediction is the value at the next epoch of the least-squares
+    polynomial of `degree` through the window, a fixed linear combination.
+    """
+    t = np.arange(-window, 0, dtype=np.float64)
+    vandermonde = t[:, None] ** np.arange(degree + 1)
+    return np.linalg.pinv(vandermonde)[0]
+
+
+def polynomial_residuals(x, window, degree):
+    """Residual of each sample from the polynomial fit of the `window` before it.
+
+    Along the last axis; NaN where the sample or any of its window is NaN.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    residuals = np.full(x.shape, np.nan)
+    if x.shape[-1] > window:
+        windows = sliding_window_view(x, window + 1, axis=-1)
+        residuals[..., window:] = windows[..., -1] - windows[..., :-1] @ prediction_weights(window, degree)
+    return residuals
+
+
+def mad_step(window=MAD_WINDOW):
+    """Epochs between the windows robust_sigma takes medians on."""
+    return max(window // 4, 1)
+
+
+def robust_sigma(x, window=MAD_WINDOW):
+    """Rolling 1.4826 x median absolute deviation along the last axis, NaN-aware.
+
+    Medians are taken on windows centred every mad_step(window) epochs,
+    from the first one, and held in between, which keeps the cost linear
+    in the length of the series.
+    """
+    x = np.asarray(x, dtype=np.float64)
+    n = x.shape[-1]
+    step = mad_step(window)
+    half = window // 2
+    padded = np.pad(x, [(0, 0)] * (x.ndim - 1) + [(half, half + step)], constant_values=np.nan)
+    windows = sliding_window_view(padded, window, axis=-1)[..., ::step, :]
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", RuntimeWarning)  # windows with no sample
+        median = np.nanmedian(windows, axis=-1)
+        sigma = MAD_SCALE * np.nanmedian(np.abs(windows - median[..., None]), axis=-1)
+    return np.repeat(sigma, step, axis=-1)[..., :n]
+
+
+def outliers(residuals, k=K_SIGMA, floor=0.0, window=MAD_WINDOW):
+    """Samples whose |residual| exceeds max(k robust sigmas, floor)."""
+    threshold = np.fmax(k * robust_sigma(residuals, window), floor)
+    with np.errstate(invalid="ignore"):
+        return np.abs(residuals) > threshold
+
+
+def step_test(x, window, degree, k=K_SIGMA, floor=0.0):
+    """Epochs where the level of `x` jumps, from the samples before and after.
+
+    x[t] must be off the fit of the samples before it, and x[t - 1] off the
+    fit of the samples after it, by the same jump in opposite directions.
+    """
+    forward = polynomial_residuals(x, window, degree)
+    backward = polynomial_residuals(x[..., ::-1], window, degree)[..., ::-1]
+    jump = outliers(forward, k, floor)
+    jump[..., 1:] &= outliers(backward, k, floor)[..., :-1] & (forward[..., 1:] * backward[..., :-1] < 0)
+    jump[..., 0] = False
+    return jump
+
+
+def spike_test(x, window, degree, k=K_SIGMA, floor=0.0):
+    """Epochs where `x` has a one-sample spike, seen from both sides."""
+    forward = polynomial_residuals(x, window, degree)
+    backward = polynomial_residuals(x[..., ::-1], window, degree)[..., ::-1]
+    return outliers(forward, k, floor) & outliers(backward, k, floor) & (forward * backward > 0)
+
+
+def phase_slips(phase, k=K_SIGMA, floor=PHASE_FLOOR, window=PHASE_WINDOW, degree=PHASE_DEGREE):
+    """Slips in one phase series (any unit) from its time differences.
+
+    A slip between epochs t - 1 and t is a spike at t - 1 in the
+    differences; satellite motion is removed by the polynomial fit.
+    """
+    phase = np.asarray(phase, dtype=np.float64)
+    slips = np.zeros(phase.shape, dtype=bool)
+    slips[..., 1:] = spike_test(np.diff(phase, axis=-1), window, degree, k, floor)
+    return slips
+
+
+def gap_starts(values, max_gap=MAX_GAP):
+    """First sample after more than `max_gap` missing epochs (not the first arc)."""
+    present = ~np.isnan(values)
+    # Index of the last sample present at or before each epoch, -1 before any.
+    positions = np.where(present, np.arange(values.shape[-1]), -1)
+    last = np.maximum.accumulate(positions, axis=-1)
+    gap = np.zeros(values.shape, dtype=bool)
+    gap[..., 1:] = present[..., 1:] & (last[..., :-1] >= 0) & (np.arange(1, values.shape[-1]) - last[..., :-1] > max_gap + 1)
+    return gap
+
+
+def lli_slips(lli):
+    """Epochs whose loss-of-lock indicator has bit 0 set."""
+    return (np.asarray(lli).astype(np.int64) & 1).astype(bool)
+
+
+def detect_slips(phase, lli=None, carrier_wavelength=None, k=K_SIGMA, max_gap=MAX_GAP):
+    """Slip flags (SLIP_* bits, uint8) of single-frequency phase data.
+
+    `phase` is a phase range in metres (see phase_range); `lli` is aligned
+    with it, 0 where unknown. Jumps under half a cycle of
+    `carrier_wavelength` (m) are never slips, or under PHASE_FLOOR without it.
+    """
+    phase = np.asarray(phase, dtype=np.float64)
+    floor = PHASE_FLOOR_CYCLES * carrier_wavelength if carrier_wavelength else PHASE_FLOOR
+    flags = np.zeros(phase.shape, dtype=np.uint8)
+    flags[phase_slips(phase, k, floor)] |= SLIP_PHASE
+    flags[gap_starts(phase, max_gap)] |= SLIP_GAP
+    if lli is not None:
+        flags[lli_slips(lli) & ~np.isnan(phase)] |= SLIP_LLI
+    return flags
+
+
+def detect_dual_slips(phase1, phase2, freq1, freq2, code1=None, code2=None, lli1=None, lli2=None,
+                      k=K_SIGMA, max_gap=MAX_GAP):
+    """Slip flags (SLIP_* bits, uint8) of a dual-frequency pair.
+
+    Phases are in cycles, codes in metres, all aligned on one grid. Uses
+    the geometry-free test, plus the Melbourne-Wubbena test when both
+    codes are given; LLI and gaps of either frequency count for both.
+    """
+    phase1 = np.asarray(phase1, dtype=np.float64)
+    phase2 = np.asarray(phase2, dtype=np.float64)
+    combos = dual_frequency(phase1, phase2, freq1, freq2, code1, code2)
+    flags = combination_slips(combos["GF"], combos.get("MW_CYCLES"), k)
+    for phase, lli in ((phase1, lli1), (phase2, lli2)):
+        flags[gap_starts(phase, max_gap)] |= SLIP_GAP
+        if lli is not None:
+            flags[lli_slips(lli) & ~np.isnan(phase)] |= SLIP_LLI
+    return flags
+
+
+def combination_slips(gf, mw_cycles=None, k=K_SIGMA):
+    """SLIP_GF / SLIP_MW flags from the GF (m) and MW (wide-lane cycles) combinations."""
+    gf = np.asarray(gf, dtype=np.float64)
+    flags = np.zeros(gf.shape, dtype=np.uint8)
+    flags[step_test(gf, GF_WINDOW, GF_DEGREE, k, GF_FLOOR)] |= SLIP_GF
+    if mw_cycles is not None:
+        flags[step_test(np.asarray(mw_cycles, dtype=np.float64), MW_WINDOW, MW_DEGREE, k, MW_FLOOR)] |= SLIP_MW
+    return flags
+
+
+def single_slips(phase, freq, lli=None, **options):
+    """detect_slips on phase given in cycles at `freq` Hz."""
+    return detect_slips(phase_range(phase, freq), lli, wavelength(freq), **options)
+
+
+def distance_slips(distance_km, lli=None, **options):
+    """detect_slips on the km carrier distance of the app's CSV files.
+
+    0.000 is what receivers write for a phase they do not have, so those
+    rows are missing samples, as in qc.py and analysis.py.
+    """
+    distance = np.asarray(distance_km, dtype=np.float64)
+    return detect_slips(np.where(distance == 0, np.nan, distance) * 1000, lli, **options)
+
+
+def slip_names(flags):
+    """Readable reasons of one flags value, e.g. 'GF+MW'."""
+    return "+".join(name for bit, name in SLIP_NAMES.items() if flags & bit)
+
+
+def store_slips(store, phases=NAVIC_PHASES, codes=NAVIC_CODES, prns=None, **options):
+    """Slip flags of every PRN of a store in one pass.
+
+    Like store_combinations: every series goes on the store's epoch grid,
+    giving PRN x epoch matrices tested together. Returns a dict with PRN
+    (row labels), EPOCH (grid epochs in ns) and SLIPS (uint8 flags).
+    """
+    freq1, freq2 = frequency(phases[0]), frequency(phases[1])
+    if freq1 is None or freq2 is None:
+        raise ValueError(f"unknown frequency for {phases}")
+    available = set(store.keys())
+    if prns is None:
+        prns = sorted({prn for prn, _ in available})
+    prns = [prn for prn in prns if all((prn, code) in available for code in phases)]
+    wanted = list(phases) + list(codes or ())
+    series = {(prn, code): store.series(prn, code, ("epoch", "value", "lli"))
+              for prn in prns for code in wanted if (prn, code) in available}
+    grid = store_grid(store, [epochs for epochs, _, _ in series.values()])
+    values = {code: np.full((len(prns), grid.size), np.nan) for code in wanted}
+    lli = {code: np.zeros((len(prns), grid.size), dtype=np.int8) for code in phases}
+    for (prn, code), (epochs, samples, flags) in series.items():
+        row = prns.index(prn)
+        values[code][row] = grid.place(epochs, np.where(samples == 0, np.nan, samples))  # 0.000: not tracked
+        if code in lli:
+            lli[code][row] = grid.place(epochs, flags, fill=0)
+    code1, code2 = (values[codes[0]], values[codes[1]]) if codes else (None, None)
+    slips = detect_dual_slips(values[phases[0]], values[phases[1]], freq1, freq2, code1, code2,
+                              lli[phases[0]], lli[phases[1]], **options)
+    return {"PRN": prns, "EPOCH": grid.epochs, "SLIPS": slips}
@@ -0,0 +1,381 @@
+"""Binary columnar store for processed observations.
+
+A store is a directory holding one raw little-endian file per column plus a
+small index and a ``meta.json`` that describes the schema:
+
+    meta.json      schema, dictionaries, RINEX header, epoch range and interval
+    index.json     PRN -> obs code -> [[offset, length, first ns, last ns], ...]
+    epochs.bin     table of distinct epochs (int64 ns)
+    epoch.bin      per-row index into epochs.bin
+    value.bin      float64 observation value
+    lli.bin        int8 loss-of-lock indicator
+    ssi.bin        int8 signal strength indicator
+    qc.npy         per-(PRN, code, bucket) quality summary, see qc.py
+
+Rows are partitioned by (PRN, obs code): every appended chunk of
+observations is written as one contiguous, epoch-ordered segment per key, so
+a whole file written at once has exactly one segment per key. The PRN and
+obs code of a row are implied by its segment and are not stored per row.
+
+Columns are memory-mapped, so extracting one series only touches that
+series' pages and works the same on archives larger than RAM.
+"""
+import json
+import os
+import secrets
+import shutil
+
+import numpy as np
+
+from .align import header_interval, infer_interval
+from .qc import QC_DTYPE, QC_FILE, QcBuilder, between
+from .rinex import (COLUMN_DTYPES, COLUMN_NAMES, EPOCHS_PER_CHUNK, NS_PER_SECOND, ObservationColumns,
+                    RinexHeader, iter_rinex_chunks)
+
+STORE_FORMAT = "signal_core.store"
+STORE_VERSION = 2
+META_FILE = "meta.json"
+INDEX_FILE = "index.json"
+EPOCHS_FILE = "epochs.bin"
+
+ROW_COLUMNS = {"epoch": None, "value": "<f8", "lli": "|i1", "ssi": "|i1"}
+
+# Column names used by the DataFrames handed to the Flask routes.
+FRAME_COLUMNS = {"EPOCH": "epoch", "OBS_TYPE": "obs", "PRN": "prn", "VALUE": "value",
+                 "LLI": "lli", "SSI": "ssi"}
+
+
+def index_dtype(size):
+    """Narrowest unsigned dtype able to index a dictionary of `size` entries."""
+    for dtype in ("|u1", "<u2", "<u4"):
+        if size <= np.iinfo(np.dtype(dtype)).max + 1:
+            return dtype
+    return "<i8"
+
+
+def _unique_epochs(epoch):
+    """np.unique(epoch, return_inverse=True), in O(n) when `epoch` is ordered.
+
+    Parsed chunks are in file order and RINEX epochs increase, so the
+    distinct epochs are the starts of runs and no sort is needed.
+    """
+    step = np.diff(epoch)
+    if (step < 0).any():
+        return np.unique(epoch, return_inverse=True)
+    new = np.concatenate(([True], step != 0))
+    return epoch[new], np.cumsum(new) - 1
+
+
+class StoreWriter:
+    """Appends chunks of observations to a new store as per-key segments.
+
+    The store is assembled in a staging directory and moved into place by
+    close(), so readers never see a partially written store. Each chunk is
+    also summarized into the store's QC table as it is written.
+    """
+
+    def __init__(self, path, header=None, epoch_dtype="<u4"):
+        self.path = path
+        self.header = header
+        self.rows = 0
+        self.index = {}
+        self.prns, self.obs_codes = [], []
+        self.first_epoch = self.last_epoch = None
+        self._epoch_parts, self._epoch_count, self._last_epoch = [], 0, None
+        self._dtypes = dict(ROW_COLUMNS, epoch=np.dtype(epoch_dtype).str)
+        self.qc = QcBuilder()
+        self._staging = path + ".tmp"
+        shutil.rmtree(self._staging, ignore_errors=True)
+        os.makedirs(self._staging)
+        self._files = {name: open(os.path.join(self._staging, name + ".bin"), "wb") for name in ROW_COLUMNS}
+
+    def append(self, columns):
+        """Write one chunk, adding one epoch-ordered segment per (PRN, code)."""
+        if not len(columns):
+            return
+        if self.header is None:
+            self.header = columns.header
+        for name in columns.prns:
+            if name not in self.prns:
+                self.prns.append(name)
+        for code in columns.obs_codes:
+            if code not in self.obs_codes:
+                self.obs_codes.append(code)
+
+        # A stable sort on the key keeps each partition in epoch order.
+        key = columns.prn.astype(np.int64) * len(columns.obs_codes) + columns.obs
+        order = np.argsort(key, kind="stable")
+        self.qc.append(columns, order)
+        key = key[order]
+        epoch = columns.epoch[order]
+        arrays = {
+            "epoch": self._epoch_indices(columns.epoch)[order].astype(self._dtypes["epoch"]),
+            "value": columns.value[order],
+            "lli": columns.lli[order],
+            "ssi": columns.ssi[order],
+        }
+        for name, array in arrays.items():
+            array.astype(self._dtypes[name], copy=False).tofile(self._files[name])
+
+        bounds = np.concatenate(([0], np.flatnonzero(np.diff(key)) + 1, [len(key)]))
+        for start, stop in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+            prn, obs = divmod(int(key[start]), len(columns.obs_codes))
+            segment = [self.rows + start, stop - start, int(epoch[start]), int(epoch[stop - 1])]
+            self.index.setdefault(columns.prns[prn], {}).setdefault(columns.obs_codes[obs], []).append(segment)
+        self.rows += len(key)
+
+    def _epoch_indices(self, epoch):
+        """Map epochs to positions in the epoch table, extending it as needed."""
+        unique, inverse = _unique_epochs(epoch)
+        ids = self._epoch_count + np.arange(len(unique))
+        fresh = unique
+        if self._epoch_count and unique[0] <= self._last_epoch:
+            # Overlaps epochs already in the table: reuse their positions.
+            table = np.concatenate(self._epoch_parts)
+            order = np.argsort(table, kind="stable")
+            position = np.minimum(np.searchsorted(table[order], unique), len(table) - 1)
+            known = table[order][position] == unique
+            fresh = unique[~known]
+            ids[known] = order[position[known]]
+            ids[~known] = self._epoch_count + np.arange(len(fresh))
+        if fresh.size:
+            self._epoch_parts.append(fresh)
+            self._epoch_count += len(fresh)
+            self._last_epoch = max(int(fresh[-1]), self._last_epoch or int(fresh[-1]))
+        return ids[inverse.ravel()]
+
+    def close(self):
+        for fh in self._files.values():
+            fh.close()
+        epochs = np.concatenate(self._epoch_parts) if self._epoch_parts else np.empty(0, np.int64)
+        epochs.astype("<i8").tofile(os.path.join(self._staging, EPOCHS_FILE))
+        if epochs.size:
+            self.first_epoch, self.last_epoch = int(epochs.min()), int(epochs.max())
+        # Grid step of the data, worked out once here for every later alignment
+        interval = header_interval(self.header) or infer_interval([np.sort(epochs)])
+        np.save(os.path.join(self._staging, QC_FILE), self.qc.table())
+        meta = {
+            "format": STORE_FORMAT,
+            "version": STORE_VERSION,
+            "rows": self.rows,
+            "columns": self._dtypes,
+            "prns": self.prns,
+            "obs_codes": self.obs_codes,
+            "epoch_count": int(len(epochs)),
+            "first_epoch": self.first_epoch,
+            "last_epoch": self.last_epoch,
+            "interval": interval,
+            "qc_bucket": self.qc.bucket,
+            "header": self.header.to_dict() if self.header is not None else None,
+        }
+        with open(os.path.join(self._staging, INDEX_FILE), "w") as fh:
+            json.dump(self.index, fh)
+        with open(os.path.join(self._staging, META_FILE), "w") as fh:
+            json.dump(meta, fh)
+        # A store already at `path` is moved aside, not deleted, until the
+        # new one is in place, so a failure leaves one or the other whole.
+        previous = None
+        if os.path.exists(self.path):
+            previous = f"{self.path}.{secrets.token_hex(8)}.old"
+            os.rename(self.path, previous)
+        try:
+            os.replace(self._staging, self.path)
+        except OSError:
+            if previous is not None:
+                os.rename(previous, self.path)
+            raise
+        if previous is not None:
+            shutil.rmtree(previous, ignore_errors=True)
+        return self.path
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            for fh in self._files.values():
+                fh.close()
+            shutil.rmtree(self._staging, ignore_errors=True)
+
+
+def write_store(columns, path):
+    """Write ObservationColumns to a store directory at `path`."""
+    epoch_dtype = index_dtype(len(np.unique(columns.epoch)))
+    with StoreWriter(path, header=columns.header, epoch_dtype=epoch_dtype) as writer:
+        writer.append(columns)
+    return path
+
+
+def write_rinex_store(rinex_path, store_path, epochs_per_chunk=EPOCHS_PER_CHUNK, progress=None):
+    """Stream a RINEX file into a new store one epoch chunk at a time.
+
+    Chunks go straight from the parser to the writer, so peak memory stays
+    flat however large the input is. Returns the closed StoreWriter.
+    `progress` is passed on to iter_rinex_chunks.
+    """
+    with StoreWriter(store_path) as writer:
+        for columns in iter_rinex_chunks(rinex_path, epochs_per_chunk, progress):
+            writer.append(columns)
+    return writer
+
+
+def is_store(path):
+    return os.path.isfile(os.path.join(path, META_FILE))
+
+
+class ObservationStore:
+    """Read access to a store directory; columns are memory-mapped lazily."""
+
+    def __init__(self, path):
+        self.path = path
+        with open(os.path.join(path, META_FILE)) as fh:
+            self.meta = json.load(fh)
+        if self.meta.get("format") != STORE_FORMAT or self.meta.get("version") != STORE_VERSION:
+            raise ValueError(f"{path} is not a version {STORE_VERSION} observation store")
+        with open(os.path.join(path, INDEX_FILE)) as fh:
+            self.index = json.load(fh)
+        self.prns = self.meta["prns"]
+        self.obs_codes = self.meta["obs_codes"]
+        header = self.meta.get("header")
+        self.header = RinexHeader.from_dict(header) if header else None
+        self._maps = {}
+
+    def __len__(self):
+        return self.meta["rows"]
+
+    @property
+    def interval(self):
+        """Epoch grid step in ns: the header INTERVAL, else the smallest step in the data."""
+        return self.meta.get("interval") or header_interval(self.header)
+
+    @property
+    def first_epoch(self):
+        return self.meta.get("first_epoch")
+
+    @property
+    def last_epoch(self):
+        return self.meta.get("last_epoch")
+
+    @property
+    def qc_bucket(self):
+        """Seconds summarized by one QC row, None for a store written without QC."""
+        return self.meta.get("qc_bucket")
+
+    def qc(self, start=None, end=None):
+        """QC rows (QC_DTYPE) of the buckets overlapping [start, end] ns."""
+        path = os.path.join(self.path, QC_FILE)
+        if not os.path.isfile(path):
+            return np.zeros(0, QC_DTYPE)
+        return between(np.load(path), start, end, int(self.qc_bucket * NS_PER_SECOND))
+
+    @property
+    def epochs(self):
+        """Table of the distinct epochs in the store (int64 ns)."""
+        return self._map(EPOCHS_FILE, "<i8", self.meta["epoch_count"])
+
+    def column(self, name):
+        """Raw row column as a read-only memory map (epoch is an index)."""
+        return self._map(name + ".bin", self.meta["columns"][name], len(self))
+
+    def _map(self, filename, dtype, count):
+        array = self._maps.get(filename)
+        if array is None:
+            if count == 0:
+                array = np.empty(0, dtype)
+            else:
+                array = np.memmap(os.path.join(self.path, filename), dtype=dtype, mode="r", shape=(count,))
+            self._maps[filename] = array
+        return array
+
+    def keys(self):
+        """All (PRN, obs code) pairs in the store."""
+        return [(prn, code) for prn, codes in self.index.items() for code in codes]
+
+    def segments(self, prn, obs_code):
+        """[offset, length, first ns, last ns] of each segment of a key."""
+        return self.index.get(prn.upper(), {}).get(obs_code.upper(), [])
+
+    def _segment_rows(self, segment, start, end):
+        offset, length, first, last = segment
+        if (start is not None and last < start) or (end is not None and first > end):
+            return None
+        if (start is None or first >= start) and (end is None or last <= end):
+            return slice(offset, offset + length)
+        epochs = self.epochs[self.column("epoch")[offset:offset + length]]
+        lo = 0 if start is None else int(np.searchsorted(epochs, start, side="left"))
+        hi = length if end is None else int(np.searchsorted(epochs, end, side="right"))
+        return slice(offset + lo, offset + hi)
+
+    def series(self, prn, obs_code, columns=("epoch", "value"), start=None, end=None):
+        """One (PRN, obs code) series as a tuple of arrays, in epoch order.
+
+        Cost is proportional to the series length. For a key with a single
+        segment the value/LLI/SSI arrays are read-only views of the memory map.
+        """
+        parts = [rows for rows in (self._segment_rows(s, start, end) for s in self.segments(prn, obs_code))
+                 if rows is not None]
+        if not parts:
+            return self.empty_series(columns)
+        result = []
+        for name in columns:
+            pieces = [self.column(name)[rows] for rows in parts]
+            if name == "epoch":
+                pieces = [self.epochs[piece] for piece in pieces]
+            result.append(pieces[0] if len(pieces) == 1 else np.concatenate(pieces))
+        return tuple(result)
+
+    @staticmethod
+    def empty_series(columns):
+        dtypes = dict(COLUMN_DTYPES)
+        return tuple(np.empty(0, dtypes[name]) for name in columns)
+
+    def read(self, columns=COLUMN_NAMES, start=None, end=None, prns=None, obs_codes=None):
+        """Decode the requested columns of the matching series into arrays.
+
+        Rows come out grouped by (PRN, obs code) and epoch ordered within each
+        group. Only the segments of the selected keys are read.
+        """
+        prns = None if prns is None else {p.upper() for p in prns}
+        obs_codes = None if obs_codes is None else {c.upper() for c in obs_codes}
+        pieces = {name: [] for name in columns}
+        row_columns = [name for name in columns if name in ROW_COLUMNS] or ["value"]
+        for prn, code in self.keys():
+            if (prns is not None and prn not in prns) or (obs_codes is not None and code not in obs_codes):
+                continue
+            arrays = dict(zip(row_columns, self.series(prn, code, row_columns, start, end)))
+            length = len(arrays[row_columns[0]])
+            for name in columns:
+                if name == "prn":
+                    pieces[name].append(np.full(length, self.prns.index(prn), np.int16))
+                elif name == "obs":
+                    pieces[name].append(np.full(length, self.obs_codes.index(code), np.int16))
+                else:
+                    pieces[name].append(arrays[name])
+        dtypes = dict(COLUMN_DTYPES)
+        return {name: np.concatenate(parts) if parts else np.empty(0, dtypes[name])
+                for name, parts in pieces.items()}
+
+    def to_columns(self, start=None, end=None, prns=None, obs_codes=None):
+        arrays = self.read(COLUMN_NAMES, start, end, prns, obs_codes)
+        return ObservationColumns(prns=self.prns, obs_codes=self.obs_codes, header=self.header, **arrays)
+
+    def to_frame(self, columns=("EPOCH", "OBS_TYPE", "PRN", "VALUE"), start=None, end=None,
+                 prns=None, obs_codes=None):
+        """DataFrame with typed EPOCH/VALUE and categorical PRN/OBS_TYPE columns."""
+        import pandas as pd
+
+        arrays = self.read([FRAME_COLUMNS[c] for c in columns], start, end, prns, obs_codes)
+        frame = {}
+        for label in columns:
+            name = FRAME_COLUMNS[label]
+            array = arrays[name]
+            if name == "epoch":
+                array = array.view("datetime64[ns]")
+            elif name == "prn":
+                array = pd.Categorical.from_codes(array, self.prns)
+            elif name == "obs":
+                array = pd.Categorical.from_codes(array, self.obs_codes)
+            frame[label] = array
+        return pd.DataFrame(frame)
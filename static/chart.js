@@ -0,0 +1,149 @@
+// Interactive chart of an extracted series, drawn from min/max pyramid tiles
+// (see signal_core/pyramid.py). Zoom with the wheel, pan by dragging, reset
+// with a double click; only the tiles covering the view are fetched.
+
+const TRACE_COLORS = ["blue", "green"];
+const BUCKETS_PER_PIXEL = 1;
+
+class TileChart {
+    constructor(canvas, baseUrl) {
+        this.canvas = canvas;
+        this.baseUrl = baseUrl;  // /series/<job>/<series>
+        this.tiles = new Map();  // "level/index" -> tile, or null while it loads
+        this.meta = null;
+        this.view = null;  // [start, end] in ns
+        this.bindEvents();
+    }
+
+    async load() {
+        const response = await fetch(this.baseUrl + "/pyramid");
+        if (!response.ok) throw new Error(`pyramid: ${response.status}`);
+        this.meta = await response.json();
+        this.reset();
+    }
+
+    reset() {
+        this.view = [this.meta.start, Math.max(this.meta.end, this.meta.start + 1)];
+        this.draw();
+    }
+
+    width() {
+        return this.canvas.width;
+    }
+
+    // Finest level with at most BUCKETS_PER_PIXEL buckets per pixel over the view.
+    level() {
+        const span = this.view[1] - this.view[0];
+        const total = Math.max(this.meta.end - this.meta.start, 1);
+        for (let level = 0; level < this.meta.levels.length; level++) {
+            const bucketNs = total / this.meta.levels[level].buckets;
+            if (span / bucketNs <= BUCKETS_PER_PIXEL * this.width()) return level;
+        }
+        return this.meta.levels.length - 1;
+    }
+
+    visibleTiles(level) {
+        const indices = [];
+        this.meta.levels[level].tiles.forEach(([start, end], index) => {
+            if (end >= this.view[0] && start <= this.view[1]) indices.push(index);
+        });
+        return indices;
+    }
+
+    tile(level, index) {
+        const key = `${level}/${index}`;
+        if (!this.tiles.has(key)) {
+            this.tiles.set(key, null);
+            fetch(`${this.baseUrl}/tiles/${key}`)
+                .then(response => response.json())
+                .then(tile => { this.tiles.set(key, tile); this.draw(); })
+                .catch(error => { this.tiles.delete(key); console.error("Error:", error); });
+        }
+        return this.tiles.get(key);
+    }
+
+    draw() {
+        if (!this.meta) return;
+        const level = this.level();
+        const tiles = this.visibleTiles(level).map(index => this.tile(level, index)).filter(tile => tile);
+        const ctx = this.canvas.getContext("2d");
+        const {width, height} = this.canvas;
+        ctx.clearRect(0, 0, width, height);
+
+        // Value range of the buckets in view
+        let low = Infinity, high = -Infinity;
+        for (const tile of tiles) {
+            tile.start.forEach((start, i) => {
+                if (tile.end[i] < this.view[0] || start > this.view[1]) return;
+                for (const column of Object.values(tile.columns)) {
+                    if (column.min[i] !== null) low = Math.min(low, column.min[i]);
+                    if (column.max[i] !== null) high = Math.max(high, column.max[i]);
+                }
+            });
+        }
+        if (low > high) return;
+        if (low === high) { low -= 1; high += 1; }
+        const margin = 40;
+        const x = t => (t - this.view[0]) / (this.view[1] - this.view[0]) * width;
+        const y = v => height - margin - (v - low) / (high - low) * (height - 2 * margin);
+
+        this.meta.columns.forEach((name, c) => {
+            ctx.strokeStyle = TRACE_COLORS[c % TRACE_COLORS.length];
+            ctx.beginPath();
+            let drawing = false;
+            for (const tile of tiles) {
+                const column = tile.columns[name];
+                tile.start.forEach((start, i) => {
+                    if (column.min[i] === null) { drawing = false; return; }  // gap in the trace
+                    const px = x((start + tile.end[i]) / 2);
+                    if (drawing) ctx.lineTo(px, y(column.max[i])); else ctx.moveTo(px, y(column.max[i]));
+                    ctx.lineTo(px, y(column.min[i]));
+                    drawing = true;
+                });
+            }
+            ctx.stroke();
+
+            ctx.fillStyle = "red";
+            for (const tile of tiles) {
+                const column = tile.columns[name];
+                for (const i of column.slips) {
+                    ctx.beginPath();
+                    ctx.arc(x((tile.start[i] + tile.end[i]) / 2), y(column.max[i]), 4, 0, 2 * Math.PI);
+                    ctx.fill();
+                }
+            }
+        });
+
+        ctx.fillStyle = "black";
+        const label = t => new Date(t / 1e6).toISOString().replace("T", " ").slice(0, 19);
+        ctx.fillText(label(this.view[0]), 4, height - 8);
+        ctx.fillText(label(this.view[1]), width - 120, height - 8);
+        ctx.fillText(`${high.toFixed(3)} km`, 4, margin - 8);
+        ctx.fillText(`${low.toFixed(3)} km`, 4, height - margin + 14);
+    }
+
+    bindEvents() {
+        this.canvas.addEventListener("wheel", event => {
+            event.preventDefault();
+            const factor = event.deltaY < 0 ? 0.8 : 1.25;
+            const rect = this.canvas.getBoundingClientRect();
+            const at = this.view[0] + (event.clientX - rect.left) / rect.width * (this.view[1] - this.view[0]);
+            const span = Math.max((this.view[1] - this.view[0]) * factor, 1e9);
+            const left = (at - this.view[0]) / (this.view[1] - this.view[0]);
+            this.view = [at - left * span, at + (1 - left) * span];
+            this.draw();
+        });
+        let dragFrom = null;
+        this.canvas.addEventListener("mousedown", event => { dragFrom = event.clientX; });
+        window.addEventListener("mouseup", () => { dragFrom = null; });
+        window.addEventListener("mousemove", event => {
+            if (dragFrom === null) return;
+            const rect = this.canvas.getBoundingClientRect();
+            const shift = (dragFrom - event.clientX) / rect.width * (this.view[1] - this.view[0]);
+            this.view = [this.view[0] + shift, this.view[1] + shift];
+            dragFrom = event.clientX;
+            this.draw();
+        });
+        this.canvas.addEventListener("dblclick", () => this.reset());
+    }
+}
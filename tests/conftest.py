@@ -0,0 +1,139 @@
+"""Shared fixtures: the sample files, and a minimal compact RINEX encoder."""
+import os
+import random
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SAMPLES = [os.path.join(ROOT, "uploads", name) for name in ("NPLI0240.25O", "NPLI0250.25O")]
+DATA = os.path.join(ROOT, "tests", "data")
+CRINEX_ORDER = 3
+FIELD_WIDTH = 16
+
+EVENT_HEADER = """\
+     3.04           OBSERVATION DATA    M                   RINEX VERSION / TYPE
+G    4 C1C L1C D1C S1C                                      SYS / # / OBS TYPES
+E   14 C1C L1C D1C S1C C5Q L5Q D5Q S5Q C7Q L7Q D7Q S7Q C8Q  SYS / # / OBS TYPES
+       L8Q                                                  SYS / # / OBS TYPES
+     0.100                                                  INTERVAL
+                                                            END OF HEADER
+"""
+
+
+def rows(columns):
+    """(epoch ns, PRN, code, value, LLI, SSI) of every observation of ObservationColumns."""
+    return list(zip(columns.epoch.tolist(), [columns.prns[i] for i in columns.prn],
+                    [columns.obs_codes[i] for i in columns.obs], columns.value.tolist(),
+                    columns.lli.tolist(), columns.ssi.tolist()))
+
+
+def _text_diff(old, new):
+    width = max(len(old), len(new))
+    return "".join(" " if a == b else "&" if b == " " else b
+                   for a, b in zip(old.ljust(width), new.ljust(width))).rstrip()
+
+
+def encode_crinex(source, target, head_lines=None):
+    """Write RINEX 3 file `source` as CRINEX 3 to `target`, like RNX2CRX with arcs of order 3.
+
+    Only the first `head_lines` lines of `source` are read when given.
+    """
+    with open(source) as fh:
+        lines = fh.read().splitlines()[:head_lines]
+    out = ["3.0                 COMPACT RINEX FORMAT                    CRINEX VERS   / TYPE",
+           "RNX2CRX ver.4.0.7                       01-Jan-25 00:00     CRINEX PROG / DATE"]
+    types, system, n = {}, None, 0
+    while True:
+        line = lines[n]
+        out.append(line)
+        n += 1
+        if line[60:].strip() == "SYS / # / OBS TYPES":
+            system = line[0] if line[0] != " " else system
+            types.setdefault(system, []).extend(line[7:60].split())
+        if "END OF HEADER" in line:
+            break
+
+    previous_epoch, arcs, flags, previous_satellites = None, {}, {}, set()
+    while n < len(lines):
+        line = lines[n]
+        if not line.startswith(">"):
+            n += 1
+            continue
+        event, count = int(line[31]), int(line[32:35])
+        if event > 1:
+            out.append(line[:35])
+            out.extend(lines[n + 1:n + 1 + count])
+            previous_epoch = None
+            n += 1 + count
+            continue
+        records = lines[n + 1:n + 1 + count]
+        satellites = [record[:3] for record in records]
+        epoch = line[:35].ljust(41) + "".join(satellites)
+        out.append(epoch if previous_epoch is None else _text_diff(previous_epoch, epoch))
+        out.append("")  # no receiver clock offset
+        previous_epoch = epoch
+        for record in records:
+            prn = record[:3]
+            fields, flag_text = [], ""
+            for k, code in enumerate(types[prn[0]]):
+                field = record[3 + FIELD_WIDTH * k:3 + FIELD_WIDTH * (k + 1)].ljust(FIELD_WIDTH)
+                flag_text += field[14:16]
+                text = field[:14].strip()
+                if not text:
+                    arcs.pop((prn, code), None)
+                    fields.append("")
+                    continue
+                value = int(round(float(text) * 1000))
+                arc = arcs.get((prn, code))
+                if arc is None or prn not in previous_satellites:
+                    arcs[(prn, code)] = [value]
+                    fields.append(f"{CRINEX_ORDER}&{value}")
+                    continue
+                arc.append(value)
+                del arc[:-(CRINEX_ORDER + 1)]
+                differences = list(arc)
+                for _ in range(len(differences) - 1):
+                    differences = [b - a for a, b in zip(differences, differences[1:])]
+                fields.append(str(differences[-1]))
+            old = flags.get(prn, "") if prn in previous_satellites else ""
+            flags[prn] = flag_text
+            out.append(" ".join(fields) + " " + _text_diff(old, flag_text))
+        for key in [key for key in arcs if key[0] not in satellites]:
+            del arcs[key]
+        previous_satellites = set(satellites)
+        n += 1 + count
+    with open(target, "w") as fh:
+        fh.write("\n".join(out) + "\n")
+    return target
+
+
+def _field(value, lli=" ", ssi=" "):
+    return (f"{value:14.3f}" if value is not None else " " * 14) + lli + ssi
+
+
+@pytest.fixture
+def event_rinex(tmp_path):
+    """A 10 Hz GPS and Galileo file with random flags, blank fields and an event record at epoch 10."""
+    rng = random.Random(1)
+    lines = []
+    for epoch in range(50):
+        second = epoch * 0.1
+        lines.append(f"> 2025 01 24 23 59 {second:10.7f}  0  2")
+        lines.append("G01" + "".join(_field(rng.uniform(-1e8, 1e8), rng.choice(" 01"), rng.choice(" 5"))
+                                     for _ in range(4)))
+        lines.append(("E11" + "".join(_field(rng.uniform(-1e6, 1e6) if rng.random() > 0.2 else None)
+                                      for _ in range(14))).rstrip())
+        if epoch == 10:
+            lines.append(f"> 2025 01 24 23 59 {second:10.7f}  4  1")
+            lines.append(" " * 60 + "COMMENT")
+    path = tmp_path / "event.rnx"
+    path.write_text(EVENT_HEADER + "\r\n".join(lines) + "\r\n", newline="")
+    return str(path)
+
+
+@pytest.fixture
+def crinex():
+    return encode_crinex
@@ -0,0 +1,53 @@
+import bz2
+import gzip
+import os
+import shutil
+import zipfile
+
+import pytest
+
+from conftest import DATA, rows
+from signal_core.rinex import ObservationColumns, iter_rinex_chunks, parse_rinex
+
+CHUNK_SIZES = (1, 7, 500)
+
+
+def chunked(path, epochs_per_chunk):
+    return ObservationColumns.concatenate(list(iter_rinex_chunks(path, epochs_per_chunk=epochs_per_chunk)))
+
+
+def write_gzip(source, target):
+    with open(source, "rb") as fh, gzip.open(target, "wb") as out:
+        shutil.copyfileobj(fh, out)
+
+
+def write_bzip2(source, target):
+    with open(source, "rb") as fh, bz2.open(target, "wb") as out:
+        shutil.copyfileobj(fh, out)
+
+
+def write_zip(source, target):
+    with zipfile.ZipFile(target, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.write(source, os.path.basename(source))
+
+
+def copy_compress(source, target):
+    # the standard library cannot write .Z; tests/data holds the files in compress format
+    shutil.copyfile(source + ".Z", target)
+
+
+WRITERS = {".gz": write_gzip, ".bz2": write_bzip2, ".zip": write_zip, ".Z": copy_compress}
+
+
+@pytest.mark.parametrize("suffix", sorted(WRITERS))
+@pytest.mark.parametrize("name", ["NPLI0240_head.rnx", "NPLI0240_head.crx"])
+def test_compressed_file_parses_like_the_plain_one(name, suffix, tmp_path):
+    if suffix == ".Z" and shutil.which("gzip") is None:
+        pytest.skip("reading .Z needs the gzip program")
+    plain = os.path.join(DATA, name)
+    packed = str(tmp_path / (name + suffix))
+    WRITERS[suffix](plain, packed)
+    expected = rows(parse_rinex(plain))
+    assert rows(parse_rinex(packed)) == expected
+    for size in CHUNK_SIZES:
+        assert rows(chunked(packed, size)) == expected, size
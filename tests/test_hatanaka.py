@@ -0,0 +1,54 @@
+import os
+
+import numpy as np
+import pytest
+
+from conftest import DATA, SAMPLES, encode_crinex, rows
+from signal_core.rinex import ObservationColumns, iter_rinex_chunks, parse_rinex
+
+CHUNK_SIZES = (1, 2, 3, 7, 500)
+SAMPLE_LINES = 8000  # about 4 hours of the first sample file
+
+
+def chunked(path, epochs_per_chunk):
+    return ObservationColumns.concatenate(list(iter_rinex_chunks(path, epochs_per_chunk=epochs_per_chunk)))
+
+
+@pytest.fixture(scope="module")
+def sample_pair(tmp_path_factory):
+    """The head of a sample file, as RINEX and as CRINEX."""
+    folder = tmp_path_factory.mktemp("crx")
+    plain = folder / "NPLI0240.rnx"
+    with open(SAMPLES[0]) as fh:
+        lines = fh.readlines()
+    last_epoch = max(n for n, line in enumerate(lines[:SAMPLE_LINES]) if line.startswith(">"))
+    plain.write_text("".join(lines[:last_epoch]))
+    return str(plain), encode_crinex(str(plain), str(folder / "NPLI0240.crx"))
+
+
+@pytest.mark.parametrize("name", ["NPLI0240_head", "event"])
+def test_rnx2crx_output_matches_its_rinex(name):
+    # tests/data/*.crx were written by RNX2CRX 4.1.0 from the .rnx next to them
+    plain, compact = os.path.join(DATA, name + ".rnx"), os.path.join(DATA, name + ".crx")
+    expected = rows(parse_rinex(plain))
+    assert expected
+    assert rows(parse_rinex(compact)) == expected
+    for size in CHUNK_SIZES:
+        assert rows(chunked(compact, size)) == expected, size
+
+
+def test_sample_crinex_matches_rinex(sample_pair):
+    plain, compact = sample_pair
+    expected = rows(parse_rinex(plain))
+    assert rows(parse_rinex(compact)) == expected
+    for size in CHUNK_SIZES:
+        assert rows(chunked(compact, size)) == expected, size
+
+
+def test_event_records_keep_flags_at_every_chunk_size(event_rinex, crinex, tmp_path):
+    compact = crinex(event_rinex, str(tmp_path / "event.crx"))
+    expected = rows(parse_rinex(event_rinex))
+    assert np.count_nonzero(parse_rinex(event_rinex).lli)
+    assert rows(parse_rinex(compact)) == expected
+    for size in CHUNK_SIZES:
+        assert rows(chunked(compact, size)) == expected, size
@@ -0,0 +1,99 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import pytest
+
+from signal_core.jobs import FAILED, RUNNING, STALE_AFTER, Job
+
+RACERS = 8
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def plant_lock(job, pid, age=0):
+    with open(job.lock_path, "w") as fh:
+        json.dump({"pid": pid, "host": socket.gethostname(), "token": "0" * 16}, fh)
+    if age:
+        then = time.time() - age
+        os.utime(job.lock_path, (then, then))
+
+
+@pytest.fixture
+def job(tmp_path):
+    return Job.create(str(tmp_path))
+
+
+def test_live_lock_holds_the_job(job):
+    plant_lock(job, os.getpid())
+    assert not job.acquire()
+    assert job.busy()
+
+
+def test_lock_of_a_dead_process_is_broken(job):
+    plant_lock(job, dead_pid())
+    assert not job.busy()
+    assert job.acquire()
+    with open(job.lock_path) as fh:
+        assert json.load(fh)["pid"] == os.getpid()
+
+
+def test_lock_without_a_heartbeat_is_broken(job):
+    plant_lock(job, os.getpid(), age=STALE_AFTER + 1)
+    assert not job.busy()
+    assert job.acquire()
+    assert time.time() - os.path.getmtime(job.lock_path) < STALE_AFTER
+
+
+def test_heartbeat_keeps_an_old_lock_alive(job):
+    plant_lock(job, os.getpid(), age=STALE_AFTER + 1)
+    job.heartbeat()
+    assert not job.acquire()
+
+
+@pytest.mark.parametrize("lock", [None, "stale"])
+def test_one_of_racing_claims_wins(job, lock):
+    if lock:
+        plant_lock(job, dead_pid())
+    start = threading.Barrier(RACERS)
+    claims = []
+
+    def claim():
+        start.wait()
+        claims.append(Job.open(job.root, job.id).acquire())
+    threads = [threading.Thread(target=claim) for _ in range(RACERS)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(claims) == [False] * (RACERS - 1) + [True]
+    assert [name for name in os.listdir(job.path) if name.endswith(".stale")] == []
+
+
+@pytest.mark.parametrize("lock", [None, "dead", "stale"])
+def test_interrupted_ingest_reads_as_failed(job, lock):
+    job.set_state(RUNNING, started_at=time.time())
+    if lock == "dead":
+        plant_lock(job, dead_pid())
+    elif lock == "stale":
+        plant_lock(job, os.getpid(), age=STALE_AFTER + 1)
+    status = job.status()
+    assert status["state"] == FAILED
+    assert status["error"] == "ingest interrupted"
+    assert not job.busy()
+    assert job.acquire()
+
+
+def test_running_ingest_with_a_live_lock_is_not_failed(job):
+    plant_lock(job, os.getpid())
+    job.set_state(RUNNING, started_at=time.time())
+    assert job.status()["state"] == RUNNING
+    assert job.busy()
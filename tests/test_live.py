@@ -0,0 +1,62 @@
+import os
+
+import numpy as np
+
+from conftest import DATA
+from signal_core.combinations import NAVIC_PHASES, frequency, phase_range
+from signal_core.live import EpochStream, follow_file, live_events
+from signal_core.rinex import parse_rinex
+
+SAMPLE = os.path.join(DATA, "NPLI0240_head.rnx")
+
+
+def test_events_follow_a_file_growing_line_by_line(tmp_path):
+    with open(SAMPLE, "rb") as fh:
+        lines = fh.read().splitlines(keepends=True)
+    path = str(tmp_path / "growing.rnx")
+    open(path, "wb").close()
+    written = []
+
+    def grow():
+        feed = follow_file(path, poll=0.001)
+        with open(path, "ab") as out:
+            for line in lines:
+                out.write(line[:20])  # a line may arrive in pieces
+                out.flush()
+                yield next(feed)
+                out.write(line[20:])
+                out.flush()
+                written.append(line)
+                yield next(feed)
+        feed.close()
+
+    events = []
+    for event in live_events(grow()):
+        # An epoch is out as soon as its last satellite line is complete
+        assert len(written) == len(lines) or lines[len(written)].startswith(b">")
+        events.append(event)
+
+    columns = parse_rinex(SAMPLE)
+    assert [event["epoch"] for event in events] == np.unique(columns.epoch).tolist()
+    for event in events:
+        rows = columns.epoch == event["epoch"]
+        expected = {}
+        for prn, obs, value in zip(columns.prn[rows], columns.obs[rows], columns.value[rows]):
+            code = columns.obs_codes[obs]
+            if code in NAVIC_PHASES and value == value:
+                expected.setdefault(columns.prns[prn], {})[code] = float(phase_range(value, frequency(code)))
+        assert event["phases"] == expected
+
+
+def test_blank_satellite_count_skips_to_the_next_epoch():
+    with open(SAMPLE, "rb") as fh:
+        text = fh.read()
+    header, body = text.split(b"END OF HEADER", 1)
+    header += b"END OF HEADER" + body[:body.index(b"\n") + 1]
+    epochs = body[body.index(b"\n") + 1:].split(b"\n>")
+    first = epochs[0].split(b"\n")
+    first[0] = first[0][:32] + b"   "
+    stream = EpochStream()
+    found = stream.feed(header + b"\n".join(first) + b"\n>" + epochs[1] + b"\n>")
+    assert len(found) == 1
+    assert found[0].epoch[0] == np.unique(parse_rinex(SAMPLE).epoch)[1]
@@ -0,0 +1,36 @@
+import os
+
+import numpy as np
+
+from conftest import SAMPLES
+from signal_core.qc import GAP_STEP, QC_FILE, SLIP_CONTEXT
+from signal_core.rinex import EPOCHS_PER_CHUNK
+from signal_core.store import ObservationStore, write_rinex_store
+
+CHUNK = 7  # epochs; well under SLIP_CONTEXT, so every slip test spans chunks
+
+
+def qc_table(path, epochs_per_chunk):
+    write_rinex_store(SAMPLES[0], path, epochs_per_chunk=epochs_per_chunk)
+    return np.load(os.path.join(path, QC_FILE))
+
+
+def test_qc_table_does_not_depend_on_the_chunk_size(tmp_path):
+    whole = qc_table(str(tmp_path / "whole"), EPOCHS_PER_CHUNK)  # the day in one chunk
+    chunked = qc_table(str(tmp_path / "chunked"), CHUNK)
+    assert CHUNK < SLIP_CONTEXT
+    assert whole["slips"].sum() and whole["gaps"].sum()
+    assert len(chunked) == len(whole)
+    for name in whole.dtype.names:
+        assert np.array_equal(chunked[name], whole[name], equal_nan=whole[name].dtype.kind == "f"), name
+
+    # Some gaps open in one chunk and close in a later one
+    store = ObservationStore(str(tmp_path / "chunked"))
+    file_epochs = np.unique(store.read(("epoch",))["epoch"])
+    crossing = 0
+    for prn, code in store.keys():
+        epochs = store.series(prn, code)[0]
+        gap = np.flatnonzero(np.diff(epochs) > GAP_STEP * store.interval) + 1
+        chunks = np.searchsorted(file_epochs, epochs) // CHUNK
+        crossing += np.count_nonzero(chunks[gap] != chunks[gap - 1])
+    assert crossing
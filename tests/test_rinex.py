@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from conftest import SAMPLES, rows
+from signal_core.rinex import ObservationColumns, iter_rinex_chunks, parse_rinex
+
+
+def reference_rows(path):
+    """(epoch ns, PRN, code, value, LLI, SSI) of every observation, read line by line."""
+    codes, found, system, skip, epoch, in_body = {}, [], None, 0, None, False
+    with open(path, newline="") as fh:
+        for line in fh:
+            line = line.rstrip("\r\n")
+            if not in_body:
+                if line[60:].strip() == "SYS / # / OBS TYPES":
+                    system = line[0] if line[0].strip() else system
+                    codes.setdefault(system, []).extend(line[7:60].split())
+                in_body = "END OF HEADER" in line
+                continue
+            if skip:
+                skip -= 1
+                continue
+            if line.startswith(">"):
+                fields = line[1:].split()
+                if int(fields[6]) > 1:
+                    skip = int(fields[7])
+                    continue
+                year, month, day, hour, minute = map(int, fields[:5])
+                start = np.datetime64(f"{year:04d}-{month:02d}-{day:02d}T{hour:02d}:{minute:02d}", "ns")
+                epoch = int(start.astype(np.int64)) + int(round(float(fields[5]) * 1e9))
+                continue
+            prn = line[:3].strip()
+            for k, code in enumerate(codes.get(prn[:1], [])):
+                field = line[3 + 16 * k:3 + 16 * (k + 1)].ljust(16)
+                if field[:14].strip():
+                    found.append((epoch, prn, code, float(field[:14]),
+                                  int(field[14]) if field[14].isdigit() else 0,
+                                  int(field[15]) if field[15].isdigit() else 0))
+    return found
+
+
+@pytest.mark.parametrize("path", SAMPLES)
+def test_parse_rinex_matches_reference_reader(path):
+    columns = parse_rinex(path)
+    assert rows(columns) == reference_rows(path)
+    assert columns.header.interval == 30.0
+    assert columns.header.observation_codes["I"] == ["C5C", "L5C", "D5C", "S5C", "C9C", "L9C", "D9C", "S9C"]
+    assert columns.epoch_count == len(np.unique(columns.epoch))
+
+
+def test_event_records_are_skipped(event_rinex):
+    assert rows(parse_rinex(event_rinex)) == reference_rows(event_rinex)
+
+
+@pytest.mark.parametrize("epochs_per_chunk", (1, 7, 500))
+def test_chunks_match_whole_file(epochs_per_chunk):
+    whole = parse_rinex(SAMPLES[0])
+    parts = list(iter_rinex_chunks(SAMPLES[0], epochs_per_chunk=epochs_per_chunk))
+    assert rows(ObservationColumns.concatenate(parts)) == rows(whole)
+    assert sum(part.epoch_count for part in parts) == whole.epoch_count
@@ -0,0 +1,78 @@
+import numpy as np
+
+from signal_core.combinations import FREQUENCIES, wavelength
+from signal_core.graphs import GraphPlotter
+from signal_core.rinex import ObservationColumns, RinexHeader
+from signal_core.series import single_frame
+from signal_core.slips import (SLIP_GAP, SLIP_GF, SLIP_LLI, SLIP_PHASE, detect_dual_slips, distance_slips,
+                               single_slips)
+from signal_core.store import ObservationStore, write_store
+
+EPOCHS = 1000
+INTERVAL = 30  # seconds
+SLIP_AT = 600
+F5, F9 = FREQUENCIES["L5C"], FREQUENCIES["L9C"]
+
+
+def satellite_phase(freq, seed=0):
+    """Cycles of a smooth satellite pass with 3 mm of noise."""
+    t = np.arange(EPOCHS, dtype=np.float64)
+    distance = 2.2e7 + 800.0 * t - 0.15 * t ** 2 + np.random.default_rng(seed).normal(0, 0.003, EPOCHS)
+    return distance / wavelength(freq)
+
+
+def test_clean_series_has_no_slips():
+    assert not single_slips(satellite_phase(F5), F5).any()
+
+
+def test_injected_cycle_slip_is_found_where_it_is():
+    phase = satellite_phase(F5)
+    phase[SLIP_AT:] += 1.0
+    flags = single_slips(phase, F5)
+    assert np.flatnonzero(flags).tolist() == [SLIP_AT]
+    assert flags[SLIP_AT] == SLIP_PHASE
+
+
+def test_km_distance_of_the_app_csvs():
+    phase = satellite_phase(F5)
+    phase[SLIP_AT:] += 2.0
+    distance_km = phase * wavelength(F5) / 1000
+    assert np.flatnonzero(distance_slips(distance_km)).tolist() == [SLIP_AT]
+
+
+def test_gaps_and_lli_are_flagged():
+    phase = satellite_phase(F5)
+    phase[300:320] = np.nan
+    lli = np.zeros(EPOCHS, dtype=np.uint8)
+    lli[700] = 1
+    flags = single_slips(phase, F5, lli)
+    assert np.flatnonzero(flags).tolist() == [320, 700]
+    assert flags[320] & SLIP_GAP and flags[700] == SLIP_LLI
+
+
+def test_geometry_free_slip_on_one_frequency():
+    phase5, phase9 = satellite_phase(F5, seed=1), satellite_phase(F9, seed=2)
+    phase9[SLIP_AT:] += 1.0
+    flags = detect_dual_slips(phase5, phase9, F5, F9)
+    assert np.flatnonzero(flags).tolist() == [SLIP_AT]
+    assert flags[SLIP_AT] & SLIP_GF
+
+
+def test_store_series_with_a_gap_and_untracked_rows(tmp_path):
+    """A 20 epoch gap is one GAP flag on the grid; 0.000 rows are missing samples, not slips."""
+    phase = satellite_phase(F5)
+    phase[[150, 600, 601, 602]] = 0.0
+    rows = np.setdiff1d(np.arange(EPOCHS), np.arange(400, 420))
+    header = RinexHeader()
+    header.interval = float(INTERVAL)
+    columns = ObservationColumns(epoch=rows.astype(np.int64) * INTERVAL * 10 ** 9, prn=np.zeros(len(rows), np.int16),
+                                 obs=np.zeros(len(rows), np.int16), value=phase[rows],
+                                 lli=np.zeros(len(rows), np.uint8), ssi=np.zeros(len(rows), np.uint8),
+                                 prns=["I06"], obs_codes=["L5C"], header=header)
+    store = ObservationStore(write_store(columns, str(tmp_path / "store")))
+
+    frame = single_frame(store, "I06", "L5C")
+    assert len(frame) == EPOCHS and frame["Carrier_Phase"].isna().sum() == 20
+    plotter = GraphPlotter(None, mode="single", df=frame)
+    assert plotter.detect_phase_slips(plotter.trace("Carrier_Phase"), lli_column="LLI").tolist() == [420]
+    assert distance_slips(frame["Carrier_Phase"].to_numpy(), frame["LLI"].to_numpy())[420] == SLIP_GAP
@@ -0,0 +1,57 @@
+import os
+
+import numpy as np
+
+from conftest import SAMPLES
+from signal_core.rinex import parse_rinex
+from signal_core.store import COLUMN_NAMES, ObservationStore, write_rinex_store, write_store
+
+
+def by_key(columns):
+    """Rows sorted by PRN, code and epoch, as the store keeps them."""
+    found = list(zip([columns.prns[i] for i in columns.prn], [columns.obs_codes[i] for i in columns.obs],
+                     columns.epoch.tolist(), columns.value.tolist(), columns.lli.tolist(), columns.ssi.tolist()))
+    return sorted(found, key=lambda row: row[:3])
+
+
+def test_store_round_trip(tmp_path):
+    columns = parse_rinex(SAMPLES[0])
+    store = ObservationStore(write_store(columns, str(tmp_path / "store")))
+    assert len(store) == len(columns)
+    assert by_key(store.to_columns()) == by_key(columns)
+    assert store.header.interval == columns.header.interval
+    assert store.first_epoch == columns.epoch.min() and store.last_epoch == columns.epoch.max()
+
+
+def test_series_and_time_range(tmp_path):
+    columns = parse_rinex(SAMPLES[0])
+    store = ObservationStore(write_store(columns, str(tmp_path / "store")))
+    prn, code = columns.prns.index("I06"), columns.obs_codes.index("L5C")
+    rows = (columns.prn == prn) & (columns.obs == code)
+    epoch, value, lli = store.series("I06", "L5C", ("epoch", "value", "lli"))
+    assert np.array_equal(epoch, columns.epoch[rows])
+    assert np.array_equal(value, columns.value[rows])
+    assert np.array_equal(lli, columns.lli[rows])
+
+    start, end = epoch[100], epoch[200]
+    inside = store.series("I06", "L5C", start=start, end=end)[0]
+    assert inside.min() >= start and inside.max() <= end and len(inside) >= 100
+    assert not any(len(array) for array in store.series("I99", "L5C"))
+
+
+def test_streamed_store_matches_whole_file(tmp_path):
+    whole = ObservationStore(write_store(parse_rinex(SAMPLES[1]), str(tmp_path / "whole")))
+    write_rinex_store(SAMPLES[1], str(tmp_path / "streamed"), epochs_per_chunk=64)
+    streamed = ObservationStore(str(tmp_path / "streamed"))
+    assert sorted(streamed.keys()) == sorted(whole.keys())
+    expected, found = whole.read(COLUMN_NAMES), streamed.read(COLUMN_NAMES)
+    for name in ("epoch", "value", "lli", "ssi"):
+        assert np.array_equal(found[name], expected[name]), name
+
+
+def test_rewriting_a_store_replaces_it(tmp_path):
+    path = str(tmp_path / "store")
+    write_rinex_store(SAMPLES[0], path)
+    write_rinex_store(SAMPLES[1], path)
+    assert ObservationStore(path).first_epoch == parse_rinex(SAMPLES[1]).epoch.min()
+    assert os.listdir(tmp_path) == ["store"]
@@ -5,6 +5,8 @@ import matplotlib.dates as mdates
 import tkinter as tk
 from tkinter import filedialog, messagebox
 
+from signal_core.slips import distance_slips
+
 # Function to load CSV file
 def load_csv(title):
     file_path = filedialog.askopenfilename(filetypes=[("CSV files", "*.csv")])
@@ -19,11 +21,9 @@ def load_csv(title):
         messagebox.showerror("Error", f"Failed to read file: {e}")
         return None, None
 
-# Function to detect phase slips
-def detect_phase_slips(carrier_phase, threshold=2.0):
-    diffs = np.abs(np.diff(carrier_phase))
-    slip_indices = np.where(diffs > threshold)[0] + 1  # Shift indices to match the actual slip location
-    return slip_indices
+# Function to detect phase slips (shared engine, see signal_core/slips.py)
+def detect_phase_slips(carrier_phase, lli=None):
+    return np.flatnonzero(distance_slips(carrier_phase, lli))
 
 # Function to plot data with phase slips
 def plot_data(time, carrier_phase, title, color):